@@ -0,0 +1,66 @@
+"""
+Command line entry point
+
+Usage:
+    python -m app serve [--host HOST] [--port PORT] [--workers N]
+    python -m app calibrate [--workers N] [--latency-ms MS] [--documents N] [--dry-run]
+    python -m app batch INPUT [INPUT ...] --output results.jsonl [--workers N] [--mode fields|full]
+"""
+import argparse
+import sys
+from pathlib import Path
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app", description="OCR Invoice API")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = subparsers.add_parser("serve", help="Run the pre-fork multi-worker server")
+    serve_parser.add_argument("--host", help="Bind address (default: HOST setting)")
+    serve_parser.add_argument("--port", type=int, help="Port (default: PORT setting)")
+    serve_parser.add_argument("--workers", type=int, help="Worker processes (default: WORKERS setting)")
+
+    calibrate_parser = subparsers.add_parser(
+        "calibrate", help="Measure batch size/threads/concurrency on this host and store its profile"
+    )
+    calibrate_parser.add_argument("--workers", type=int, help="Workers the server will run (default: WORKERS setting)")
+    calibrate_parser.add_argument("--latency-ms", type=float, help="p95 latency ceiling (default: CALIBRATION_LATENCY_MS)")
+    calibrate_parser.add_argument("--documents", type=int, help="Pages per candidate (default: CALIBRATION_DOCUMENTS)")
+    calibrate_parser.add_argument("--dry-run", action="store_true", help="Print the choice without saving it")
+
+    batch_parser = subparsers.add_parser("batch", help="OCR local files (directories, globs, zip archives) into JSONL")
+    batch_parser.add_argument("inputs", nargs="+", help="Directories, image files, zip archives or glob patterns")
+    batch_parser.add_argument("-o", "--output", type=Path, required=True, help="JSONL results (appended; reruns resume)")
+    batch_parser.add_argument("--workers", type=int, help="Worker processes (default: WORKERS setting)")
+    batch_parser.add_argument("--mode", choices=["fields", "full"], default="fields",
+                              help="fields: invoice fields only (field-first unless FIELD_ONLY_RECOGNITION=false); full: every box's text too")
+    batch_parser.add_argument("--retry-errors", action="store_true", help="Process documents that failed last time again")
+    batch_parser.add_argument("--progress-interval", type=float, default=5.0, help="Seconds between progress lines")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        # Imported lazily: the server must configure metrics before the app is imported
+        from app.server import serve
+        serve(args.host, args.port, args.workers)
+    elif args.command == "calibrate":
+        # Imported lazily: the thread environment must be set before paddle loads
+        from app.services.calibration import run_calibration
+        result = run_calibration(args.workers, args.latency_ms, args.documents, save=not args.dry_run)
+        print(f"{result['host']}: {result['settings']}")
+    elif args.command == "batch":
+        # Imported lazily: the thread environment must be set before paddle loads
+        from app.services.offline_batch import run_batch
+        try:
+            summary = run_batch(
+                args.inputs, args.output, args.workers, args.mode, args.retry_errors, args.progress_interval
+            )
+        except KeyboardInterrupt:
+            return 130
+        return 1 if summary["errors"] else 0
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
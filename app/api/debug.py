@@ -0,0 +1,25 @@
+from typing import Optional
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import FileResponse
+from app.core.profiling import is_profile_authorized, profile_path
+
+router = APIRouter()
+
+@router.get("/debug/profiles/{profile_id}", include_in_schema=False)
+async def get_profile(profile_id: str, x_debug_profile: Optional[str] = Header(None)):
+    """
+    Fetch a stored request profile
+    Requires the same X-Debug-Profile token used to record it
+    """
+    if not is_profile_authorized(x_debug_profile.encode("utf-8") if x_debug_profile else None):
+        raise HTTPException(status_code=403, detail="Invalid profile token")
+    
+    try:
+        path = profile_path(profile_id)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    
+    if not path.exists():
+        raise HTTPException(status_code=404, detail="Profile not found")
+    
+    return FileResponse(path, media_type="text/html")
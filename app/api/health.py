@@ -1,6 +1,8 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse
 from datetime import datetime
 from app.core.config import settings
+from app.services.execution import get_stage_pipeline
 
 router = APIRouter()
 
@@ -15,4 +17,33 @@ async def health_check():
         "service": settings.APP_NAME,
         "version": settings.APP_VERSION,
         "timestamp": datetime.utcnow().isoformat()
-    }
\ No newline at end of file
+    }
+
+
+@router.get("/health/live")
+async def liveness():
+    """
+    Liveness probe
+    The process is up and the event loop is serving requests
+    """
+    return {"status": "alive"}
+
+
+@router.get("/health/ready")
+async def readiness(request: Request):
+    """
+    Readiness probe
+    200 once models are loaded and warmed up, 503 while starting or shutting down
+    """
+    state = request.app.state
+    if not getattr(state, "ready", False):
+        return JSONResponse(status_code=503, content={"status": "not_ready"})
+    payload = {
+        "status": "ready",
+        "startup_seconds": state.startup_seconds,
+        "threads": state.threads
+    }
+    pipeline = get_stage_pipeline()
+    if pipeline is not None:
+        payload["pipeline"] = pipeline.describe()
+    return payload
@@ -0,0 +1,21 @@
+import os
+from fastapi import APIRouter, Response
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, generate_latest
+from prometheus_client.multiprocess import MultiProcessCollector
+
+router = APIRouter()
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics():
+    """
+    Prometheus metrics endpoint
+    Exposes per-stage latency histograms, in-flight requests, box counts and errors
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        # Pre-fork server: aggregate the metric files written by every worker
+        registry = CollectorRegistry()
+        MultiProcessCollector(registry)
+        content = generate_latest(registry)
+    else:
+        content = generate_latest()
+    return Response(content=content, headers={"Content-Type": CONTENT_TYPE_LATEST})
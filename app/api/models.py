@@ -0,0 +1,102 @@
+import asyncio
+import hmac
+import os
+from typing import Dict, Optional, Set
+from fastapi import APIRouter, Header, HTTPException, Request
+from fastapi.responses import JSONResponse
+from app.core.config import settings
+from app.core.logger import logger
+from app.models.registry import ROLES, list_versions, model_path, read_control, write_control
+from app.schemas.models import ModelActivateRequest, ShadowRequest
+
+router = APIRouter(prefix="/admin/models", tags=["Admin"])
+
+# Keeps apply tasks referenced until they finish
+_applying: Set[asyncio.Task] = set()
+
+
+def _require_admin(token: Optional[str]) -> None:
+    if not settings.ADMIN_TOKEN or not token or not hmac.compare_digest(
+        token.encode("utf-8"), settings.ADMIN_TOKEN.encode("utf-8")
+    ):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+def _check_version(role: str, version: str) -> None:
+    try:
+        path = model_path(role, version)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not (path / "inference.pdiparams").exists():
+        raise HTTPException(status_code=400, detail=f"Weights missing for {role} version {version!r}")
+
+
+def _publish(request: Request, control: Dict) -> JSONResponse:
+    """Write the control file and apply it in this worker now (others pick it up on their next poll)"""
+    write_control(control)
+    registry = request.app.state.model_registry
+    task = asyncio.create_task(asyncio.to_thread(registry.apply, control))
+    _applying.add(task)
+    task.add_done_callback(_applying.discard)
+    logger.info("Model control updated: %s", control)
+    return JSONResponse(status_code=202, content={"status": "accepted", "control": control})
+
+
+@router.get("")
+async def get_models(request: Request, x_admin_token: Optional[str] = Header(None)):
+    """
+    Model registry state
+    Available versions, desired versions (control file) and what this worker runs
+    """
+    _require_admin(x_admin_token)
+    return {
+        "versions": list_versions(),
+        "control": read_control(),
+        "worker": dict(request.app.state.model_registry.describe(), pid=os.getpid()),
+    }
+
+
+@router.post("/activate", status_code=202)
+async def activate_models(request: Request, body: ModelActivateRequest, x_admin_token: Optional[str] = Header(None)):
+    """
+    Hot swap to new model versions
+    Each worker loads and warms up the new versions in the background, then
+    swaps them in; in-flight requests finish on the previous models.
+    """
+    _require_admin(x_admin_token)
+    control = read_control()
+    requested = body.model_dump(exclude_none=True)
+    if not requested:
+        raise HTTPException(status_code=400, detail="Give a detector and/or recognizer version")
+    for role, version in requested.items():
+        _check_version(role, version)
+        control[role] = version
+    return _publish(request, control)
+
+
+@router.put("/shadow", status_code=202)
+async def start_shadow(request: Request, body: ShadowRequest, x_admin_token: Optional[str] = Header(None)):
+    """
+    Shadow a candidate model set
+    A sample of requests is replayed on the candidate; latency and output
+    differences are reported here and in the ocr_shadow_* metrics.
+    """
+    _require_admin(x_admin_token)
+    control = read_control()
+    shadow = {"sample_rate": settings.SHADOW_SAMPLE_RATE if body.sample_rate is None else body.sample_rate}
+    for role in ROLES:
+        version = getattr(body, role)
+        if version:
+            _check_version(role, version)
+            shadow[role] = version
+    control["shadow"] = shadow
+    return _publish(request, control)
+
+
+@router.delete("/shadow", status_code=202)
+async def stop_shadow(request: Request, x_admin_token: Optional[str] = Header(None)):
+    """Stop shadowing and unload the candidate"""
+    _require_admin(x_admin_token)
+    control = read_control()
+    control["shadow"] = None
+    return _publish(request, control)
@@ -1,19 +1,30 @@
 import io
 import cv2
+import orjson
 import numpy as np
-from typing import List
+from typing import AsyncIterator, Dict, List, Tuple, Union
 from app.core.logger import logger
+from app.core.config import settings
+from app.core.metrics import track_stage, instrument_endpoint
+from app.core.deadline import RequestAborted, current_deadline
+from app.core.timing import current_timings
 from app.services.ocr_service import OCRService
-from fastapi.responses import StreamingResponse
+from app.services.execution import run_pipeline, stream_pipeline
+from fastapi.responses import StreamingResponse, ORJSONResponse
 from app.dependencies.ocr import get_ocr_service
 from app.services.image_service import ImageService
-from fastapi import APIRouter, File, UploadFile, HTTPException, Depends
-from app.schemas.ocr import InvoiceFieldsResponse, BBoxListResponse, BBoxResult, MockResponse, ErrorResponse
+from fastapi import APIRouter, File, UploadFile, HTTPException, Depends, Query, Request
+from app.schemas.ocr import (
+    InvoiceFieldsResponse, BBoxListResponse, BBoxColumnarResponse, BBoxFormat, MockResponse, ErrorResponse
+)
 
 router = APIRouter()
 
 @router.post("/invoice", response_model=InvoiceFieldsResponse)
-async def extract_invoice_fields(file: UploadFile = File(...), ocr_service: OCRService = Depends(get_ocr_service)):
+@instrument_endpoint("invoice")
+async def extract_invoice_fields(
+    request: Request, file: UploadFile = File(...), ocr_service: OCRService = Depends(get_ocr_service)
+):
     """
     API 1: Extract invoice fields
     Extracts supplier_name, total, and currency from invoice image.
@@ -23,29 +34,36 @@ async def extract_invoice_fields(file: UploadFile = File(...), ocr_service: OCRS
         InvoiceFieldsResponse with extracted fields
     """
     try:
-        logger.info(f"Processing invoice: {file.filename}")
+        logger.debug("Processing invoice: %s", file.filename)
         
         # Validate and load image
-        image = ImageService.validate_image(file)
+        with track_stage("decode"):
+            image = ImageService.validate_image(file)
         
-        # Process image through OCR pipeline
-        ocr_results = ocr_service.process_image(image)
+        # Process image through OCR pipeline (only the boxes the fields need, unless disabled)
+        if settings.FIELD_ONLY_RECOGNITION:
+            ocr_results = await run_pipeline(request, ocr_service.process_image_for_fields, image)
+        else:
+            ocr_results = await run_pipeline(request, ocr_service.process_image, image)
         
         # Extract invoice fields
         fields = ocr_service.extract_invoice_fields(ocr_results)
         
-        logger.info(f"Extracted fields: {fields}")
+        logger.debug("Extracted fields: %s", fields)
         
         return InvoiceFieldsResponse(**fields)
         
-    except HTTPException:
+    except (HTTPException, RequestAborted):
         raise
     except Exception as e:
-        logger.error(f"Error processing invoice: {e}", exc_info=True)
+        logger.error("Error processing invoice: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=f"Error processing invoice: {str(e)}")
 
 @router.post("/invoice/visualize")
-async def visualize_invoice_ocr(file: UploadFile = File(...), ocr_service: OCRService = Depends(get_ocr_service)):
+@instrument_endpoint("visualize")
+async def visualize_invoice_ocr(
+    request: Request, file: UploadFile = File(...), ocr_service: OCRService = Depends(get_ocr_service)
+):
     """
     API 2: OCR with visualization
     Returns image with bounding boxes and recognized text drawn on it.
@@ -55,20 +73,20 @@ async def visualize_invoice_ocr(file: UploadFile = File(...), ocr_service: OCRSe
         Image with visualization
     """
     try:
-        logger.info(f"Visualizing OCR for: {file.filename}")
+        logger.debug("Visualizing OCR for: %s", file.filename)
         
         # Validate and load image
-        image = ImageService.validate_image(file)
+        with track_stage("decode"):
+            image = ImageService.validate_image(file)
         
         # Process image through OCR pipeline
-        ocr_results = ocr_service.process_image(image)
+        ocr_results = await run_pipeline(request, ocr_service.process_image, image)
         
-        # Visualize results
-        result_image = ocr_service.visualize_results(image, ocr_results)
-        
-        # Encode image to bytes
-        _, img_encoded = cv2.imencode('.png', result_image)
-        img_bytes = img_encoded.tobytes()
+        # Visualize results and encode image to bytes
+        with track_stage("render"):
+            result_image = ocr_service.visualize_results(image, ocr_results)
+            _, img_encoded = cv2.imencode('.png', result_image)
+            img_bytes = img_encoded.tobytes()
         
         return StreamingResponse(
             io.BytesIO(img_bytes),
@@ -76,53 +94,59 @@ async def visualize_invoice_ocr(file: UploadFile = File(...), ocr_service: OCRSe
             headers={"Content-Disposition": f"inline; filename=ocr_result.png"}
         )
         
-    except HTTPException:
+    except (HTTPException, RequestAborted):
         raise
     except Exception as e:
-        logger.error(f"Error visualizing OCR: {e}", exc_info=True)
+        logger.error("Error visualizing OCR: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=f"Error visualizing OCR: {str(e)}")
 
-@router.post("/invoice/bboxes", response_model=BBoxListResponse)
-async def extract_bboxes(file: UploadFile = File(...), ocr_service: OCRService = Depends(get_ocr_service)):
+@router.post("/invoice/bboxes", response_model=Union[BBoxListResponse, BBoxColumnarResponse])
+@instrument_endpoint("bboxes")
+async def extract_bboxes(
+    request: Request,
+    file: UploadFile = File(...),
+    format: BBoxFormat = Query(BBoxFormat.DEFAULT, description="Response format: default, columnar or flat"),
+    ocr_service: OCRService = Depends(get_ocr_service)
+):
     """
     API 3: OCR raw bounding boxes
     Returns list of detected text boxes with coordinates and recognized text.
     Args:
         file: Invoice image file (jpg/png)
+        format: 'default' for BBoxListResponse, 'columnar' or 'flat' for the
+            compact BBoxColumnarResponse ({"texts": [...], "boxes": [...]})
     Returns:
-        BBoxListResponse with list of bounding boxes
+        BBoxListResponse or BBoxColumnarResponse, serialized with orjson
     """
     try:
-        logger.info(f"Extracting bboxes for: {file.filename}")
+        logger.debug("Extracting bboxes for: %s", file.filename)
         
         # Validate and load image
-        image = ImageService.validate_image(file)
+        with track_stage("decode"):
+            image = ImageService.validate_image(file)
         
         # Process image through OCR pipeline
-        ocr_results = ocr_service.process_image(image)
+        ocr_results = await run_pipeline(request, ocr_service.process_image, image)
         
-        # Format results
-        bbox_results = []
-        for result in ocr_results:
-            bbox_results.append(
-                BBoxResult(
-                    label=result['text'],  # Use text as label
-                    text=result['text'],
-                    bbox=result['bbox']
-                )
-            )
+        # Format results straight from the result columns (no per-box model validation)
+        if format == BBoxFormat.DEFAULT:
+            payload = ocr_results.to_bbox_payload()
+        else:
+            payload = ocr_results.to_columnar_payload(flat=format == BBoxFormat.FLAT)
         
-        logger.info(f"Extracted {len(bbox_results)} bounding boxes")
+        logger.debug("Extracted %d bounding boxes", len(ocr_results))
         
-        return BBoxListResponse(results=bbox_results)
+        with track_stage("serialize"):
+            return ORJSONResponse(payload)
         
-    except HTTPException:
+    except (HTTPException, RequestAborted):
         raise
     except Exception as e:
-        logger.error(f"Error extracting bboxes: {e}", exc_info=True)
+        logger.error("Error extracting bboxes: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=f"Error extracting bboxes: {str(e)}")
 
 @router.get("/mock", response_model=MockResponse)
+@instrument_endpoint("mock")
 async def mock_invoice_data():
     """
     API 4: Mock API for testing
@@ -131,10 +155,75 @@ async def mock_invoice_data():
     Returns:
         MockResponse with sample data
     """
-    logger.info("Returning mock data")
+    logger.debug("Returning mock data")
     
     return MockResponse(
         supplier_name="ACME Corporation",
         total="12500000",
         currency="VND"
     )
+
+def _stream_summary() -> Dict:
+    """
+    Payload of the 'done' event: what the response headers carry for the
+    other endpoints (Server-Timing, X-Partial-Result), which a stream sends
+    before any work
+    """
+    summary: Dict = {}
+    timings = current_timings()
+    if timings is not None:
+        summary.update(timings.summary())
+    deadline = current_deadline()
+    if deadline is not None and deadline.partial:
+        summary["partial"] = deadline.aborted_stage
+    return summary
+
+async def _sse_events(events: AsyncIterator[Tuple[str, Dict]]) -> AsyncIterator[bytes]:
+    """Format (event, payload) tuples as Server-Sent Events, ending with a 'done' event"""
+    try:
+        async for event, payload in events:
+            yield b"event: " + event.encode() + b"\ndata: " + orjson.dumps(payload) + b"\n\n"
+    except RequestAborted as e:
+        # Headers are already sent: report the deadline in-stream instead of a 504
+        yield b"event: error\ndata: " + orjson.dumps({"detail": str(e), "stage": e.stage}) + b"\n\n"
+        return
+    except Exception as e:
+        # Headers are already sent: report the failure in-stream
+        logger.error("Error streaming OCR: %s", e, exc_info=True)
+        yield b"event: error\ndata: " + orjson.dumps({"detail": f"Error streaming OCR: {str(e)}"}) + b"\n\n"
+        return
+    yield b"event: done\ndata: " + orjson.dumps(_stream_summary()) + b"\n\n"
+
+@router.post("/invoice/stream")
+@instrument_endpoint("stream")
+async def stream_invoice_ocr(
+    request: Request, file: UploadFile = File(...), ocr_service: OCRService = Depends(get_ocr_service)
+):
+    """
+    API 5: Incremental OCR over Server-Sent Events
+    Emits detected boxes as soon as detection finishes, recognized text
+    per batch of boxes as it completes, then the extracted fields.
+    Events:
+        boxes: {"boxes": [[x1, y1, x2, y2], ...], "confidences": [...]} in reading order
+        texts: {"start": i, "texts": [...]} texts of boxes i, i+1, ...
+        fields: InvoiceFieldsResponse
+        done: {"stages_ms": {...}, "boxes": ..., "partial": stage when cut short by the deadline}
+        error: {"detail": ..., "stage": ... when out of time}
+    Args:
+        file: Invoice image file (jpg/png)
+    Returns:
+        text/event-stream response
+    """
+    logger.debug("Streaming OCR for: %s", file.filename)
+    
+    # Validate before the stream starts so bad uploads still get a 4xx status
+    with track_stage("decode"):
+        image = ImageService.validate_image(file)
+    
+    # Holds an inference slot for the whole stream; each batch runs in the
+    # threadpool, and no further batches run once the client disconnects
+    return StreamingResponse(
+        _sse_events(stream_pipeline(request, ocr_service.stream_image, image)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
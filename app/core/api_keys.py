@@ -0,0 +1,135 @@
+"""
+API clients: keys with per-key concurrency and rate limits
+
+Keys are read from (in order):
+- API_KEY: the single shared key, as client "default"
+- API_KEYS: JSON list in the environment
+- API_KEYS_FILE: JSON file with the same list
+
+Each entry is {"name", "key", "max_concurrency", "rate", "burst"}; only
+name and key are required, the limits default to API_KEY_MAX_CONCURRENCY,
+API_KEY_RATE and API_KEY_BURST. Limits apply per worker process.
+"""
+import json
+import math
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+
+
+class TokenBucket:
+    """
+    Token bucket rate limiter
+
+    Args:
+        rate: Tokens added per second
+        burst: Bucket capacity (requests allowed at once after idling)
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self) -> float:
+        """
+        Take one token
+
+        Returns:
+            0 if a token was taken, else seconds until one is available
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+
+@dataclass
+class APIClient:
+    """One API key and its limits (0 = unlimited)"""
+    name: str
+    key: str = field(repr=False)
+    max_concurrency: int = 0
+    rate: float = 0.0
+    burst: int = 0
+    bucket: Optional[TokenBucket] = field(default=None, init=False, repr=False)
+
+    def __post_init__(self):
+        if self.rate > 0:
+            self.bucket = TokenBucket(self.rate, self.burst or max(1, math.ceil(self.rate)))
+
+    def take_token(self) -> float:
+        """Rate check for one request: 0 if allowed, else seconds to wait"""
+        return self.bucket.take() if self.bucket is not None else 0.0
+
+
+# Requests that reach the pipeline without authentication (e.g. scripts using the app directly)
+ANONYMOUS = APIClient(name="anonymous", key="")
+
+
+def _client_from_spec(spec: Dict) -> APIClient:
+    return APIClient(
+        name=str(spec["name"]),
+        key=str(spec["key"]),
+        max_concurrency=int(spec.get("max_concurrency", settings.API_KEY_MAX_CONCURRENCY)),
+        rate=float(spec.get("rate", settings.API_KEY_RATE)),
+        burst=int(spec.get("burst", settings.API_KEY_BURST)),
+    )
+
+
+def load_api_clients() -> List[APIClient]:
+    """
+    Build the API clients from settings
+
+    Returns:
+        Clients with a non-empty key
+
+    Raises:
+        ValueError: Duplicate key or client name, or an entry without name/key
+    """
+    specs: List[Dict] = []
+    if settings.API_KEY:
+        specs.append({"name": "default", "key": settings.API_KEY})
+    specs.extend(settings.API_KEYS)
+    if settings.API_KEYS_FILE:
+        specs.extend(json.loads(Path(settings.API_KEYS_FILE).read_text(encoding="utf-8")))
+
+    clients: List[APIClient] = []
+    names, keys = set(), set()
+    for spec in specs:
+        if "name" not in spec or "key" not in spec:
+            raise ValueError(f"API key entry needs 'name' and 'key': {sorted(spec)}")
+        client = _client_from_spec(spec)
+        if not client.key:
+            continue
+        if client.name in names:
+            raise ValueError(f"Duplicate API client name: {client.name}")
+        if client.key in keys:
+            raise ValueError(f"API key of {client.name} is already used by another client")
+        names.add(client.name)
+        keys.add(client.key)
+        clients.append(client)
+    return clients
+
+
+_current_client: ContextVar[APIClient] = ContextVar("api_client", default=ANONYMOUS)
+
+
+def set_current_client(client: APIClient) -> None:
+    """Bind the authenticated client to the current request context"""
+    _current_client.set(client)
+
+
+def current_client() -> APIClient:
+    return _current_client.get()
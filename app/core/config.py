@@ -1,6 +1,7 @@
 import os
+import tempfile
 from pathlib import Path
-from typing import Optional
+from typing import Any, Dict, List, Optional, Tuple
 from pydantic_settings import BaseSettings
 
 
@@ -15,8 +16,25 @@ class Settings(BaseSettings):
     # API
     API_V1_PREFIX: str = "/api/v1"
 
+    # Server (python -m app serve)
+    HOST: str = "0.0.0.0"
+    PORT: int = 8000
+    WORKERS: int = 1
+    WORKER_TIMEOUT: float = 30.0  # Graceful shutdown wait before workers are killed
+    MEMORY_REPORT_INTERVAL: float = 60.0  # Seconds between per-worker RSS/PSS reports, 0 disables
+
+    # CPU thread budget, split between workers (Paddle, OpenCV, OpenMP/BLAS)
+    CPU_THREADS: int = 0  # Cores for the whole server, 0 = detect from CPU affinity and cgroup quota
+    THREADS_PER_WORKER: int = 0  # 0 = CPU_THREADS // WORKERS (at least 1)
+    CPU_AFFINITY: bool = False  # Pin each worker to its own cores
+
     # Authentication
     API_KEY: str =""
+    API_KEYS: List[Dict[str, Any]] = []  # JSON list of {"name", "key", "max_concurrency", "rate", "burst"}
+    API_KEYS_FILE: Optional[Path] = None  # JSON file with the same list
+    API_KEY_MAX_CONCURRENCY: int = 0  # Default documents in progress per key and worker, 0 = unlimited
+    API_KEY_RATE: float = 0.0  # Default requests per second per key and worker, 0 = unlimited
+    API_KEY_BURST: int = 0  # Default token bucket size, 0 = ceil(rate)
     
     
     # Model paths
@@ -25,25 +43,91 @@ class Settings(BaseSettings):
     DETECTOR_MODEL_PATH: Path = WEIGHTS_DIR / "Model_det_small"
     RECOGNIZER_MODEL_PATH: Path = WEIGHTS_DIR / "Model_rec"
     
+    # Model registry (versions are directories under WEIGHTS_DIR, see app.models.registry)
+    MODEL_CONTROL_FILE: Path = WEIGHTS_DIR / "active.json"  # Desired versions, written by the admin API
+    MODEL_POLL_INTERVAL: float = 5.0  # Seconds between control file checks in each worker, 0 disables hot swap
+    SHADOW_SAMPLE_RATE: float = 0.05  # Default fraction of requests replayed on a shadow candidate
+    ADMIN_TOKEN: str = ""  # X-Admin-Token for /admin endpoints, empty disables them
+    
+    # Calibration profiles per host type (python -m app calibrate, see app.core.host_profile)
+    CALIBRATION_FILE: Path = WEIGHTS_DIR / "calibration.json"
+    CALIBRATE_ON_STARTUP: bool = False  # python -m app serve calibrates first when this host type has no profile
+    CALIBRATION_LATENCY_MS: float = 3000.0  # p95 document latency ceiling for the chosen configuration
+    CALIBRATION_BATCH_SIZES: List[int] = [8, 16, 32]  # RECOGNITION_BATCH_SIZE candidates
+    CALIBRATION_CONCURRENCY: List[int] = [1, 2]  # INFERENCE_CONCURRENCY candidates
+    CALIBRATION_DOCUMENTS: int = 8  # Synthetic documents per candidate
+    
     # Detection settings
     DETECTION_RESIZE_LONG: int = 960
     DETECTION_THRESH: float = 0.3
     CONF_THRESH: float = 0.2
     DETECTION_BOX_THRESH: float = 0.6
     
+    # Adaptive detection: cheap coarse pass, re-run at fine resolution only when text is too small
+    DETECTION_ADAPTIVE: bool = False
+    DETECTION_COARSE_LONG: int = 640
+    DETECTION_FINE_LONG: int = 1280
+    DETECTION_MIN_TEXT_HEIGHT: float = 10.0  # Median text height (coarse detector input pixels) to accept the coarse pass
+    
     # Recognition settings
     RECOGNITION_TARGET_H: int = 48
     RECOGNITION_TARGET_W: int = 320
+    RECOGNITION_BATCH_SIZE: int = 16  # Largest recognizer batch (smaller batches use power-of-two sizes)
+    
+    # Field-first recognition for /invoice and batch --mode fields: read the supplier band and
+    # total region first, stop once the fields are settled there
+    FIELD_ONLY_RECOGNITION: bool = True
+    FIELD_SCAN_BATCH: int = 8  # Boxes recognized between settle checks
+    
+    # Request deadlines (checked between pipeline stages and recognition batches)
+    REQUEST_TIMEOUT: float = 0.0  # Seconds per request when no X-Request-Timeout header is sent, 0 = no limit
+    REQUEST_TIMEOUT_MAX: float = 120.0  # Cap on X-Request-Timeout, 0 = no cap
+    PARTIAL_RESULTS: bool = False  # On deadline after detection return partial results instead of 504 (X-Partial-Results overrides)
+    INFERENCE_CONCURRENCY: int = 1  # Documents processed at once per worker, shared fairly between API keys
+
+    # Stage-pipelined execution (app.services.pipeline): detection, postprocess and recognition of different documents overlap
+    PIPELINE_ENABLED: bool = False
+    PIPELINE_QUEUE_SIZE: int = 2  # Documents waiting in front of each stage; a full inbox blocks the stage before it
+    PIPELINE_MAX_IN_FLIGHT: int = 4  # Documents in the pipeline at once per worker (used instead of INFERENCE_CONCURRENCY)
+    PIPELINE_STAGE_WORKERS: Dict[str, int] = {}  # Threads per stage, e.g. {"postprocess": 2}; default 1
     
     # Image processing
     MAX_IMAGE_SIZE: int = 10 * 1024 * 1024  # 10MB
     ALLOWED_EXTENSIONS: set = {".jpg", ".jpeg", ".png"}
+    IMAGE_MEMORY_BUDGET_MB: float = 1024.0  # Reject images (413) whose projected pipeline memory is larger, 0 = no limit
+    IMAGE_MEMORY_FACTOR: float = 4.0  # Projected memory = width * height * 3 bytes * factor (decoded image and its copies)
+    
+    # Memory guardrails (see app.core.memory)
+    MAX_REQUESTS_PER_WORKER: int = 0  # Recycle a pre-fork worker after this many requests, 0 = never
+    MAX_REQUESTS_JITTER: int = 0  # Up to this many extra requests per worker, so workers do not recycle together
+    WORKER_MAX_RSS_MB: float = 0.0  # Recycle a pre-fork worker once its RSS exceeds this after a request, 0 = no limit
+    MEMORY_TRACE_SAMPLE_RATE: float = 0.0  # Fraction of requests traced with tracemalloc (one at a time per worker)
+    MEMORY_TRACE_FRAMES: int = 1  # Stack frames kept per traced allocation
+    MEMORY_TRACE_TOP: int = 5  # Allocation sites logged per traced request
     
     # Expand polygon settings
     EXPAND_RATIO_W: float = 0.085
     EXPAND_RATIO_H: float = 0.2
     MIN_PAD_H: int = 3
     MAX_PAD_H: int = 15
+    
+    # Logging (JSON lines written by a background thread, see app.core.logger)
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "json"  # "json" or "text"
+    LOG_VERBOSE_SAMPLE_RATE: float = 0.0  # Fraction of requests whose DEBUG pipeline logs are written
+    
+    # Debug profiling (send X-Debug-Profile: <PROFILE_TOKEN> to profile one request)
+    PROFILE_TOKEN: str = ""  # Empty disables on-demand profiling
+    PROFILE_DIR: Path = Path(tempfile.gettempdir()) / "ocr_profiles"
+    PROFILE_INTERVAL: float = 0.001  # Sampling interval in seconds
+    
+    # Startup warmup (shapes are (height, width) of representative pages)
+    WARMUP_ENABLED: bool = True
+    WARMUP_SHAPES: List[Tuple[int, int]] = [(1754, 1240), (1240, 1754), (960, 720)]
+    WARMUP_ITERATIONS: int = 1
+    
+    # Layout settings
+    LINE_OVERLAP_THRESH: float = 0.5  # Min vertical overlap for two boxes to share a text line
 
 
 settings = Settings()
@@ -0,0 +1,154 @@
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from app.core.config import settings
+from app.core.metrics import observe_abort
+
+
+class RequestAborted(Exception):
+    """Pipeline work abandoned before completion"""
+
+    reason = "aborted"
+    message = "Request aborted"
+
+    def __init__(self, stage: str):
+        super().__init__(f"{self.message} during {stage}")
+        self.stage = stage
+
+
+class DeadlineExceeded(RequestAborted):
+    """The request ran out of its time budget"""
+
+    reason = "deadline"
+    message = "Deadline exceeded"
+
+
+class RequestCancelled(RequestAborted):
+    """The client disconnected"""
+
+    reason = "disconnect"
+    message = "Client disconnected"
+
+
+class RequestDeadline:
+    """
+    Time budget and cancellation state of one request
+
+    One instance is bound to the current request context (like
+    RequestTimings); pipeline code calls check_deadline between stages and
+    recognition batches, so abandoned requests stop at the next check.
+
+    Attributes:
+        start: Request arrival (perf_counter)
+        expires: Deadline (perf_counter), None for no time limit
+        allow_partial: Return what was recognized so far instead of a 504
+        cancelled: Set when the client disconnects
+        aborted_stage: Stage at which work stopped, if it did
+        partial: Work stopped but a partial result is returned
+    """
+
+    __slots__ = ("start", "expires", "allow_partial", "cancelled", "aborted_stage", "partial")
+
+    def __init__(self, timeout: Optional[float] = None, allow_partial: bool = False):
+        self.start = time.perf_counter()
+        self.expires = self.start + timeout if timeout else None
+        self.allow_partial = allow_partial
+        self.cancelled = False
+        self.aborted_stage: Optional[str] = None
+        self.partial = False
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left (may be negative), None for no time limit"""
+        if self.expires is None:
+            return None
+        return self.expires - time.perf_counter()
+
+    def expired(self) -> bool:
+        return self.expires is not None and time.perf_counter() >= self.expires
+
+    def cancel(self) -> None:
+        self.cancelled = True
+
+    def check(self, stage: str, pending: int = 0, can_stop: bool = False) -> bool:
+        """
+        Decide whether work may continue into stage
+
+        Args:
+            stage: Stage about to run
+            pending: Boxes that would be left unrecognized by stopping here
+            can_stop: The caller can return a partial result at this point
+
+        Returns:
+            True to continue, False to stop and return a partial result
+            (deadline passed, partial results allowed and can_stop)
+
+        Raises:
+            RequestCancelled: The client disconnected
+            DeadlineExceeded: The deadline passed and no partial result applies
+        """
+        if self.cancelled:
+            self._abort(RequestCancelled.reason, stage, pending, discarded=True)
+            raise RequestCancelled(stage)
+        if not self.expired():
+            return True
+        if self.allow_partial and can_stop:
+            self.partial = True
+            self._abort(DeadlineExceeded.reason, stage, pending, discarded=False)
+            return False
+        self._abort(DeadlineExceeded.reason, stage, pending, discarded=True)
+        raise DeadlineExceeded(stage)
+
+    def _abort(self, reason: str, stage: str, pending: int, discarded: bool) -> None:
+        self.aborted_stage = stage
+        # Time already spent is wasted only if nobody gets the result
+        spent = time.perf_counter() - self.start if discarded else 0.0
+        observe_abort(reason, stage, spent, pending)
+
+
+_current_deadline: ContextVar[Optional[RequestDeadline]] = ContextVar("request_deadline", default=None)
+
+
+def parse_timeout(value: Optional[bytes]) -> Optional[float]:
+    """
+    Request timeout in seconds: X-Request-Timeout header (capped by
+    REQUEST_TIMEOUT_MAX), else REQUEST_TIMEOUT
+
+    Returns:
+        Timeout, or None for no time limit
+    """
+    timeout = settings.REQUEST_TIMEOUT
+    if value:
+        try:
+            requested = float(value)
+        except ValueError:
+            requested = 0.0
+        if requested > 0:
+            timeout = min(requested, settings.REQUEST_TIMEOUT_MAX) if settings.REQUEST_TIMEOUT_MAX > 0 else requested
+    return timeout if timeout > 0 else None
+
+
+def parse_allow_partial(value: Optional[bytes]) -> bool:
+    """X-Partial-Results header ("true"/"false"), else PARTIAL_RESULTS"""
+    if value is None:
+        return settings.PARTIAL_RESULTS
+    return value.strip().lower() in (b"1", b"true", b"yes")
+
+
+def begin_request_deadline(timeout: Optional[float] = None, allow_partial: bool = False) -> RequestDeadline:
+    """Bind a fresh RequestDeadline to the current context"""
+    deadline = RequestDeadline(timeout, allow_partial)
+    _current_deadline.set(deadline)
+    return deadline
+
+
+def current_deadline() -> Optional[RequestDeadline]:
+    return _current_deadline.get()
+
+
+def check_deadline(stage: str, pending: int = 0, can_stop: bool = False) -> bool:
+    """Check the current request's deadline (always True outside a request), see RequestDeadline.check"""
+    deadline = _current_deadline.get()
+    if deadline is None:
+        return True
+    return deadline.check(stage, pending, can_stop)
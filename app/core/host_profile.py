@@ -0,0 +1,108 @@
+"""
+Calibrated settings per host type
+
+`python -m app calibrate` (app.services.calibration) measures a few
+candidate configurations on this machine and stores the best one in
+CALIBRATION_FILE, keyed by host type (CPU model, core budget and worker
+count), so a file shared between instances holds one profile per
+instance type:
+    {"<host key>": {"settings": {"RECOGNITION_BATCH_SIZE": 16, ...},
+                    "calibrated_at": ..., "measurements": [...]}}
+
+At startup the profile of the current host type is applied before the
+thread budget is planned. Settings given explicitly (environment or
+.env) always win over the profile.
+"""
+import json
+import os
+import platform
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+from app.core.config import settings
+from app.core.logger import logger
+
+# Settings a profile may set
+PROFILE_SETTINGS = ("RECOGNITION_BATCH_SIZE", "THREADS_PER_WORKER", "INFERENCE_CONCURRENCY")
+
+_applied: Dict[str, object] = {}
+
+
+def cpu_model() -> str:
+    """CPU model name from /proc/cpuinfo, else what platform reports"""
+    try:
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key.strip() == "model name":
+                    return " ".join(value.split())
+    except OSError:
+        pass
+    return platform.processor() or platform.machine()
+
+
+def host_key(cpus: int, workers: int) -> str:
+    """Host type a profile applies to"""
+    return f"{cpu_model()} / {cpus} cpus / {workers} workers"
+
+
+def load_profiles() -> Dict[str, Dict]:
+    """All profiles in CALIBRATION_FILE ({} when missing or unreadable)"""
+    try:
+        with open(settings.CALIBRATION_FILE, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logger.error("Ignoring unreadable calibration file %s: %s", settings.CALIBRATION_FILE, e)
+        return {}
+
+
+def find_profile(key: str) -> Optional[Dict]:
+    return load_profiles().get(key)
+
+
+def save_profile(key: str, chosen: Dict[str, int], measurements: list) -> Dict:
+    """Store the chosen settings for a host type, keeping other host types' profiles"""
+    profiles = load_profiles()
+    profiles[key] = {
+        "settings": chosen,
+        "calibrated_at": time.time(),
+        "measurements": measurements,
+    }
+    path = Path(settings.CALIBRATION_FILE)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(profiles, indent=2), encoding="utf-8")
+    os.replace(tmp, path)
+    return profiles[key]
+
+
+def apply_host_profile(cpus: int, workers: int) -> Dict[str, object]:
+    """
+    Apply the profile of this host type to settings
+
+    Args:
+        cpus: Core budget of the whole server
+        workers: Worker processes
+
+    Returns:
+        Settings that were changed
+    """
+    key = host_key(cpus, workers)
+    profile = find_profile(key)
+    if profile is None:
+        return {}
+    for name, value in profile.get("settings", {}).items():
+        if name not in PROFILE_SETTINGS or name in settings.model_fields_set:
+            continue
+        setattr(settings, name, value)
+        _applied[name] = value
+    logger.info("Applied calibration profile for %r: %s", key, _applied)
+    return dict(_applied)
+
+
+def applied_profile() -> Dict[str, object]:
+    """Settings taken from the calibration profile in this process"""
+    return dict(_applied)
@@ -1,31 +1,203 @@
+"""
+Application logger
+
+Records are put on a queue and formatted and written to stdout by a
+background thread, so request threads never wait on the console. Output
+is one JSON object per line (LOG_FORMAT=json) or plain text, tagged with
+the id of the request that logged it (see RequestLogMiddleware).
+
+Pipeline code logs per-stage details at DEBUG with lazy %-style
+arguments. Within a request they are written only for a
+LOG_VERBOSE_SAMPLE_RATE fraction of requests (all of them with
+LOG_LEVEL=DEBUG); every request also gets one INFO summary line.
+"""
+import atexit
+import json
 import logging
+import os
+import queue
+import random
 import sys
-from pathlib import Path
+import time
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from typing import List, Optional
+
+from app.core.config import settings
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s"
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Arguments of these types cannot change before the writer thread formats them
+_IMMUTABLE_ARGS = (str, int, float, bool, bytes, type(None))
+
+_request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+_verbose: ContextVar[bool] = ContextVar("verbose_logging", default=False)
+
+
+def begin_request_log(request_id: str) -> bool:
+    """
+    Bind a request id to the current context and sample it for verbose logs
+
+    Returns:
+        True if the request's DEBUG records are written
+    """
+    _request_id.set(request_id)
+    verbose = random.random() < settings.LOG_VERBOSE_SAMPLE_RATE
+    _verbose.set(verbose)
+    return verbose
+
+
+def current_request_id() -> Optional[str]:
+    return _request_id.get()
+
+
+class RequestContextFilter(logging.Filter):
+    """
+    Tags records with the request id; drops records below the configured
+    level unless the current request was sampled for verbose logs
+    """
+
+    def __init__(self, level: int):
+        super().__init__()
+        self.level = level
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < self.level and not _verbose.get():
+            return False
+        record.request_id = _request_id.get() or "-"
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per record
+
+    Structured values passed as extra={"fields": {...}} become top-level keys.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "pid": record.process,
+            "location": f"{record.module}:{record.lineno}",
+        }
+        request_id = getattr(record, "request_id", "-")
+        if request_id != "-":
+            entry["request_id"] = request_id
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(fields)
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class LazyQueueHandler(QueueHandler):
+    """
+    QueueHandler that leaves message formatting to the writer thread
+
+    The stdlib handler formats in the calling thread; here that only
+    happens when an argument is mutable and could change before the
+    writer gets to it.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        args = record.args
+        if args:
+            values = args.values() if isinstance(args, dict) else args
+            if not all(isinstance(value, _IMMUTABLE_ARGS) for value in values):
+                record.msg = record.getMessage()
+                record.args = None
+        return record
+
 
+class AsyncLogWriter:
+    """Background thread writing queued records to a handler"""
+
+    def __init__(self, handler: LazyQueueHandler, target: logging.Handler):
+        self.handler = handler
+        self.target = target
+        self.listener: Optional[QueueListener] = None
+
+    def start(self) -> None:
+        if self.listener is None:
+            self.listener = QueueListener(self.handler.queue, self.target)
+            self.listener.start()
+
+    def stop(self) -> None:
+        """Write everything queued so far and stop the thread"""
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+
+    def restart_in_child(self) -> None:
+        # The writer thread does not survive fork; start over on a fresh queue
+        self.listener = None
+        self.handler.queue = queue.SimpleQueue()
+        self.start()
+
+
+_writers: List[AsyncLogWriter] = []
+
+
+def _stop_writers() -> None:
+    for writer in _writers:
+        writer.stop()
+
+
+def _start_writers() -> None:
+    for writer in _writers:
+        writer.start()
+
+
+def _restart_writers_in_child() -> None:
+    for writer in _writers:
+        writer.restart_in_child()
+
+
+# Drain before fork (pre-fork server) so no record is lost or written twice
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(
+        before=_stop_writers, after_in_parent=_start_writers, after_in_child=_restart_writers_in_child
+    )
+atexit.register(_stop_writers)
+
+
+def setup_logger(name: str = "ocr_api", level: Optional[int] = None) -> logging.Logger:
+    """Setup logger writing through a background thread (LOG_LEVEL and LOG_FORMAT settings by default)"""
 
-def setup_logger(name: str = "ocr_api", level: int = logging.INFO) -> logging.Logger:
-    """Setup logger with console handler"""
-    
     logger = logging.getLogger(name)
-    logger.setLevel(level)
-    
+
     # Avoid duplicate handlers
     if logger.handlers:
         return logger
-    
-    # Console handler
+
+    if level is None:
+        level = logging.getLevelName(settings.LOG_LEVEL.upper())
+
+    # Console handler, driven by the writer thread
     console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setLevel(level)
-    
-    # Formatter
-    formatter = logging.Formatter(
-        fmt="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-        datefmt="%Y-%m-%d %H:%M:%S"
-    )
-    console_handler.setFormatter(formatter)
-    
-    logger.addHandler(console_handler)
-    
+    if settings.LOG_FORMAT == "json":
+        console_handler.setFormatter(JsonFormatter())
+    else:
+        console_handler.setFormatter(logging.Formatter(fmt=TEXT_FORMAT, datefmt=DATE_FORMAT))
+
+    queue_handler = LazyQueueHandler(queue.SimpleQueue())
+    writer = AsyncLogWriter(queue_handler, console_handler)
+    _writers.append(writer)
+    writer.start()
+
+    # Sampled requests need DEBUG records to reach the filter
+    logger.setLevel(min(level, logging.DEBUG) if settings.LOG_VERBOSE_SAMPLE_RATE > 0 else level)
+    logger.addFilter(RequestContextFilter(level))
+    logger.addHandler(queue_handler)
+    # Libraries (paddle) configure the root logger; do not print records twice
+    logger.propagate = False
+
     return logger
 
 
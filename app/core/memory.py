@@ -0,0 +1,209 @@
+"""
+Memory guardrails
+
+Paddle and OpenCV allocations fragment the heap, so a worker's RSS creeps
+up over many documents of varied sizes. Three guards keep it bounded:
+
+- Accounting: MemoryGuardMiddleware records the worker's RSS growth while
+  each request ran (rss_delta_kib in the request summary, approximate when
+  requests overlap) and traces a MEMORY_TRACE_SAMPLE_RATE fraction of
+  requests with tracemalloc (Python and numpy allocations only).
+- Recycling: a pre-fork worker stops accepting and exits gracefully after
+  MAX_REQUESTS_PER_WORKER requests (plus up to MAX_REQUESTS_JITTER) or once
+  its RSS exceeds WORKER_MAX_RSS_MB; the master forks a fresh one.
+- Admission: images whose projected pipeline memory is over
+  IMAGE_MEMORY_BUDGET_MB are rejected from the dimensions in their header,
+  before they are decoded.
+"""
+import os
+import random
+import signal
+import struct
+import threading
+import tracemalloc
+from typing import Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.core.metrics import observe_image_rejected, observe_worker_recycle
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+_MIB = 1024 * 1024
+
+# JPEG start-of-frame markers (carry the image size); C4, C8 and CC are other segments
+_JPEG_SOF = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+class ImageTooLarge(ValueError):
+    """An image exceeds the memory budget"""
+
+
+def current_rss() -> int:
+    """Resident memory of this process in bytes (0 if unavailable, e.g. not Linux)"""
+    try:
+        # Opened per call: /proc/self must resolve to this process after a fork
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return 0
+
+
+def image_dimensions(data: bytes) -> Optional[Tuple[int, int]]:
+    """
+    (width, height) from a PNG or JPEG header, without decoding
+
+    Returns:
+        Dimensions, or None for other formats or a truncated header
+    """
+    if data[:8] == b"\x89PNG\r\n\x1a\n" and data[12:16] == b"IHDR" and len(data) >= 24:
+        return struct.unpack(">II", data[16:24])
+
+    if data[:2] == b"\xff\xd8":
+        i = 2
+        while i + 4 <= len(data):
+            if data[i] != 0xFF:
+                return None
+            marker = data[i + 1]
+            if marker == 0xFF:  # Fill byte
+                i += 1
+                continue
+            if marker in (0x01, 0xD8) or 0xD0 <= marker <= 0xD7:  # Markers without a length
+                i += 2
+                continue
+            length = struct.unpack(">H", data[i + 2:i + 4])[0]
+            if marker in _JPEG_SOF:
+                if i + 9 > len(data):
+                    return None
+                height, width = struct.unpack(">HH", data[i + 5:i + 9])
+                return width, height
+            i += 2 + length
+    return None
+
+
+def projected_image_memory(width: int, height: int) -> int:
+    """Rough peak pipeline memory for an image: decoded BGR pixels times IMAGE_MEMORY_FACTOR"""
+    return int(width * height * 3 * settings.IMAGE_MEMORY_FACTOR)
+
+
+def check_image_memory(data: bytes) -> None:
+    """
+    Reject an encoded image before decoding when it would not fit the memory budget
+
+    Raises:
+        ImageTooLarge: Projected memory over IMAGE_MEMORY_BUDGET_MB
+    """
+    dimensions = image_dimensions(data)
+    if dimensions is None or settings.IMAGE_MEMORY_BUDGET_MB <= 0:
+        return
+    width, height = dimensions
+    projected = projected_image_memory(width, height)
+    if projected > settings.IMAGE_MEMORY_BUDGET_MB * _MIB:
+        observe_image_rejected("memory")
+        raise ImageTooLarge(
+            f"Image of {width}x{height} needs about {projected / _MIB:.0f} MiB, "
+            f"budget is {settings.IMAGE_MEMORY_BUDGET_MB:.0f} MiB"
+        )
+
+
+# One traced request at a time: tracemalloc is process-wide
+_trace_lock = threading.Lock()
+
+
+def start_trace() -> bool:
+    """
+    Start tracing allocations for a sampled request (MEMORY_TRACE_SAMPLE_RATE)
+
+    Returns:
+        True if tracing started; call stop_trace when the request ends
+    """
+    if settings.MEMORY_TRACE_SAMPLE_RATE <= 0 or random.random() >= settings.MEMORY_TRACE_SAMPLE_RATE:
+        return False
+    if tracemalloc.is_tracing() or not _trace_lock.acquire(blocking=False):
+        return False
+    tracemalloc.start(settings.MEMORY_TRACE_FRAMES)
+    return True
+
+
+def stop_trace() -> Dict[str, object]:
+    """
+    Stop tracing and summarize what the request allocated
+
+    Returns:
+        {"traced_peak_kib", "traced_kib", "top": ["file:line size", ...]}
+    """
+    try:
+        current, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+    finally:
+        _trace_lock.release()
+    stats = snapshot.statistics("lineno")[:settings.MEMORY_TRACE_TOP]
+    top: List[str] = [
+        f"{stat.traceback[0].filename}:{stat.traceback[0].lineno} {stat.size // 1024} KiB" for stat in stats
+    ]
+    return {"traced_peak_kib": peak // 1024, "traced_kib": current // 1024, "top": top}
+
+
+class WorkerRecycler:
+    """
+    Decides when this pre-fork worker should be replaced
+
+    Checked after every request; once a limit is hit the worker sends
+    itself SIGTERM, which makes uvicorn stop accepting, finish in-flight
+    requests and exit. The master then forks a replacement.
+    """
+
+    def __init__(self, max_requests: int, jitter: int, max_rss_mb: float):
+        self.max_requests = max_requests + random.randint(0, jitter) if max_requests > 0 else 0
+        self.max_rss = int(max_rss_mb * _MIB)
+        self.requests = 0
+        self.recycling = False
+
+    def after_request(self, rss: int) -> Optional[str]:
+        """
+        Count a finished request
+
+        Args:
+            rss: Current RSS in bytes
+
+        Returns:
+            Recycle reason ("requests" or "rss") the first time a limit is hit, else None
+        """
+        self.requests += 1
+        if self.recycling:
+            return None
+        if self.max_requests and self.requests >= self.max_requests:
+            reason = "requests"
+        elif self.max_rss and rss > self.max_rss:
+            reason = "rss"
+        else:
+            return None
+        self.recycling = True
+        return reason
+
+
+_recycler: Optional[WorkerRecycler] = None
+
+
+def enable_recycling() -> None:
+    """Turn on recycling in this process (pre-fork workers only: the master replaces them)"""
+    global _recycler
+    if settings.MAX_REQUESTS_PER_WORKER > 0 or settings.WORKER_MAX_RSS_MB > 0:
+        _recycler = WorkerRecycler(
+            settings.MAX_REQUESTS_PER_WORKER, settings.MAX_REQUESTS_JITTER, settings.WORKER_MAX_RSS_MB
+        )
+
+
+def note_request_done(rss: int) -> None:
+    """Count a request towards recycling and start a graceful exit when a limit is hit"""
+    if _recycler is None:
+        return
+    reason = _recycler.after_request(rss)
+    if reason is None:
+        return
+    observe_worker_recycle(reason)
+    logger.info(
+        "Recycling worker (pid %d) after %d requests, rss %.1f MiB: %s limit reached",
+        os.getpid(), _recycler.requests, rss / _MIB, reason
+    )
+    os.kill(os.getpid(), signal.SIGTERM)
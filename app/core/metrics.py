@@ -0,0 +1,387 @@
+import time
+import functools
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Callable, Dict, Iterable, Iterator, Optional
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from prometheus_client import Counter, Gauge, Histogram
+from app.core.timing import record_stage, record_count
+
+
+# Latency buckets from 1ms to 30s (OCR stages range from sub-ms to seconds)
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0
+)
+BOX_BUCKETS = (0, 5, 10, 25, 50, 100, 200, 300, 500, 1000, 2000)
+
+STAGE_LATENCY = Histogram(
+    "ocr_stage_duration_seconds",
+    "Duration of each OCR pipeline stage",
+    ["stage"],
+    buckets=LATENCY_BUCKETS
+)
+REQUEST_LATENCY = Histogram(
+    "ocr_request_duration_seconds",
+    "Duration of OCR endpoint calls",
+    ["endpoint"],
+    buckets=LATENCY_BUCKETS
+)
+IN_FLIGHT = Gauge(
+    "ocr_requests_in_flight",
+    "OCR endpoint calls currently being processed",
+    ["endpoint"],
+    multiprocess_mode="livesum"
+)
+DOCUMENT_BOXES = Histogram(
+    "ocr_document_boxes",
+    "Number of detected text boxes per document",
+    buckets=BOX_BUCKETS
+)
+LAST_DOCUMENT_BOXES = Gauge(
+    "ocr_last_document_boxes",
+    "Number of detected text boxes in the most recent document",
+    multiprocess_mode="mostrecent"
+)
+ERRORS = Counter(
+    "ocr_errors_total",
+    "OCR endpoint errors by type",
+    ["endpoint", "type"]
+)
+DETECTION_PATH = Counter(
+    "ocr_detection_path_total",
+    "Documents by detection path (single, coarse, fine)",
+    ["path"]
+)
+RECOGNITION_BOXES = Counter(
+    "ocr_recognition_boxes_total",
+    "Detected boxes recognized or skipped by field-first recognition",
+    ["result"]
+)
+ABORTED_REQUESTS = Counter(
+    "ocr_aborted_requests_total",
+    "Requests whose pipeline stopped early, by reason (deadline, disconnect) and stage",
+    ["reason", "stage"]
+)
+ABORTED_WORK_SECONDS = Counter(
+    "ocr_aborted_work_seconds_total",
+    "Time spent on requests before they were abandoned and their result discarded",
+    ["reason"]
+)
+ABORTED_SKIPPED_BOXES = Counter(
+    "ocr_aborted_skipped_boxes_total",
+    "Detected boxes left unrecognized because their request stopped early",
+    ["reason"]
+)
+CLIENT_QUEUE_WAIT = Histogram(
+    "ocr_client_queue_wait_seconds",
+    "Time requests waited for an inference slot, per API client",
+    ["client"],
+    buckets=LATENCY_BUCKETS
+)
+CLIENT_DOCUMENTS = Counter(
+    "ocr_client_documents_total",
+    "Documents processed per API client, by outcome (ok, aborted, error)",
+    ["client", "outcome"]
+)
+CLIENT_INFERENCE_SECONDS = Counter(
+    "ocr_client_inference_seconds_total",
+    "Time spent holding an inference slot per API client",
+    ["client"]
+)
+CLIENT_QUEUED = Gauge(
+    "ocr_client_queued_requests",
+    "Requests waiting for an inference slot per API client",
+    ["client"],
+    multiprocess_mode="livesum"
+)
+CLIENT_RATE_LIMITED = Counter(
+    "ocr_client_rate_limited_total",
+    "Requests rejected by the per-key rate limit",
+    ["client"]
+)
+MODEL_INFO = Gauge(
+    "ocr_model_info",
+    "Model version active in each worker (1 = active)",
+    ["role", "version"],
+    multiprocess_mode="liveall"
+)
+MODEL_SWAPS = Counter(
+    "ocr_model_swaps_total",
+    "Hot swaps of the active model set"
+)
+SHADOW_RUNS = Counter(
+    "ocr_shadow_runs_total",
+    "Sampled requests replayed on the shadow candidate (compared, dropped while busy, error)",
+    ["result"]
+)
+SHADOW_LATENCY = Histogram(
+    "ocr_shadow_pipeline_seconds",
+    "Pipeline time of shadowed requests on the active model and on the candidate",
+    ["model"],
+    buckets=LATENCY_BUCKETS
+)
+SHADOW_MISMATCHES = Counter(
+    "ocr_shadow_mismatches_total",
+    "Shadowed requests whose candidate output differs (fields, boxes, texts)",
+    ["kind"]
+)
+SHADOW_TEXT_SIMILARITY = Histogram(
+    "ocr_shadow_text_similarity",
+    "Similarity of the recognized text of active model and candidate (1 = identical)",
+    buckets=(0.5, 0.8, 0.9, 0.95, 0.98, 0.99, 1.0)
+)
+STARTUP_SECONDS = Gauge(
+    "ocr_startup_seconds",
+    "Server startup time by phase (import, load, warmup)",
+    ["phase"],
+    multiprocess_mode="liveall"
+)
+THREAD_CONFIG = Gauge(
+    "ocr_thread_config",
+    "Effective CPU thread budget of each worker",
+    ["setting"],
+    multiprocess_mode="liveall"
+)
+WORKER_MEMORY = Gauge(
+    "ocr_worker_memory_bytes",
+    "Resident memory of each pre-fork worker (rss, pss, shared, private)",
+    ["worker", "kind"],
+    multiprocess_mode="max"
+)
+REQUEST_RSS_GROWTH = Histogram(
+    "ocr_request_rss_growth_bytes",
+    "Worker RSS growth while a request ran (shrinking counts as 0)",
+    buckets=(0, 1 << 20, 4 << 20, 16 << 20, 64 << 20, 256 << 20, 1 << 30)
+)
+WORKER_RECYCLES = Counter(
+    "ocr_worker_recycles_total",
+    "Pre-fork workers recycled, by limit reached (requests, rss)",
+    ["reason"]
+)
+IMAGES_REJECTED = Counter(
+    "ocr_images_rejected_total",
+    "Images rejected before decoding (memory)",
+    ["reason"]
+)
+PIPELINE_BUSY_SECONDS = Counter(
+    "ocr_pipeline_stage_busy_seconds_total",
+    "Time pipeline stage workers spent processing (rate / stage workers = utilization)",
+    ["stage"]
+)
+PIPELINE_QUEUE_WAIT = Histogram(
+    "ocr_pipeline_queue_wait_seconds",
+    "Time documents waited in a pipeline stage's inbox",
+    ["stage"],
+    buckets=LATENCY_BUCKETS
+)
+PIPELINE_QUEUE_DEPTH = Gauge(
+    "ocr_pipeline_queue_depth",
+    "Documents waiting in each pipeline stage's inbox",
+    ["stage"],
+    multiprocess_mode="livesum"
+)
+
+# Gauges declare a multiprocess_mode for the pre-fork server (app.server),
+# which runs with PROMETHEUS_MULTIPROC_DIR set; it is ignored otherwise.
+
+# Set while replaying requests on a shadow model, so its work stays out of the pipeline metrics
+_metrics_suppressed: ContextVar[bool] = ContextVar("metrics_suppressed", default=False)
+
+
+@contextmanager
+def suppress_metrics() -> Iterator[None]:
+    """Skip stage/document metrics recorded by the enclosed block"""
+    token = _metrics_suppressed.set(True)
+    try:
+        yield
+    finally:
+        _metrics_suppressed.reset(token)
+
+
+# Labelled children are cached so the hot path skips label resolution
+_stage_children: Dict[str, Histogram] = {}
+
+
+def _stage_histogram(stage: str) -> Histogram:
+    child = _stage_children.get(stage)
+    if child is None:
+        child = _stage_children[stage] = STAGE_LATENCY.labels(stage)
+    return child
+
+
+def observe_stage(stage: str, seconds: float) -> None:
+    """Record the duration of one pipeline stage (metrics and current request timings)"""
+    if _metrics_suppressed.get():
+        return
+    _stage_histogram(stage).observe(seconds)
+    record_stage(stage, seconds)
+
+
+@contextmanager
+def track_stage(stage: str) -> Iterator[None]:
+    """Time the enclosed block as one pipeline stage"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start)
+
+
+def observe_document(n_boxes: int) -> None:
+    """Record the number of boxes detected in a document"""
+    if _metrics_suppressed.get():
+        return
+    DOCUMENT_BOXES.observe(n_boxes)
+    LAST_DOCUMENT_BOXES.set(n_boxes)
+    record_count("boxes", n_boxes)
+
+
+def observe_startup(phases: Dict[str, float]) -> None:
+    """Record the startup breakdown, in seconds per phase"""
+    for phase, seconds in phases.items():
+        STARTUP_SECONDS.labels(phase).set(seconds)
+
+
+def observe_thread_config(config: Dict[str, object]) -> None:
+    """Export the numeric entries of the effective thread configuration"""
+    for setting in ("cpus_available", "workers", "threads_per_worker", "opencv_threads", "paddle_threads"):
+        THREAD_CONFIG.labels(setting).set(config[setting])
+    if config.get("affinity") is not None:
+        THREAD_CONFIG.labels("affinity_cpus").set(len(config["affinity"]))
+
+
+def observe_detection_path(path: str, resize_long: int) -> None:
+    """Record which detection path a document took and at which resolution"""
+    if _metrics_suppressed.get():
+        return
+    DETECTION_PATH.labels(path).inc()
+    record_count("detection_long", resize_long)
+
+
+def observe_recognition(recognized: int, total: int) -> None:
+    """Record how many of a document's boxes field-first recognition read"""
+    if _metrics_suppressed.get():
+        return
+    RECOGNITION_BOXES.labels("recognized").inc(recognized)
+    RECOGNITION_BOXES.labels("skipped").inc(total - recognized)
+    record_count("recognized", recognized)
+
+
+def observe_abort(reason: str, stage: str, wasted_seconds: float, skipped_boxes: int) -> None:
+    """Record a request that stopped early: work wasted before the stop and boxes saved by it"""
+    ABORTED_REQUESTS.labels(reason, stage).inc()
+    ABORTED_WORK_SECONDS.labels(reason).inc(wasted_seconds)
+    ABORTED_SKIPPED_BOXES.labels(reason).inc(skipped_boxes)
+
+
+def observe_pipeline_stage(stage: str, wait_seconds: float, busy_seconds: float) -> None:
+    """Record one document passing a pipeline stage: inbox wait and processing time"""
+    PIPELINE_QUEUE_WAIT.labels(stage).observe(wait_seconds)
+    PIPELINE_BUSY_SECONDS.labels(stage).inc(busy_seconds)
+
+
+def set_pipeline_queue_depth(stage: str, depth: int) -> None:
+    PIPELINE_QUEUE_DEPTH.labels(stage).set(depth)
+
+
+def observe_request_memory(rss_delta: int) -> None:
+    REQUEST_RSS_GROWTH.observe(max(rss_delta, 0))
+
+
+def observe_worker_recycle(reason: str) -> None:
+    WORKER_RECYCLES.labels(reason).inc()
+
+
+def observe_image_rejected(reason: str) -> None:
+    IMAGES_REJECTED.labels(reason).inc()
+
+
+def observe_rate_limited(client: str) -> None:
+    CLIENT_RATE_LIMITED.labels(client).inc()
+
+
+def observe_client_document(client: str, outcome: str, queue_seconds: float, inference_seconds: float) -> None:
+    """Record one document of an API client: queue wait, slot time and outcome"""
+    CLIENT_QUEUE_WAIT.labels(client).observe(queue_seconds)
+    CLIENT_INFERENCE_SECONDS.labels(client).inc(inference_seconds)
+    CLIENT_DOCUMENTS.labels(client, outcome).inc()
+
+
+def observe_model_swap(versions: Dict[str, str], old_versions: Optional[Dict[str, str]] = None) -> None:
+    """Export the active model versions (old_versions given: count a swap)"""
+    if old_versions is not None:
+        MODEL_SWAPS.inc()
+        for role, version in old_versions.items():
+            MODEL_INFO.labels(role, version).set(0)
+    for role, version in versions.items():
+        MODEL_INFO.labels(role, version).set(1)
+
+
+def observe_shadow(result: str, active_seconds: float = 0.0, candidate_seconds: float = 0.0,
+                   mismatches: Iterable[str] = (), text_similarity: Optional[float] = None) -> None:
+    """Record one shadow replay"""
+    SHADOW_RUNS.labels(result).inc()
+    if result != "compared":
+        return
+    SHADOW_LATENCY.labels("active").observe(active_seconds)
+    SHADOW_LATENCY.labels("candidate").observe(candidate_seconds)
+    for kind in mismatches:
+        SHADOW_MISMATCHES.labels(kind).inc()
+    if text_similarity is not None:
+        SHADOW_TEXT_SIMILARITY.observe(text_similarity)
+
+
+def error_type(exc: BaseException) -> str:
+    """Metric label for an exception: HTTP status for HTTPException, else class name"""
+    if isinstance(exc, HTTPException):
+        return f"http_{exc.status_code}"
+    return type(exc).__name__
+
+
+def instrument_endpoint(endpoint: str) -> Callable:
+    """
+    Decorator for async endpoints: in-flight gauge, latency and errors
+
+    The wrapped function keeps its signature, so FastAPI dependency
+    injection is unaffected. For a StreamingResponse the request stays in
+    flight and its latency is recorded until the stream ends.
+    """
+    latency = REQUEST_LATENCY.labels(endpoint)
+    in_flight = IN_FLIGHT.labels(endpoint)
+
+    def finish(start: float) -> None:
+        latency.observe(time.perf_counter() - start)
+        in_flight.dec()
+
+    async def observe_stream(body: AsyncIterator, start: float) -> AsyncIterator:
+        try:
+            async for chunk in body:
+                yield chunk
+        except Exception as e:
+            ERRORS.labels(endpoint, error_type(e)).inc()
+            raise
+        finally:
+            finish(start)
+
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            in_flight.inc()
+            start = time.perf_counter()
+            streaming = False
+            try:
+                response = await func(*args, **kwargs)
+                if isinstance(response, StreamingResponse):
+                    response.body_iterator = observe_stream(response.body_iterator, start)
+                    streaming = True
+                return response
+            except Exception as e:
+                ERRORS.labels(endpoint, error_type(e)).inc()
+                raise
+            finally:
+                if not streaming:
+                    finish(start)
+        return wrapper
+
+    return decorator
@@ -1,55 +1,349 @@
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
+import hmac
+import math
+import re
+import time
+import uuid
+from typing import Iterable, Optional
+from starlette.datastructures import MutableHeaders
 from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from starlette.websockets import WebSocketClose
 from fastapi import status
 from app.core.config import settings
-from app.core.logger import logger
+from app.core.logger import logger, begin_request_log
+from app.core.timing import begin_request_timings, current_timings, record_count
+from app.core.memory import current_rss, note_request_done, start_trace, stop_trace
+from app.core.api_keys import APIClient, load_api_clients, set_current_client, current_client
+from app.core.metrics import observe_rate_limited, observe_request_memory
+from app.core.deadline import begin_request_deadline, parse_timeout, parse_allow_partial
+from app.core.profiling import (
+    profiling_available, is_profile_authorized, new_profile_id, start_profiler, save_profile
+)
 
 
-class APIKeyMiddleware(BaseHTTPMiddleware):
+def _get_header(scope: Scope, name: bytes):
+    """First value of a header in an ASGI scope (name lowercase), or None"""
+    for key, value in scope["headers"]:
+        if key == name:
+            return value
+    return None
+
+
+class APIKeyMiddleware:
     """
     Middleware to validate API Key from request header
     Client must send API Key in header: X-API-Key
+
+    Each key belongs to an APIClient (see app.core.api_keys); the matched
+    client is bound to the request context and its token bucket checked,
+    so over-rate requests get a 429 before their body is read.
+
+    Implemented as a plain ASGI middleware (no BaseHTTPMiddleware task hop
+    or body buffering), so streaming responses pass through untouched.
     """
-    
+
     # Paths that don't require authentication
-    EXCLUDED_PATHS = [
+    EXCLUDED_PATHS = frozenset({
         "/",
         "/health",
+        "/health/live",
+        "/health/ready",
+        "/metrics",
         "/docs",
         "/openapi.json",
         "/redoc"
-    ]
-    
-    async def dispatch(self, request: Request, call_next):
-        # Skip authentication for excluded paths
-        if request.url.path in self.EXCLUDED_PATHS:
-            return await call_next(request)
-        
-        # Get API Key from header
-        api_key = request.headers.get("X-API-Key") or request.headers.get("x-api-key")
-        
-        # Check if API Key is provided
+    })
+
+    HEADER_NAME = b"x-api-key"
+
+    def __init__(self, app: ASGIApp, clients: Optional[Iterable[APIClient]] = None):
+        self.app = app
+        if clients is None:
+            clients = load_api_clients()
+        # Empty keys never authenticate
+        self.clients = [(client.key.encode("utf-8"), client) for client in clients if client.key]
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        # Skip authentication for lifespan and excluded paths
+        if scope["type"] not in ("http", "websocket") or scope["path"] in self.EXCLUDED_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        # Get API Key from header (ASGI header names are lowercase bytes)
+        api_key = _get_header(scope, self.HEADER_NAME)
+
         if not api_key:
-            logger.warning(f"Missing API Key for request: {request.url.path}")
-            return JSONResponse(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                content={
-                    "detail": "Unauthorized access"
-                }
-            )
-        
-        # Validate API Key
-        if api_key != settings.API_KEY:
-            logger.warning(f"Invalid API Key for request: {request.url.path}")
-            return JSONResponse(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                content={
-                    "detail": "Unauthorized access"
-                }
-            )
-        
+            logger.warning("Missing API Key for request: %s", scope["path"])
+            await self._reject(scope, receive, send)
+            return
+
+        client = self.find_client(api_key)
+        if client is None:
+            logger.warning("Invalid API Key for request: %s", scope["path"])
+            await self._reject(scope, receive, send)
+            return
+
+        retry_after = client.take_token()
+        if retry_after > 0:
+            observe_rate_limited(client.name)
+            await self._reject_rate_limited(scope, receive, send, retry_after)
+            return
+
         # API Key is valid, proceed with request
-        logger.debug(f"Valid API Key for request: {request.url.path}")
-        response = await call_next(request)
-        return response
\ No newline at end of file
+        set_current_client(client)
+        await self.app(scope, receive, send)
+
+    def find_client(self, api_key: bytes) -> Optional[APIClient]:
+        """Constant-time comparison against every valid key"""
+        match = None
+        for key, client in self.clients:
+            # Every key is compared: timing must not depend on which key matched
+            if hmac.compare_digest(api_key, key) and match is None:
+                match = client
+        return match
+
+    def is_valid_key(self, api_key: bytes) -> bool:
+        return self.find_client(api_key) is not None
+
+    async def _reject(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "websocket":
+            await WebSocketClose(code=status.WS_1008_POLICY_VIOLATION)(scope, receive, send)
+            return
+
+        response = JSONResponse(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            content={
+                "detail": "Unauthorized access"
+            }
+        )
+        await response(scope, receive, send)
+
+    async def _reject_rate_limited(self, scope: Scope, receive: Receive, send: Send, retry_after: float) -> None:
+        if scope["type"] == "websocket":
+            await WebSocketClose(code=status.WS_1013_TRY_AGAIN_LATER)(scope, receive, send)
+            return
+
+        response = JSONResponse(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            content={"detail": "Rate limit exceeded"},
+            headers={"Retry-After": str(math.ceil(retry_after))}
+        )
+        await response(scope, receive, send)
+
+
+class RequestLogMiddleware:
+    """
+    Request id and one summary log line per request
+
+    The id is taken from the X-Request-ID header (if it is a short token)
+    or generated, returned in the response header and attached to every
+    log record of the request (see app.core.logger). The summary carries
+    status, duration, the API client and the stage timings and counters
+    recorded by ServerTimingMiddleware, replacing per-stage INFO logs.
+    """
+
+    HEADER_NAME = b"x-request-id"
+    VALID_ID = re.compile(rb"[A-Za-z0-9._:-]{1,64}")
+
+    # Probes and scrapes would drown out the summaries
+    QUIET_PATHS = frozenset({"/health", "/health/live", "/health/ready", "/metrics"})
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        header = _get_header(scope, self.HEADER_NAME)
+        if header is not None and self.VALID_ID.fullmatch(header):
+            request_id = header.decode("ascii")
+        else:
+            request_id = uuid.uuid4().hex
+        begin_request_log(request_id)
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_with_id(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                MutableHeaders(scope=message).append("X-Request-ID", request_id)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            if scope["path"] not in self.QUIET_PATHS:
+                self._log_summary(scope, status_code, time.perf_counter() - start)
+
+    @staticmethod
+    def _log_summary(scope: Scope, status_code: int, seconds: float) -> None:
+        # Set by inner middlewares in this same task, so still visible here
+        timings = current_timings()
+        fields = {
+            "method": scope["method"],
+            "path": scope["path"],
+            "status": status_code,
+            "duration_ms": round(seconds * 1000, 2),
+            "client": current_client().name,
+        }
+        if timings is not None:
+            fields.update(timings.summary())
+        logger.info(
+            "%s %s %d %.1fms", scope["method"], scope["path"], status_code, seconds * 1000,
+            extra={"fields": fields}
+        )
+
+
+class MemoryGuardMiddleware:
+    """
+    Per-request memory accounting and worker recycling (see app.core.memory)
+
+    Records the worker's RSS growth over the request (rss_delta_kib in the
+    request summary) and, for sampled requests, what tracemalloc saw
+    (traced_peak_kib plus a log line with the top allocation sites). After
+    the response, counts the request towards recycling the worker.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] in RequestLogMiddleware.QUIET_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        rss_before = current_rss()
+        traced = start_trace()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            rss = current_rss()
+            if rss_before and rss:
+                observe_request_memory(rss - rss_before)
+                # Timings are bound by ServerTimingMiddleware in this same task
+                record_count("rss_delta_kib", (rss - rss_before) // 1024)
+            if traced:
+                trace = stop_trace()
+                record_count("traced_peak_kib", trace["traced_peak_kib"])
+                logger.info(
+                    "Memory trace of %s: peak %d KiB", scope["path"], trace["traced_peak_kib"],
+                    extra={"fields": trace}
+                )
+            note_request_done(rss)
+
+
+class ServerTimingMiddleware:
+    """
+    Adds a Server-Timing header with the per-stage durations and counters
+    recorded while handling the request (see app.core.timing)
+
+    Streamed responses (/invoice/stream) send their headers before any OCR
+    runs, so the header only covers decoding; the stream's done event
+    carries the full timings instead.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = begin_request_timings()
+
+        async def send_with_timing(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append("Server-Timing", timings.server_timing())
+            await send(message)
+
+        await self.app(scope, receive, send_with_timing)
+
+
+class DeadlineMiddleware:
+    """
+    Binds a RequestDeadline to each request (see app.core.deadline)
+
+    The budget comes from the X-Request-Timeout header (seconds) or the
+    REQUEST_TIMEOUT setting, and X-Partial-Results / PARTIAL_RESULTS decide
+    between a 504 and a partial result once it runs out after detection.
+    Partial responses carry X-Partial-Result: <stage where work stopped>.
+    Streamed responses send their headers before the work, so they report
+    a partial result in the stream's done event instead.
+    """
+
+    TIMEOUT_HEADER = b"x-request-timeout"
+    PARTIAL_HEADER = b"x-partial-results"
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        deadline = begin_request_deadline(
+            parse_timeout(_get_header(scope, self.TIMEOUT_HEADER)),
+            parse_allow_partial(_get_header(scope, self.PARTIAL_HEADER))
+        )
+
+        async def send_with_partial(message: Message) -> None:
+            if message["type"] == "http.response.start" and deadline.partial:
+                MutableHeaders(scope=message).append("X-Partial-Result", deadline.aborted_stage)
+            await send(message)
+
+        await self.app(scope, receive, send_with_partial)
+
+
+class ProfilingMiddleware:
+    """
+    Runs a single request under a sampling profiler on demand
+
+    Requests carrying X-Debug-Profile: <PROFILE_TOKEN> are profiled; the
+    HTML report is stored under PROFILE_DIR and its id returned in the
+    X-Profile-Id response header (fetch it from /debug/profiles/<id>).
+    """
+
+    HEADER_NAME = b"x-debug-profile"
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not profiling_available() or scope["path"].startswith("/debug/"):
+            await self.app(scope, receive, send)
+            return
+
+        token = _get_header(scope, self.HEADER_NAME)
+        if token is None:
+            await self.app(scope, receive, send)
+            return
+
+        if not is_profile_authorized(token):
+            logger.warning("Invalid profile token for request: %s", scope["path"])
+            await self.app(scope, receive, send)
+            return
+
+        profiler = start_profiler()
+        if profiler is None:
+            # Another request is already being profiled
+            await self.app(scope, receive, self._with_header(send, "X-Profile-Status", "busy"))
+            return
+
+        profile_id = new_profile_id()
+        try:
+            await self.app(scope, receive, self._with_header(send, "X-Profile-Id", profile_id))
+        finally:
+            await save_profile(profiler, profile_id)
+
+    @staticmethod
+    def _with_header(send: Send, name: str, value: str) -> Send:
+        async def wrapped(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append(name, value)
+            await send(message)
+        return wrapped
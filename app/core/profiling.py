@@ -0,0 +1,120 @@
+import hmac
+import uuid
+import threading
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Optional
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.core.logger import logger
+
+try:
+    from pyinstrument import Profiler
+    from pyinstrument.renderers import HTMLRenderer
+    from pyinstrument.session import Session
+except ImportError:  # Profiling is optional
+    Profiler = None
+
+
+def profiling_available() -> bool:
+    """Whether on-demand profiling is enabled and supported"""
+    return Profiler is not None and bool(settings.PROFILE_TOKEN)
+
+
+def is_profile_authorized(token: Optional[bytes]) -> bool:
+    """Constant-time check of the debug profile token"""
+    if not token or not settings.PROFILE_TOKEN:
+        return False
+    return hmac.compare_digest(token, settings.PROFILE_TOKEN.encode("utf-8"))
+
+
+def new_profile_id() -> str:
+    return uuid.uuid4().hex
+
+
+def profile_path(profile_id: str) -> Path:
+    """Location of a stored profile; ids are hex only, so no path traversal"""
+    if not profile_id or any(c not in "0123456789abcdef" for c in profile_id):
+        raise ValueError(f"Invalid profile id: {profile_id!r}")
+    return Path(settings.PROFILE_DIR) / f"{profile_id}.html"
+
+
+# The sampler hooks the interpreter per thread, so profile one request at a time
+_profile_lock = threading.Lock()
+# Sessions of the worker threads that ran the profiled request's pipeline
+_thread_sessions: ContextVar[Optional[list]] = ContextVar("profile_thread_sessions", default=None)
+
+
+def is_request_profiled() -> bool:
+    """Whether the current request runs under the profiler"""
+    return _thread_sessions.get() is not None
+
+
+def profile_call(func, *args):
+    """
+    Run func in this (threadpool) thread under its own sampler
+
+    The request's profiler samples the event loop thread only; the
+    session recorded here is merged into its report by save_profile.
+    """
+    profiler = Profiler(interval=settings.PROFILE_INTERVAL, async_mode="disabled")
+    profiler.start()
+    try:
+        return func(*args)
+    finally:
+        profiler.stop()
+        sessions = _thread_sessions.get()
+        if sessions is not None:
+            sessions.append(profiler.last_session)
+
+
+def start_profiler():
+    """
+    Start a sampling profiler for the current request task
+
+    Returns:
+        Running profiler, or None if another request is being profiled
+    """
+    if not _profile_lock.acquire(blocking=False):
+        return None
+    try:
+        profiler = Profiler(interval=settings.PROFILE_INTERVAL, async_mode="enabled")
+        profiler.start()
+        _thread_sessions.set([])
+        return profiler
+    except Exception:
+        _profile_lock.release()
+        raise
+
+
+async def save_profile(profiler, profile_id: str) -> Optional[Path]:
+    """
+    Stop the profiler and store its HTML report, pipeline thread samples included
+
+    The profiler is stopped on the event loop thread that started it; the
+    report is rendered and written in the threadpool so other requests on
+    the worker are not held up.
+    """
+    try:
+        try:
+            profiler.stop()
+        finally:
+            _profile_lock.release()
+    except Exception as e:
+        logger.error("Failed to stop profiler for %s: %s", profile_id, e, exc_info=True)
+        return None
+    return await run_in_threadpool(_write_profile, profiler.last_session, _thread_sessions.get() or [], profile_id)
+
+
+def _write_profile(session, thread_sessions: list, profile_id: str) -> Optional[Path]:
+    try:
+        path = profile_path(profile_id)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        for thread_session in thread_sessions:
+            session = Session.combine(session, thread_session)
+        path.write_text(HTMLRenderer().render(session), encoding="utf-8")
+        logger.info("Stored request profile %s", path)
+        return path
+    except Exception as e:
+        logger.error("Failed to store profile %s: %s", profile_id, e, exc_info=True)
+        return None
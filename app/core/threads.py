@@ -0,0 +1,163 @@
+"""
+CPU thread budget shared by server workers, Paddle, OpenCV and BLAS
+
+Available cores (CPU affinity, capped by the cgroup CPU quota) are split
+evenly between workers, and every library in a worker is limited to that
+share so N workers do not each start one thread per core.
+
+Configuration happens in two phases:
+- set_thread_env() before numpy/paddle/cv2 are imported, because OpenMP
+  and BLAS read their thread count from the environment at load time
+- configure_worker_threads() in each worker once the libraries are
+  loaded (OpenCV and Paddle setters, optional CPU pinning)
+
+THREADS_PER_WORKER may come from a calibration profile (app.core.host_profile).
+"""
+import math
+import os
+from dataclasses import dataclass, field, asdict
+from typing import Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.host_profile import apply_host_profile, applied_profile
+from app.core.logger import logger
+
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS", "NUMEXPR_NUM_THREADS")
+
+
+@dataclass
+class ThreadBudget:
+    """Planned thread split for this server"""
+    cpus_available: int
+    cpu_source: str  # "affinity", "cgroup" or "setting"
+    workers: int
+    threads_per_worker: int
+    cpu_ids: List[int] = field(default_factory=list)
+
+    def worker_cpus(self, slot: int) -> List[int]:
+        """CPUs a worker is pinned to (slots beyond the CPU count wrap around)"""
+        n = self.threads_per_worker
+        start = (slot * n) % max(len(self.cpu_ids), 1)
+        return sorted({self.cpu_ids[(start + i) % len(self.cpu_ids)] for i in range(n)})
+
+
+_budget: Optional[ThreadBudget] = None
+_worker_slot: int = 0
+
+
+def cgroup_cpu_limit() -> Optional[float]:
+    """
+    CPU quota of the current cgroup in cores, or None if unlimited
+
+    Reads cgroup v2 (cpu.max) and falls back to cgroup v1 (cfs quota/period).
+    """
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()[:2]
+        if quota != "max":
+            return int(quota) / int(period)
+        return None
+    except (OSError, ValueError):
+        pass
+
+    try:
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+            quota = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+            period = int(f.read())
+        if quota > 0 and period > 0:
+            return quota / period
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def available_cpus() -> Tuple[int, str, List[int]]:
+    """
+    Cores this process may use
+
+    Returns:
+        (count, source, cpu ids) where source says whether the CPU affinity
+        mask or the cgroup quota was the limiting factor
+    """
+    try:
+        cpu_ids = sorted(os.sched_getaffinity(0))
+    except AttributeError:
+        cpu_ids = list(range(os.cpu_count() or 1))
+
+    count, source = len(cpu_ids), "affinity"
+    quota = cgroup_cpu_limit()
+    if quota is not None and math.ceil(quota) < count:
+        count, source = max(1, math.ceil(quota)), "cgroup"
+    return count, source, cpu_ids
+
+
+def plan_thread_budget(workers: int) -> ThreadBudget:
+    """Split the core budget (CPU_THREADS setting or detected) between workers"""
+    detected, source, cpu_ids = available_cpus()
+    cpus = settings.CPU_THREADS or detected
+    if settings.CPU_THREADS:
+        source = "setting"
+    workers = max(1, workers)
+    per_worker = settings.THREADS_PER_WORKER or max(1, cpus // workers)
+    return ThreadBudget(cpus, source, workers, per_worker, cpu_ids)
+
+
+def set_thread_env(workers: Optional[int] = None) -> ThreadBudget:
+    """
+    Plan the budget and export it to OpenMP/BLAS environment variables
+
+    Must run before numpy, cv2 or paddle are imported. Later calls return
+    the budget planned by the first one. The calibration profile of this
+    host type (app.core.host_profile) is applied first.
+    """
+    global _budget
+    if _budget is None:
+        workers = max(1, workers or settings.WORKERS)
+        apply_host_profile(settings.CPU_THREADS or available_cpus()[0], workers)
+        _budget = plan_thread_budget(workers)
+        for name in THREAD_ENV_VARS:
+            os.environ[name] = str(_budget.threads_per_worker)
+    return _budget
+
+
+def set_worker_slot(slot: int) -> None:
+    """Record which pre-fork worker this process is (selects its pinned CPUs)"""
+    global _worker_slot
+    _worker_slot = slot
+
+
+def configure_worker_threads() -> Dict[str, object]:
+    """
+    Apply the budget to OpenCV and Paddle in this process, pin CPUs if enabled
+
+    Returns:
+        Effective configuration, read back from the libraries
+    """
+    import cv2
+    from paddle.base import core
+
+    budget = set_thread_env()
+    n = budget.threads_per_worker
+
+    cv2.setNumThreads(n)
+    core.set_num_threads(n)
+
+    if settings.CPU_AFFINITY and hasattr(os, "sched_setaffinity") and budget.cpu_ids:
+        os.sched_setaffinity(0, budget.worker_cpus(_worker_slot))
+
+    effective = asdict(budget)
+    del effective["cpu_ids"]
+    effective.update({
+        "worker_slot": _worker_slot,
+        "opencv_threads": cv2.getNumThreads(),
+        "paddle_threads": n,
+        "blas_env": {name: os.environ.get(name) for name in THREAD_ENV_VARS},
+        "affinity": sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else None,
+        "calibration": applied_profile(),
+    })
+    logger.info(
+        "Thread budget: %d CPUs (%s) / %d workers -> %d threads per worker, affinity %s",
+        budget.cpus_available, budget.cpu_source, budget.workers, n, effective['affinity']
+    )
+    return effective
@@ -0,0 +1,75 @@
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+
+class RequestTimings:
+    """
+    Per-request stage durations and counters
+
+    One instance is bound to the current request context; pipeline code
+    records into it through record_stage / record_count without having to
+    pass it around.
+    """
+
+    __slots__ = ("start", "stages", "counts")
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self.counts: Dict[str, int] = {}
+
+    def add_stage(self, stage: str, seconds: float) -> None:
+        """Accumulate time spent in a stage (a stage may run several times)"""
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def set_count(self, name: str, value: int) -> None:
+        self.counts[name] = value
+
+    def summary(self) -> Dict[str, object]:
+        """Stage durations in milliseconds (stages_ms) and the counters, as in the request log"""
+        summary: Dict[str, object] = {
+            "stages_ms": {stage: round(seconds * 1000, 2) for stage, seconds in self.stages.items()}
+        }
+        summary.update(self.counts)
+        return summary
+
+    def server_timing(self) -> str:
+        """
+        Format as a Server-Timing header value
+
+        Stages become `name;dur=<ms>`, counters `name;desc="<value>"`,
+        followed by the total request time so far.
+        """
+        parts: List[str] = [f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in self.stages.items()]
+        parts.extend(f'{name};desc="{value}"' for name, value in self.counts.items())
+        parts.append(f"total;dur={(time.perf_counter() - self.start) * 1000:.2f}")
+        return ", ".join(parts)
+
+
+_current_timings: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+
+def begin_request_timings() -> RequestTimings:
+    """Bind a fresh RequestTimings to the current context"""
+    timings = RequestTimings()
+    _current_timings.set(timings)
+    return timings
+
+
+def current_timings() -> Optional[RequestTimings]:
+    return _current_timings.get()
+
+
+def record_stage(stage: str, seconds: float) -> None:
+    """Record a stage duration on the current request, if any"""
+    timings = _current_timings.get()
+    if timings is not None:
+        timings.add_stage(stage, seconds)
+
+
+def record_count(name: str, value: int) -> None:
+    """Record a counter (e.g. boxes, crops) on the current request, if any"""
+    timings = _current_timings.get()
+    if timings is not None:
+        timings.set_count(name, value)
@@ -3,6 +3,7 @@ from app.services.ocr_service import OCRService
 
 def get_ocr_service(request: Request) -> OCRService:
     """
-    Dependency to get OCRService instance from FastAPI app state
+    Dependency to get the active OCRService from the model registry in app state
+    The request keeps this instance, so a hot swap never changes models mid-request
     """
-    return request.app.state.ocr_service
+    return request.app.state.model_registry.service
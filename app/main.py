@@ -1,16 +1,36 @@
+import time
+_import_start = time.perf_counter()
+
+# Thread limits for OpenMP/BLAS must be in the environment before numpy and paddle load
+from app.core.threads import set_thread_env, configure_worker_threads
+set_thread_env()
+
+import asyncio
 import uvicorn
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from app.core.logger import logger
-from app.core.middleware import APIKeyMiddleware
+from app.core.middleware import (
+    APIKeyMiddleware, ServerTimingMiddleware, ProfilingMiddleware, DeadlineMiddleware, RequestLogMiddleware,
+    MemoryGuardMiddleware
+)
+from app.core.deadline import RequestAborted, DeadlineExceeded
 from app.api.v1.router import api_router
 from app.core.config import settings
 from contextlib import asynccontextmanager
-from app.models.detector import DetectionModel
 from app.services.ocr_service import OCRService
-from app.models.recognizer import RecognitionModel
+from app.models.preload import get_preloaded_models
+from app.models.registry import ModelSet, init_registry, load_model, read_control, watch_model_control
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.v1.router import api_router as api_router_v1
 from app.api.health import router as health_router
+from app.api.metrics import router as metrics_router
+from app.api.debug import router as debug_router
+from app.api.models import router as models_router
+from app.core.metrics import observe_startup, observe_thread_config
+
+# Time spent importing the app (paddle, cv2, numpy dominate)
+IMPORT_SECONDS = time.perf_counter() - _import_start
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -18,38 +38,81 @@ async def lifespan(app: FastAPI):
     Lifespan context manager for startup and shutdown events.
     Models are loaded once at startup and stored in app.state.
     """
+    app.state.ready = False
+    startup_seconds = {"import": round(IMPORT_SECONDS, 3)}
     try:
         logger.info("=" * 60)
         logger.info("Starting OCR API Server")
         logger.info("=" * 60)
         
-        # Load Detection Model
-        logger.info("Loading Detection Model...")
-        det_model = DetectionModel(str(settings.DETECTOR_MODEL_PATH)).load_detection_model()
-        logger.info("Detection model loaded successfully")
+        # Limit Paddle/OpenCV threads to this worker's share of the cores
+        app.state.threads = configure_worker_threads()
+        observe_thread_config(app.state.threads)
         
-        # Load Recognition Model
-        logger.info("Loading Recognition Model...")
-        rec_model = RecognitionModel(str(settings.RECOGNIZER_MODEL_PATH)).load_recognition_model()
-        logger.info("Recognition model loaded successfully")
+        control = read_control()
+        versions = {"detector": control["detector"], "recognizer": control["recognizer"]}
+        preloaded = get_preloaded_models()
+        if preloaded is not None and preloaded.versions == versions:
+            # Pre-fork server: models were loaded by the master and are shared copy-on-write
+            logger.info("Using models preloaded by the server process")
+            det_model, rec_model = preloaded.det_model, preloaded.rec_model
+            startup_seconds["load"] = round(preloaded.load_seconds, 3)
+        else:
+            # Load Detection and Recognition models in parallel
+            # (weight loading runs in paddle's C++ code, outside the GIL)
+            logger.info("Loading Detection and Recognition models %s...", versions)
+            start = time.perf_counter()
+            det_model, rec_model = await asyncio.gather(
+                asyncio.to_thread(load_model, "detector", versions["detector"]),
+                asyncio.to_thread(load_model, "recognizer", versions["recognizer"])
+            )
+            startup_seconds["load"] = round(time.perf_counter() - start, 3)
+            logger.info("Models loaded successfully")
         
         # Initialize OCR Service
         logger.info("Initializing OCR Service...")
-        app.state.ocr_service = OCRService(det_model, rec_model)
+        ocr_service = OCRService(det_model, rec_model)
         logger.info("OCR Service initialized")
         
+        # Warm up models on representative shapes
+        warmup_seconds = 0.0
+        if settings.WARMUP_ENABLED:
+            logger.info("Warming up models...")
+            warmup_seconds = ocr_service.warmup(settings.WARMUP_SHAPES, settings.WARMUP_ITERATIONS)
+            startup_seconds["warmup"] = round(warmup_seconds, 3)
+        
+        # Requests take the active service from the registry; hot swaps replace it
+        app.state.model_registry = init_registry(
+            ModelSet(versions, ocr_service, startup_seconds["load"], warmup_seconds)
+        )
+        
+        app.state.startup_seconds = startup_seconds
+        app.state.ready = True
+        observe_startup(startup_seconds)
+        
         logger.info("=" * 60)
         logger.info("Server startup completed successfully!") 
-        logger.info(f"API Documentation: http://localhost:8000/docs")
+        logger.info(
+            "Startup breakdown: %s", ", ".join(f"{phase} {seconds:.2f}s" for phase, seconds in startup_seconds.items())
+        )
+        logger.info("API Documentation: http://localhost:8000/docs")
         logger.info("=" * 60)
 
     except Exception as e:
-        logger.error(f"Failed to load models: {e}", exc_info=True)
+        logger.error("Failed to load models: %s", e, exc_info=True)
         raise
 
+    # Apply model swaps and shadow candidates requested through the control file
+    watcher = None
+    if settings.MODEL_POLL_INTERVAL > 0:
+        watcher = asyncio.create_task(watch_model_control(app.state.model_registry, settings.MODEL_POLL_INTERVAL))
+
     yield
 
-    # Shutdown
+    # Shutdown: fail readiness first so load balancers stop routing here
+    app.state.ready = False
+    if watcher is not None:
+        watcher.cancel()
     logger.info("Shutting down OCR API Server...")
 
 # Create FastAPI app
@@ -60,6 +123,12 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+@app.exception_handler(RequestAborted)
+async def request_aborted_handler(request: Request, exc: RequestAborted):
+    """504 when the deadline ran out; 499 (client closed request, never delivered) on disconnect"""
+    status_code = 504 if isinstance(exc, DeadlineExceeded) else 499
+    return JSONResponse(status_code=status_code, content={"detail": str(exc), "stage": exc.stage})
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -69,12 +138,32 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-request deadline, Server-Timing header and on-demand profiling (run inside authentication)
+app.add_middleware(DeadlineMiddleware)
+app.add_middleware(ServerTimingMiddleware)
+app.add_middleware(ProfilingMiddleware)
+
+# Per-request RSS growth, sampled allocation traces and worker recycling
+app.add_middleware(MemoryGuardMiddleware)
+
 # API Key Authentication Middleware 
 app.add_middleware(APIKeyMiddleware)
 
+# Request id and per-request summary log (outermost, so rejected requests are logged too)
+app.add_middleware(RequestLogMiddleware)
+
 # Include health check router (no prefix, at root level)
 app.include_router(health_router)
 
+# Include Prometheus metrics router (no prefix, at root level)
+app.include_router(metrics_router)
+
+# Include debug router (stored request profiles)
+app.include_router(debug_router)
+
+# Include model admin router (registry, hot swap, shadow)
+app.include_router(models_router)
+
 # Include API router
 app.include_router(api_router_v1, prefix=settings.API_V1_PREFIX)
 
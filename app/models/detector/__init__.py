@@ -1,5 +1,5 @@
 """Detector module"""
 from .model import DetectionModel
-from .inference import run_detection, run_detection_on_image
+from .inference import run_detection, run_detection_on_image, preprocess_for_detection, run_detector
 
-__all__ = ["DetectionModel", "run_detection", "run_detection_on_image"]
+__all__ = ["DetectionModel", "run_detection", "run_detection_on_image", "preprocess_for_detection", "run_detector"]
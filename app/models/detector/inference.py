@@ -26,11 +26,11 @@ def run_detection(
     # Load image
     img = cv2.imread(image_path)
     if img is None:
-        logger.error(f"Cannot load image: {image_path}")
+        logger.error("Cannot load image: %s", image_path)
         raise ValueError(f"Cannot load image: {image_path}")
     
     h, w = img.shape[:2]
-    logger.info(f"Original image size: {w}x{h}")
+    logger.debug("Original image size: %dx%d", w, h)
     
     # Resize keeping aspect ratio
     if max(h, w) > resize_long:
@@ -62,7 +62,7 @@ def run_detection(
         value=(0, 0, 0)
     )
     
-    logger.info(f"Resized: {new_w}x{new_h}, Padded: {pad_w}x{pad_h}")
+    logger.debug("Resized: %dx%d, Padded: %dx%d", new_w, new_h, pad_w, pad_h)
     
     # Normalize
     img_norm = img_padded.astype(np.float32) / 255.0
@@ -74,40 +74,30 @@ def run_detection(
     img_input = np.transpose(img_norm, (2, 0, 1))
     img_input = np.expand_dims(img_input, axis=0)
     
-    logger.info(f"Input shape: {img_input.shape}")
+    logger.debug("Input shape: %s", img_input.shape)
     
     # Inference
     img_tensor = paddle.to_tensor(img_input, dtype='float32')
     with paddle.no_grad():
         output = det_model(img_tensor)
     
-    logger.info("Detection completed!")
+    logger.debug("Detection completed")
     
     return img, output
 
 
-def run_detection_on_image(
-    det_model,
-    image: np.ndarray,
-    resize_long: int = 960,
-    thresh: float = 0.3,
-    box_thresh: float = 0.6
-) -> paddle.Tensor:
+def preprocess_for_detection(image: np.ndarray, resize_long: int = 960) -> np.ndarray:
     """
-    Run detection on numpy image array
+    Resize, pad and normalize image for the detector
     
     Args:
-        det_model: Loaded detection model
-        image: Input image as numpy array
+        image: Input image as numpy array (BGR)
         resize_long: Maximum dimension for resizing
-        thresh: Detection threshold
-        box_thresh: Bounding box threshold
         
     Returns:
-        Model output tensor
+        Input batch [1, C, H, W] float32, H and W multiples of 32
     """
     h, w = image.shape[:2]
-    logger.info(f"Image size: {w}x{h}")
     
     # Resize keeping aspect ratio
     if max(h, w) > resize_long:
@@ -149,9 +139,51 @@ def run_detection_on_image(
     img_input = np.transpose(img_norm, (2, 0, 1))
     img_input = np.expand_dims(img_input, axis=0)
     
-    # Inference
+    return img_input
+
+
+def run_detector(det_model, img_input: np.ndarray) -> paddle.Tensor:
+    """
+    Run detector forward pass on a preprocessed batch
+    
+    Args:
+        det_model: Loaded detection model
+        img_input: Output of preprocess_for_detection
+        
+    Returns:
+        Model output tensor
+    """
     img_tensor = paddle.to_tensor(img_input, dtype='float32')
     with paddle.no_grad():
         output = det_model(img_tensor)
     
     return output
+
+
+def run_detection_on_image(
+    det_model,
+    image: np.ndarray,
+    resize_long: int = 960,
+    thresh: float = 0.3,
+    box_thresh: float = 0.6
+) -> paddle.Tensor:
+    """
+    Run detection on numpy image array
+    
+    Args:
+        det_model: Loaded detection model
+        image: Input image as numpy array
+        resize_long: Maximum dimension for resizing
+        thresh: Detection threshold
+        box_thresh: Bounding box threshold
+        
+    Returns:
+        Model output tensor
+    """
+    h, w = image.shape[:2]
+    logger.debug("Image size: %dx%d", w, h)
+    
+    img_input = preprocess_for_detection(image, resize_long)
+    
+    # Inference
+    return run_detector(det_model, img_input)
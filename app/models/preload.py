@@ -0,0 +1,47 @@
+"""
+Models loaded before the server starts
+
+The pre-fork server (app.server) loads both models once in the master
+process; forked workers inherit them copy-on-write and the app lifespan
+picks them up here instead of loading its own copy.
+"""
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+from app.core.logger import logger
+
+
+@dataclass
+class PreloadedModels:
+    det_model: object
+    rec_model: object
+    load_seconds: float
+    versions: Dict[str, str] = field(default_factory=dict)
+
+
+_preloaded: Optional[PreloadedModels] = None
+
+
+def preload_models() -> PreloadedModels:
+    """Load the desired detector and recognizer versions in the current process and keep them for the lifespan"""
+    global _preloaded
+    from concurrent.futures import ThreadPoolExecutor
+    from app.models.registry import read_control, load_model
+
+    control = read_control()
+    versions = {"detector": control["detector"], "recognizer": control["recognizer"]}
+    start = time.perf_counter()
+    # Threads are joined before returning, so no extra threads exist at fork time
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        det_future = pool.submit(load_model, "detector", versions["detector"])
+        rec_future = pool.submit(load_model, "recognizer", versions["recognizer"])
+        det_model, rec_model = det_future.result(), rec_future.result()
+
+    _preloaded = PreloadedModels(det_model, rec_model, time.perf_counter() - start, versions)
+    logger.info("Preloaded models in %.2fs", _preloaded.load_seconds)
+    return _preloaded
+
+
+def get_preloaded_models() -> Optional[PreloadedModels]:
+    return _preloaded
@@ -1,5 +1,9 @@
 """Recognizer module"""
 from .model import RecognitionModel
 from .inference import run_recognition_on_bbox, create_character_dict, ctc_decode
+from .batch import CropBatchPool, recognize_boxes
 
-__all__ = ["RecognitionModel", "run_recognition_on_bbox", "create_character_dict", "ctc_decode"]
+__all__ = [
+    "RecognitionModel", "run_recognition_on_bbox", "create_character_dict", "ctc_decode",
+    "CropBatchPool", "recognize_boxes"
+]
@@ -12,6 +12,8 @@ def resize_keep_ratio(img, target_h=48, target_w=320):
     new_w = int(w * ratio)
     if new_w > target_w:
         new_w = target_w
+    # Very tall, thin crops would round down to zero width
+    new_w = max(new_w, 1)
     
     resized = cv2.resize(img, (new_w, target_h))
     
@@ -97,5 +99,5 @@ def run_recognition_on_bbox(rec_model, image, bbox):
         return text
         
     except Exception as e:
-        logger.error(f"Recognition error: {e}")
+        logger.error("Recognition error: %s", e)
         return ""
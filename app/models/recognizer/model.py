@@ -17,19 +17,19 @@ class RecognitionModel:
             params_file = self.model_path / "inference.pdiparams"
             
             if not model_file.exists() or not params_file.exists():
-                logger.error(f"Model files not found at {self.model_path}")
+                logger.error("Model files not found at %s", self.model_path)
                 raise FileNotFoundError(f"Model files not found at {self.model_path}")
             
-            logger.info(f"Loading recognition model from {self.model_path}")
-            logger.info(f"   - {model_file}")
-            logger.info(f"   - {params_file}")
+            logger.info("Loading recognition model from %s", self.model_path)
+            logger.info("   - %s", model_file)
+            logger.info("   - %s", params_file)
             self.model = paddle.jit.load(str(self.model_path / "inference"))
             logger.info("Recognition model loaded successfully!")
             
             return self.model
             
         except Exception as e:
-            logger.error(f"Error loading recognition model: {e}")
+            logger.error("Error loading recognition model: %s", e)
             raise
     
     def get_model(self):
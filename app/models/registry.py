@@ -0,0 +1,275 @@
+"""
+Model registry: versions under WEIGHTS_DIR, hot swap and shadow candidates
+
+A version is a directory under WEIGHTS_DIR holding inference.json and
+inference.pdiparams, named by its path relative to WEIGHTS_DIR (e.g.
+"Model_rec" or "rec/v2").
+
+The desired versions live in MODEL_CONTROL_FILE, a JSON file
+    {"detector": "...", "recognizer": "...",
+     "shadow": {"detector": "...", "recognizer": "...", "sample_rate": 0.05}}
+written by the admin API. Every worker polls it and, when it changes,
+loads and warms up the new versions in a background thread, then swaps
+them in with one reference assignment. Requests hold the OCRService they
+started with, so in-flight requests finish on the old models, which are
+freed when the last one completes. Without a control file the settings
+paths (DETECTOR_MODEL_PATH, RECOGNIZER_MODEL_PATH) are used.
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.core.metrics import observe_model_swap
+from app.models.detector import DetectionModel
+from app.models.recognizer import RecognitionModel
+
+ROLES = ("detector", "recognizer")
+
+
+def version_name(path: Path) -> str:
+    """Version of a model directory: path relative to WEIGHTS_DIR, else the absolute path"""
+    path = Path(path).resolve()
+    try:
+        return path.relative_to(Path(settings.WEIGHTS_DIR).resolve()).as_posix()
+    except ValueError:
+        return str(path)
+
+
+def version_path(version: str) -> Path:
+    """
+    Directory of a version, which must stay inside WEIGHTS_DIR
+
+    Raises:
+        ValueError: The version is outside WEIGHTS_DIR or not a model directory
+    """
+    root = Path(settings.WEIGHTS_DIR).resolve()
+    path = (root / version).resolve()
+    if path != root and root not in path.parents:
+        raise ValueError(f"Model version outside {root}: {version!r}")
+    if not (path / "inference.json").exists():
+        raise ValueError(f"Not a model directory: {version!r}")
+    return path
+
+
+def model_path(role: str, version: str) -> Path:
+    """
+    Directory to load a role's version from (the settings path for the default version)
+
+    Raises:
+        ValueError: Unknown version
+    """
+    if version == default_versions()[role]:
+        return Path(settings.DETECTOR_MODEL_PATH if role == "detector" else settings.RECOGNIZER_MODEL_PATH)
+    return version_path(version)
+
+
+def list_versions() -> List[Dict]:
+    """Model directories under WEIGHTS_DIR, with whether their weights are present"""
+    root = Path(settings.WEIGHTS_DIR)
+    versions = []
+    for model_file in sorted(root.rglob("inference.json")):
+        path = model_file.parent
+        versions.append({
+            "version": path.relative_to(root).as_posix(),
+            "complete": (path / "inference.pdiparams").exists(),
+        })
+    return versions
+
+
+def default_versions() -> Dict[str, str]:
+    return {
+        "detector": version_name(settings.DETECTOR_MODEL_PATH),
+        "recognizer": version_name(settings.RECOGNIZER_MODEL_PATH),
+    }
+
+
+def read_control() -> Dict:
+    """Desired versions from MODEL_CONTROL_FILE, settings paths when absent or invalid"""
+    control = {"detector": None, "recognizer": None, "shadow": None}
+    try:
+        with open(settings.MODEL_CONTROL_FILE, encoding="utf-8") as f:
+            control.update(json.load(f))
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError) as e:
+        logger.error("Ignoring unreadable model control file %s: %s", settings.MODEL_CONTROL_FILE, e)
+    defaults = default_versions()
+    for role in ROLES:
+        control[role] = control[role] or defaults[role]
+    return control
+
+
+def write_control(control: Dict) -> None:
+    """Atomically replace MODEL_CONTROL_FILE (workers never see a half-written file)"""
+    path = Path(settings.MODEL_CONTROL_FILE)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(control, indent=2), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def load_model(role: str, version: str):
+    """Load one model version"""
+    path = str(model_path(role, version))
+    if role == "detector":
+        return DetectionModel(path).load_detection_model()
+    return RecognitionModel(path).load_recognition_model()
+
+
+@dataclass
+class ModelSet:
+    """A detector/recognizer pair and the OCRService built on it"""
+    versions: Dict[str, str]
+    service: object
+    load_seconds: float = 0.0
+    warmup_seconds: float = 0.0
+    loaded_at: float = field(default_factory=time.time)
+
+    def describe(self) -> Dict:
+        return {
+            "versions": dict(self.versions),
+            "load_seconds": round(self.load_seconds, 3),
+            "warmup_seconds": round(self.warmup_seconds, 3),
+            "loaded_at": self.loaded_at,
+        }
+
+
+class ModelRegistry:
+    """
+    Active model set of this worker plus an optional shadow candidate
+
+    Args:
+        active: Initially active models
+    """
+
+    def __init__(self, active: ModelSet):
+        self.active = active
+        self.shadow = None  # ShadowRunner
+        self._shadow_key: Optional[Dict] = None
+        self._apply_lock = threading.Lock()
+        observe_model_swap(active.versions)
+
+    @property
+    def service(self):
+        """OCRService of the active set (hold on to it for the whole request)"""
+        return self.active.service
+
+    def build(self, versions: Dict[str, str]) -> ModelSet:
+        """
+        Load and warm up a model set, reusing models whose version is already active
+
+        Args:
+            versions: Version per role
+        """
+        from app.services.ocr_service import OCRService
+
+        start = time.perf_counter()
+        active_service = self.active.service
+        models = {}
+        loaded = False
+        for role in ROLES:
+            if versions[role] == self.active.versions[role]:
+                models[role] = active_service.det_model if role == "detector" else active_service.rec_model
+            else:
+                logger.info("Loading %s version %s", role, versions[role])
+                models[role] = load_model(role, versions[role])
+                loaded = True
+        service = OCRService(models["detector"], models["recognizer"])
+        load_seconds = time.perf_counter() - start
+
+        warmup_seconds = 0.0
+        if settings.WARMUP_ENABLED and loaded:
+            warmup_seconds = service.warmup(settings.WARMUP_SHAPES, settings.WARMUP_ITERATIONS)
+        return ModelSet(dict(versions), service, load_seconds, warmup_seconds)
+
+    def apply(self, control: Dict) -> bool:
+        """
+        Bring this worker to the desired versions (blocking; run off the event loop)
+
+        A failed load keeps the current models.
+
+        Returns:
+            True if anything changed
+        """
+        from app.services.shadow import ShadowRunner
+
+        with self._apply_lock:
+            changed = False
+            desired = {role: control[role] for role in ROLES}
+            if desired != self.active.versions:
+                try:
+                    new_set = self.build(desired)
+                except Exception as e:
+                    logger.error(
+                        "Model swap to %s failed, keeping %s: %s", desired, self.active.versions, e, exc_info=True
+                    )
+                else:
+                    old_versions = self.active.versions
+                    self.active = new_set
+                    observe_model_swap(new_set.versions, old_versions)
+                    logger.info(
+                        "Swapped models %s -> %s (load %.2fs, warmup %.2fs)",
+                        old_versions, new_set.versions, new_set.load_seconds, new_set.warmup_seconds
+                    )
+                    changed = True
+
+            shadow = control.get("shadow")
+            if shadow != self._shadow_key:
+                if self.shadow is not None:
+                    self.shadow.close()
+                    self.shadow = None
+                if shadow:
+                    candidate = {role: shadow.get(role) or desired[role] for role in ROLES}
+                    try:
+                        self.shadow = ShadowRunner(
+                            self.build(candidate), float(shadow.get("sample_rate", settings.SHADOW_SAMPLE_RATE))
+                        )
+                        logger.info("Shadowing %s on %.1f%% of requests", candidate, self.shadow.sample_rate * 100)
+                    except Exception as e:
+                        logger.error("Loading shadow candidate %s failed: %s", candidate, e, exc_info=True)
+                self._shadow_key = shadow
+                changed = True
+            return changed
+
+    def describe(self) -> Dict:
+        return {
+            "active": self.active.describe(),
+            "shadow": self.shadow.describe() if self.shadow is not None else None,
+        }
+
+
+_registry: Optional[ModelRegistry] = None
+
+
+def init_registry(active: ModelSet) -> ModelRegistry:
+    global _registry
+    _registry = ModelRegistry(active)
+    return _registry
+
+
+def get_registry() -> Optional[ModelRegistry]:
+    return _registry
+
+
+async def watch_model_control(registry: ModelRegistry, interval: float) -> None:
+    """
+    Poll MODEL_CONTROL_FILE and apply changes in a background thread
+
+    Runs for the worker's lifetime; the first pass sets up a shadow
+    candidate already configured at startup. A version that fails to load
+    is not retried until the control file changes again.
+    """
+    last = None
+    while True:
+        control = read_control()
+        if control != last:
+            await asyncio.to_thread(registry.apply, control)
+            last = control
+        await asyncio.sleep(interval)
@@ -0,0 +1,15 @@
+from typing import Optional
+from pydantic import BaseModel, Field
+
+
+class ModelActivateRequest(BaseModel):
+    """Versions to make active (omitted roles keep their current version)"""
+    detector: Optional[str] = Field(None, description="Detector version (directory under WEIGHTS_DIR)")
+    recognizer: Optional[str] = Field(None, description="Recognizer version (directory under WEIGHTS_DIR)")
+
+
+class ShadowRequest(BaseModel):
+    """Candidate versions to shadow (omitted roles use the active version)"""
+    detector: Optional[str] = Field(None, description="Candidate detector version")
+    recognizer: Optional[str] = Field(None, description="Candidate recognizer version")
+    sample_rate: Optional[float] = Field(None, ge=0.0, le=1.0, description="Fraction of requests replayed")
@@ -1,4 +1,5 @@
-from typing import Optional, List
+from enum import Enum
+from typing import Optional, List, Union
 from pydantic import BaseModel, Field
 
 
@@ -21,6 +22,23 @@ class BBoxListResponse(BaseModel):
     results: List[BBoxResult] = Field(..., description="List of detection results")
 
 
+class BBoxFormat(str, Enum):
+    """Wire format of the bounding box list"""
+    DEFAULT = "default"  # BBoxListResponse
+    COLUMNAR = "columnar"  # BBoxColumnarResponse, one [x1, y1, x2, y2] per box
+    FLAT = "flat"  # BBoxColumnarResponse, boxes flattened to one int array
+
+
+class BBoxColumnarResponse(BaseModel):
+    """Compact response schema for bounding box list"""
+    texts: List[str] = Field(..., description="Recognized text per box")
+    boxes: Union[List[List[int]], List[int]] = Field(
+        ...,
+        description="Box coordinates aligned with texts: [[x1, y1, x2, y2], ...], "
+                    "or [x1, y1, x2, y2, x1, ...] in flat format"
+    )
+
+
 class MockResponse(BaseModel):
     """Mock response for testing"""
     supplier_name: str = Field(..., description="Mock supplier name")
@@ -0,0 +1,260 @@
+"""
+Pre-fork multi-worker server
+
+The master process imports the app (paddle, cv2, numpy) and loads both
+models once, then forks uvicorn workers that accept connections on a
+shared listening socket. Model weights and imported modules stay in
+pages shared copy-on-write between workers, instead of one private copy
+per worker as with `uvicorn --workers N`.
+
+Workers run their own warmup after the fork: the master never runs a
+forward pass, so no inference thread pools exist when it forks.
+
+The master restarts workers that exit and periodically logs per-worker
+RSS/PSS read from /proc/<pid>/smaps_rollup. Workers exit on their own to
+be replaced when a recycling limit is reached (see app.core.memory).
+
+Usage:
+    python -m app serve --workers 4
+"""
+import gc
+import os
+import shutil
+import signal
+import socket
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.core.threads import set_thread_env, set_worker_slot
+
+# Fields of /proc/<pid>/smaps_rollup reported per worker (kB in the file)
+MEMORY_FIELDS = {
+    "Rss": "rss",
+    "Pss": "pss",
+    "Shared_Clean": "shared_clean",
+    "Shared_Dirty": "shared_dirty",
+    "Private_Clean": "private_clean",
+    "Private_Dirty": "private_dirty",
+}
+
+
+def process_memory(pid: int) -> Dict[str, int]:
+    """
+    Memory of one process from /proc/<pid>/smaps_rollup
+
+    Args:
+        pid: Process id
+
+    Returns:
+        Bytes per field in MEMORY_FIELDS (empty if unavailable, e.g. not Linux)
+    """
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            lines = f.readlines()
+    except OSError:
+        return {}
+
+    memory = {}
+    for line in lines:
+        key, _, value = line.partition(":")
+        name = MEMORY_FIELDS.get(key)
+        if name:
+            memory[name] = int(value.split()[0]) * 1024
+    return memory
+
+
+def _format_memory(memory: Dict[str, int]) -> str:
+    mib = 1024 * 1024
+    shared = memory.get("shared_clean", 0) + memory.get("shared_dirty", 0)
+    private = memory.get("private_clean", 0) + memory.get("private_dirty", 0)
+    return (
+        f"rss {memory.get('rss', 0) / mib:.1f} MiB, pss {memory.get('pss', 0) / mib:.1f} MiB, "
+        f"shared {shared / mib:.1f} MiB, private {private / mib:.1f} MiB"
+    )
+
+
+def _prepare_multiprocess_metrics() -> None:
+    """
+    Point prometheus_client at a per-server metrics directory
+
+    Must run before prometheus_client is imported, so every worker writes
+    its metrics to files that /metrics aggregates.
+    """
+    directory = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if directory:
+        # Stale files from a previous run would be aggregated too
+        path = Path(directory)
+        if path.exists():
+            shutil.rmtree(path)
+        path.mkdir(parents=True)
+    else:
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="ocr_metrics_")
+
+
+def _bind_socket(host: str, port: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+class PreforkServer:
+    """Master process: owns the listening socket and supervises workers"""
+
+    def __init__(self, host: str, port: int, workers: int):
+        self.host = host
+        self.port = port
+        self.num_workers = workers
+        self.workers: Dict[int, int] = {}  # pid -> worker slot
+        self.sock: Optional[socket.socket] = None
+        self.stopping = False
+
+    def run(self) -> None:
+        _prepare_multiprocess_metrics()
+        if settings.CALIBRATE_ON_STARTUP:
+            from app.services.calibration import ensure_profile
+            ensure_profile(self.num_workers)
+        # Split cores between workers before paddle/numpy read their thread env
+        set_thread_env(self.num_workers)
+
+        # Step 1: Import the app and load models once in the master
+        from app.main import app
+        from app.models.preload import preload_models
+        preload_models()
+        self.app = app
+
+        # Step 2: Bind before forking so all workers accept on the same socket
+        self.sock = _bind_socket(self.host, self.port)
+        logger.info("Listening on %s:%d with %d workers", self.host, self.port, self.num_workers)
+
+        # Objects created so far are never freed; keep the GC from touching
+        # (and so un-sharing) their pages in the workers
+        gc.collect()
+        gc.freeze()
+
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+
+        # Step 3: Fork workers and supervise them
+        for slot in range(self.num_workers):
+            self._spawn(slot)
+
+        next_report = time.monotonic() + settings.MEMORY_REPORT_INTERVAL
+        while not self.stopping:
+            self._reap(respawn=True)
+            if settings.MEMORY_REPORT_INTERVAL > 0 and time.monotonic() >= next_report:
+                self.report_memory()
+                next_report = time.monotonic() + settings.MEMORY_REPORT_INTERVAL
+            time.sleep(0.5)
+
+        self._shutdown()
+
+    def _spawn(self, slot: int) -> None:
+        pid = os.fork()
+        if pid == 0:
+            self._run_worker(slot)
+        self.workers[pid] = slot
+        logger.info("Started worker %d (pid %d)", slot, pid)
+
+    def _run_worker(self, slot: int) -> None:
+        """Worker process body; never returns"""
+        import uvicorn
+        from app.core.memory import enable_recycling
+
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        set_worker_slot(slot)
+        enable_recycling()
+        exit_code = 0
+        try:
+            config = uvicorn.Config(self.app, lifespan="on", timeout_graceful_shutdown=settings.WORKER_TIMEOUT)
+            uvicorn.Server(config).run(sockets=[self.sock])
+        except Exception as e:
+            logger.error("Worker %d failed: %s", slot, e, exc_info=True)
+            exit_code = 1
+        finally:
+            os._exit(exit_code)
+
+    def _reap(self, respawn: bool) -> None:
+        """Collect exited workers, optionally replacing them"""
+        from prometheus_client import multiprocess
+
+        while self.workers:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            slot = self.workers.pop(pid, None)
+            if slot is None:
+                continue
+            multiprocess.mark_process_dead(pid)
+            exit_code = os.waitstatus_to_exitcode(status)
+            message = f"Worker {slot} (pid {pid}) exited with status {exit_code}"
+            if self.stopping or exit_code == 0:
+                # Status 0 outside shutdown: the worker recycled itself
+                logger.info(message)
+            else:
+                logger.warning(message)
+            if respawn and not self.stopping:
+                self._spawn(slot)
+
+    def _handle_stop(self, signum, frame) -> None:
+        self.stopping = True
+
+    def _shutdown(self) -> None:
+        logger.info("Stopping workers...")
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+        deadline = time.monotonic() + settings.WORKER_TIMEOUT + 5
+        while self.workers and time.monotonic() < deadline:
+            self._reap(respawn=False)
+            time.sleep(0.1)
+
+        for pid in list(self.workers):
+            logger.warning("Killing worker %d (pid %d)", self.workers[pid], pid)
+            os.kill(pid, signal.SIGKILL)
+        self._reap(respawn=False)
+        self.sock.close()
+
+    def report_memory(self) -> Dict[int, Dict[str, int]]:
+        """Log RSS/PSS of the master and every worker and export worker gauges"""
+        from app.core.metrics import WORKER_MEMORY
+
+        report = {}
+        master = process_memory(os.getpid())
+        if master:
+            logger.info("Master (pid %d): %s", os.getpid(), _format_memory(master))
+        for pid, slot in sorted(self.workers.items(), key=lambda item: item[1]):
+            memory = process_memory(pid)
+            if not memory:
+                continue
+            report[pid] = memory
+            logger.info("Worker %d (pid %d): %s", slot, pid, _format_memory(memory))
+            for kind, value in memory.items():
+                WORKER_MEMORY.labels(str(slot), kind).set(value)
+        if report:
+            total_pss = sum(m.get("pss", 0) for m in report.values()) + master.get("pss", 0)
+            logger.info("Total PSS (master + %d workers): %.1f MiB", len(report), total_pss / 1024 / 1024)
+        return report
+
+
+def serve(host: str = None, port: int = None, workers: int = None) -> None:
+    """Run the pre-fork server (defaults from settings)"""
+    PreforkServer(
+        host or settings.HOST,
+        port or settings.PORT,
+        max(1, workers or settings.WORKERS)
+    ).run()
@@ -0,0 +1,188 @@
+"""
+Self-calibration of recognition batch size, threads and inference concurrency
+
+The best RECOGNITION_BATCH_SIZE, THREADS_PER_WORKER and INFERENCE_CONCURRENCY
+depend on the CPU. Calibration runs synthetic invoice pages through the
+real models for every candidate combination, one worker's share of the
+cores at a time, and keeps the one with the highest throughput whose p95
+document latency stays under CALIBRATION_LATENCY_MS. The choice is stored
+per host type (app.core.host_profile) so later boots skip calibration.
+
+Run it with `python -m app calibrate`, or set CALIBRATE_ON_STARTUP to have
+`python -m app serve` run it in a child process when the profile is
+missing (the master must not run forward passes before it forks).
+
+Paddle, numpy and OpenCV are imported inside the functions: the thread
+environment has to be set before they load.
+"""
+import itertools
+import math
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from app.core.config import settings
+from app.core.host_profile import PROFILE_SETTINGS, find_profile, host_key, save_profile
+from app.core.logger import logger
+from app.core.threads import THREAD_ENV_VARS, available_cpus
+
+
+def candidate_configs(threads_per_worker: int) -> List[Dict[str, int]]:
+    """Candidate settings: CALIBRATION_* lists crossed with the full and half thread share"""
+    thread_counts = sorted({threads_per_worker, max(1, threads_per_worker // 2)}, reverse=True)
+    return [
+        {"RECOGNITION_BATCH_SIZE": batch, "THREADS_PER_WORKER": threads, "INFERENCE_CONCURRENCY": concurrency}
+        for batch, threads, concurrency in itertools.product(
+            settings.CALIBRATION_BATCH_SIZES, thread_counts, settings.CALIBRATION_CONCURRENCY
+        )
+    ]
+
+
+def synthetic_pages(count: int, seed: int = 0) -> list:
+    """Rendered invoice pages of a few sizes (realistic box counts for both models)"""
+    from app.utils.synthetic_invoice import generate_invoice
+    return [generate_invoice(n_items=20 + 20 * (i % 3), seed=seed + i).image for i in range(count)]
+
+
+def _set_threads(n: int) -> None:
+    import cv2
+    from paddle.base import core
+
+    cv2.setNumThreads(n)
+    core.set_num_threads(n)
+
+
+def measure(service, pages: Sequence, config: Dict[str, int]) -> Dict:
+    """
+    Throughput and latency of one candidate
+
+    INFERENCE_CONCURRENCY pages are processed at once, as the scheduler
+    would run them in a worker.
+
+    Returns:
+        The candidate settings plus documents_per_second, p50_ms and p95_ms
+    """
+    from app.core.metrics import suppress_metrics
+
+    settings.RECOGNITION_BATCH_SIZE = config["RECOGNITION_BATCH_SIZE"]
+    threads = config["THREADS_PER_WORKER"]
+    concurrency = config["INFERENCE_CONCURRENCY"]
+    _set_threads(threads)
+
+    def run(page) -> float:
+        # Calibration runs must not show up in the pipeline metrics
+        with suppress_metrics():
+            start = time.perf_counter()
+            service.process_image(page)
+            return time.perf_counter() - start
+
+    # Paddle's thread count is per calling thread, so set it in each pool thread
+    with ThreadPoolExecutor(max_workers=concurrency, initializer=_set_threads, initargs=(threads,)) as pool:
+        # Untimed pass: new batch sizes and threads pay for kernel selection
+        list(pool.map(run, pages[:concurrency]))
+        start = time.perf_counter()
+        latencies = sorted(pool.map(run, pages))
+        wall = time.perf_counter() - start
+
+    return dict(
+        config,
+        documents_per_second=round(len(pages) / wall, 3),
+        p50_ms=round(latencies[len(latencies) // 2] * 1000, 1),
+        p95_ms=round(latencies[math.ceil(0.95 * len(latencies)) - 1] * 1000, 1),
+    )
+
+
+def choose(measurements: List[Dict], latency_ms: float) -> Dict[str, int]:
+    """Highest throughput under the latency ceiling (lowest p95 if none qualifies)"""
+    within = [m for m in measurements if m["p95_ms"] <= latency_ms]
+    if within:
+        best = max(within, key=lambda m: m["documents_per_second"])
+    else:
+        best = min(measurements, key=lambda m: m["p95_ms"])
+        logger.warning("No candidate meets p95 <= %.0f ms; using the lowest latency one", latency_ms)
+    return {name: best[name] for name in PROFILE_SETTINGS}
+
+
+def calibrate(service, threads_per_worker: int, latency_ms: float, documents: int) -> Tuple[Dict[str, int], List[Dict]]:
+    """
+    Measure every candidate and pick one
+
+    Args:
+        service: OCRService on the real models
+        threads_per_worker: One worker's share of the cores
+        latency_ms: p95 document latency ceiling
+        documents: Synthetic pages per candidate
+
+    Returns:
+        (chosen settings, all measurements)
+    """
+    pages = synthetic_pages(documents)
+    original_batch = settings.RECOGNITION_BATCH_SIZE
+    measurements = []
+    try:
+        for config in candidate_configs(threads_per_worker):
+            result = measure(service, pages, config)
+            measurements.append(result)
+            logger.info(
+                "Calibration %s: %.2f docs/s, p50 %.0f ms, p95 %.0f ms",
+                config, result['documents_per_second'], result['p50_ms'], result['p95_ms']
+            )
+    finally:
+        settings.RECOGNITION_BATCH_SIZE = original_batch
+        _set_threads(threads_per_worker)
+    return choose(measurements, latency_ms), measurements
+
+
+def run_calibration(
+    workers: Optional[int] = None,
+    latency_ms: Optional[float] = None,
+    documents: Optional[int] = None,
+    save: bool = True
+) -> Dict:
+    """
+    Calibrate this host type and store the profile (python -m app calibrate)
+
+    Must run before paddle is imported in this process.
+
+    Returns:
+        {"host": key, "settings": chosen, "measurements": [...]}
+    """
+    workers = max(1, workers or settings.WORKERS)
+    cpus = settings.CPU_THREADS or available_cpus()[0]
+    share = max(1, cpus // workers)
+    for name in THREAD_ENV_VARS:
+        os.environ[name] = str(share)
+
+    from app.models.registry import load_model, read_control
+    from app.services.ocr_service import OCRService
+
+    control = read_control()
+    service = OCRService(load_model("detector", control["detector"]), load_model("recognizer", control["recognizer"]))
+    service.warmup(settings.WARMUP_SHAPES, settings.WARMUP_ITERATIONS)
+
+    key = host_key(cpus, workers)
+    logger.info("Calibrating %r (%d threads per worker)", key, share)
+    chosen, measurements = calibrate(
+        service, share,
+        settings.CALIBRATION_LATENCY_MS if latency_ms is None else latency_ms,
+        documents or settings.CALIBRATION_DOCUMENTS
+    )
+    logger.info("Calibration chose %s", chosen)
+    if save:
+        save_profile(key, chosen, measurements)
+        logger.info("Profile saved to %s", settings.CALIBRATION_FILE)
+    return {"host": key, "settings": chosen, "measurements": measurements}
+
+
+def ensure_profile(workers: int) -> None:
+    """Calibrate in a child process if this host type has no profile yet (CALIBRATE_ON_STARTUP)"""
+    cpus = settings.CPU_THREADS or available_cpus()[0]
+    if find_profile(host_key(cpus, workers)) is not None:
+        return
+    logger.info("No calibration profile for this host type, calibrating...")
+    result = subprocess.run([sys.executable, "-m", "app", "calibrate", "--workers", str(workers)])
+    if result.returncode != 0:
+        logger.error("Calibration failed (exit code %d), starting with configured settings", result.returncode)
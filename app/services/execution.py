@@ -0,0 +1,173 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Iterator, Optional, TypeVar
+
+from fastapi import Request
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
+
+from app.core.api_keys import current_client
+from app.core.config import settings
+from app.core.deadline import RequestAborted, RequestDeadline, begin_request_deadline, current_deadline
+from app.core.metrics import CLIENT_QUEUED, observe_client_document
+from app.core.profiling import is_request_profiled, profile_call
+from app.core.threads import set_thread_env
+from app.models.registry import get_registry
+from app.services.pipeline import StagePipeline
+from app.services.scheduler import FairScheduler
+
+T = TypeVar("T")
+
+_scheduler: Optional[FairScheduler] = None
+_stage_pipeline: Optional[StagePipeline] = None
+
+
+def get_scheduler() -> FairScheduler:
+    """Scheduler of this worker, created on first use so it binds to the worker's event loop"""
+    global _scheduler
+    if _scheduler is None:
+        if settings.PIPELINE_ENABLED:
+            _scheduler = FairScheduler(settings.PIPELINE_MAX_IN_FLIGHT)
+        else:
+            _scheduler = FairScheduler(settings.INFERENCE_CONCURRENCY)
+    return _scheduler
+
+
+def get_stage_pipeline() -> Optional[StagePipeline]:
+    """Stage pipeline of this worker (PIPELINE_ENABLED), started on first use so its threads live after fork"""
+    global _stage_pipeline
+    if _stage_pipeline is None and settings.PIPELINE_ENABLED:
+        _stage_pipeline = StagePipeline(
+            settings.PIPELINE_QUEUE_SIZE,
+            settings.PIPELINE_STAGE_WORKERS,
+            set_thread_env().threads_per_worker
+        )
+    return _stage_pipeline
+
+
+async def _watch_disconnect(request: Request, deadline: RequestDeadline) -> None:
+    """Cancel the deadline when the client disconnects (the request body is already read)"""
+    while True:
+        message = await request.receive()
+        if message["type"] == "http.disconnect":
+            deadline.cancel()
+            return
+
+
+def _shadow(func: Callable, args, result, seconds: float) -> None:
+    """Offer a finished request to the shadow candidate, if one is configured"""
+    registry = get_registry()
+    shadow = registry.shadow if registry is not None else None
+    if shadow is not None:
+        shadow.maybe_run(func.__self__, func.__name__, args, result, seconds)
+
+
+@asynccontextmanager
+async def _client_slot(deadline: RequestDeadline) -> AsyncIterator[None]:
+    """
+    Hold an inference slot of the fair scheduler for the current API client
+
+    Records the client's queue wait, slot time and outcome (ok, aborted,
+    error) when the slot is given back.
+    """
+    client = current_client()
+    scheduler = get_scheduler()
+    queued = CLIENT_QUEUED.labels(client.name)
+    queue_start = time.perf_counter()
+    outcome, run_start = "aborted", None
+    try:
+        queued.inc()
+        try:
+            await scheduler.acquire(client, deadline)
+        finally:
+            queued.dec()
+        run_start = time.perf_counter()
+        try:
+            yield
+            outcome = "ok"
+        except RequestAborted:
+            raise
+        except Exception:
+            outcome = "error"
+            raise
+        finally:
+            scheduler.release(client)
+    finally:
+        end = time.perf_counter()
+        queue_seconds = (run_start or end) - queue_start
+        observe_client_document(client.name, outcome, queue_seconds, end - run_start if run_start else 0.0)
+
+
+async def run_pipeline(request: Request, func: Callable[..., T], *args) -> T:
+    """
+    Run a blocking OCR pipeline call for the current request
+
+    The call waits for an inference slot from the fair scheduler (shared
+    round-robin between API clients, within each client's max_concurrency)
+    and runs in the threadpool, so the event loop stays free to notice
+    client disconnects; the pipeline itself stops at its next
+    check_deadline once the request is cancelled or out of time. With
+    PIPELINE_ENABLED, process_image and process_image_for_fields go
+    through the stage pipeline instead, overlapping with other requests.
+
+    Args:
+        request: Current request (its body must already be consumed)
+        func: Bound OCRService pipeline method, e.g. ocr_service.process_image
+        *args: Arguments for func
+
+    Returns:
+        Result of func
+
+    Raises:
+        DeadlineExceeded: Out of time, while queued or between stages
+        RequestCancelled: The client disconnected
+    """
+    deadline = current_deadline() or begin_request_deadline()
+    pipeline = get_stage_pipeline()
+    watcher = asyncio.create_task(_watch_disconnect(request, deadline))
+    try:
+        async with _client_slot(deadline):
+            run_start = time.perf_counter()
+            if is_request_profiled():
+                # Sequential in one pool thread, sampled there (stage threads are not profiled)
+                result = await run_in_threadpool(profile_call, func, *args)
+            elif pipeline is not None and pipeline.supports(func.__name__):
+                # submit blocks while the detection inbox is full
+                future = await run_in_threadpool(pipeline.submit, func.__self__, func.__name__, *args)
+                result = await asyncio.wrap_future(future)
+            else:
+                result = await run_in_threadpool(func, *args)
+            _shadow(func, args, result, time.perf_counter() - run_start)
+            return result
+    finally:
+        watcher.cancel()
+
+
+async def stream_pipeline(request: Request, func: Callable[..., Iterator[T]], *args) -> AsyncIterator[T]:
+    """
+    Run a blocking OCR generator for the current request, e.g. ocr_service.stream_image
+
+    Holds an inference slot of the fair scheduler (as run_pipeline) for
+    the whole stream and runs each step of the generator in the
+    threadpool. Used as a StreamingResponse body. As in run_pipeline, a
+    watcher cancels the deadline as soon as the client disconnects, so the
+    step running in the threadpool stops at its next check_deadline; the
+    response then cancels the stream once that step has returned.
+
+    Args:
+        request: Current request (its body must already be consumed)
+        func: Bound OCRService generator method
+        *args: Arguments for func
+
+    Raises:
+        DeadlineExceeded: Out of time, while queued or between batches
+        RequestCancelled: The client disconnected
+    """
+    deadline = current_deadline() or begin_request_deadline()
+    watcher = asyncio.create_task(_watch_disconnect(request, deadline))
+    try:
+        async with _client_slot(deadline):
+            async for item in iterate_in_threadpool(func(*args)):
+                yield item
+    finally:
+        watcher.cancel()
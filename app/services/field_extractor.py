@@ -0,0 +1,467 @@
+import re
+import numpy as np
+from typing import List, Dict, Optional, Union
+from app.core.config import settings
+from app.services.ocr_result import OCRResults
+from app.utils.text import KeywordMatcher
+from app.utils.spatial import ReadingLayout, build_reading_layout, calculate_y_overlap
+
+
+# Keyword groups used by the extraction rules
+SUPPLIER_KEYWORDS = ['supplier', 'vendor', 'from', 'company', 'seller', 'nhà cung cấp', 'công ty']
+PRIORITY_TOTAL_KEYWORDS = ['grand total', 'amount due', 'total due', 'amount to pay',
+                           'thanh toan', 'tong tien', 'cong tien', 'phai thu']
+GENERIC_TOTAL_KEYWORDS = ['total', 'tổng', 'cộng']
+EXCLUDE_TOTAL_KEYWORDS = ['sub', 'net', 'tax', 'vat', 'trước thuế', 'discount', 'khuyến mãi', 'qty', 'sl']
+CURRENCY_KEYWORDS = {
+    'VND': ['vnd', 'vnđ', 'đ', 'dong', 'việt nam'],
+    'USD': ['usd', '$', 'dollar'],
+    'EUR': ['eur', '€', 'euro'],
+    'THB': ['thb', '฿', 'baht']
+}
+
+# Minimum vertical overlap for two boxes to be considered on the same line
+SAME_LINE_OVERLAP = 0.3
+
+# Page regions (fractions of the text extent) used by the fallback rules
+SUPPLIER_REGION_Y = 0.2   # Supplier: boxes starting in the top 20%
+TOTAL_REGION_X = 0.4      # Total: boxes starting right of 40% ...
+TOTAL_REGION_Y = 0.55     # ... and below 55%
+SUPPLIER_FALLBACK_BOXES = 3  # Supplier fallback reads the first boxes of its region
+
+_INLINE_NUMBER_RE = re.compile(r'[\d.,]+')
+_NON_DIGIT_RE = re.compile(r'[^\d]')
+_NON_MONEY_RE = re.compile(r'[^\d.,]')
+
+
+def clean_money_string(text: str) -> str:
+    """Clean money string by removing non-numeric characters"""
+    if not text:
+        return ""
+    cleaned = _NON_MONEY_RE.sub('', text)
+    cleaned = cleaned.rstrip('.,')
+    return cleaned
+
+
+def count_digits(text: str) -> int:
+    """Count decimal digits in text"""
+    return len(_NON_DIGIT_RE.sub('', text))
+
+
+def supplier_region_mask(boxes: np.ndarray, layout: ReadingLayout) -> np.ndarray:
+    """Boxes in the region the supplier fallback reads"""
+    return boxes[:, 1] < layout.max_y * SUPPLIER_REGION_Y
+
+
+def total_region_mask(boxes: np.ndarray, layout: ReadingLayout) -> np.ndarray:
+    """Boxes in the region the total fallback reads"""
+    return (boxes[:, 0] > layout.max_x * TOTAL_REGION_X) & (boxes[:, 1] > layout.max_y * TOTAL_REGION_Y)
+
+
+class _Document:
+    """Per-document view of OCR results, indexed once for all extractors"""
+
+    def __init__(self, results: Union[OCRResults, List[Dict]], matcher: KeywordMatcher):
+        if not isinstance(results, OCRResults):
+            results = OCRResults.from_records(results)
+
+        # Columns are read in place; only boxes a rule touches become lists
+        self.texts_raw: List[str] = results.texts
+        self.boxes: np.ndarray = results.boxes
+        self.confs: np.ndarray = results.confidences
+
+        self.masks: List[int] = [matcher.match(t.lower()) for t in self.texts_raw]
+
+        # Reuse the layout computed by process_image when available
+        layout = results.layout
+        if layout is None or len(layout) != len(results):
+            layout = build_reading_layout(results.boxes, settings.LINE_OVERLAP_THRESH)
+        self.layout: ReadingLayout = layout
+
+    def __len__(self) -> int:
+        return len(self.texts_raw)
+
+    def bbox(self, i: int) -> List[int]:
+        """Box i as [x1, y1, x2, y2]"""
+        return self.boxes[i].tolist()
+
+    def same_item(self, i: int, j: int) -> bool:
+        """Whether two entries carry identical content (text, bbox, confidence)"""
+        return i == j or (
+            self.texts_raw[i] == self.texts_raw[j]
+            and self.confs[i] == self.confs[j]
+            and bool((self.boxes[i] == self.boxes[j]).all())
+        )
+
+
+class FieldExtractor:
+    """
+    Rule-based invoice field extraction
+
+    All keyword lists are matched in a single pass per box, and every rule
+    walks the document's reading-order line layout (reused from
+    process_image when available) instead of rescanning the box list.
+    """
+
+    def __init__(self):
+        groups = {
+            'supplier': SUPPLIER_KEYWORDS,
+            'priority': PRIORITY_TOTAL_KEYWORDS,
+            'generic': GENERIC_TOTAL_KEYWORDS,
+            'exclude': EXCLUDE_TOTAL_KEYWORDS,
+        }
+        for currency, keywords in CURRENCY_KEYWORDS.items():
+            groups[f'currency:{currency}'] = keywords
+
+        self.matcher = KeywordMatcher(groups)
+        bits = self.matcher.group_bits
+        self._supplier_bit = bits['supplier']
+        self._priority_bit = bits['priority']
+        self._generic_bit = bits['generic']
+        self._exclude_bit = bits['exclude']
+        self._currency_bits = [
+            (currency, bits[f'currency:{currency}']) for currency in CURRENCY_KEYWORDS
+        ]
+        self._currency_any = 0
+        for _, bit in self._currency_bits:
+            self._currency_any |= bit
+
+    def extract(self, results: List[Dict]) -> Dict[str, Optional[str]]:
+        """
+        Extract invoice fields from OCR results
+
+        Args:
+            results: OCRResults, or a list of dicts with 'bbox', 'text', 'confidence'
+
+        Returns:
+            Dictionary with supplier_name, total, currency
+        """
+        doc = _Document(results, self.matcher)
+
+        supplier_name = self._extract_supplier_name(doc)
+        total = self._extract_grand_total(doc)
+        currency = self._extract_currency(doc, total)
+
+        return {
+            'supplier_name': supplier_name,
+            'total': total,
+            'currency': currency
+        }
+
+    def scan(self, results: OCRResults) -> "FieldScan":
+        """Start a field-first recognition scan over unrecognized results"""
+        return FieldScan(self, results)
+
+    def _extract_supplier_name(self, doc: _Document) -> Optional[str]:
+        """Extract supplier name from OCR data"""
+        layout = doc.layout
+
+        for i in layout.order:
+            # Check if this line contains supplier keywords
+            if not doc.masks[i] & self._supplier_bit:
+                continue
+
+            text_raw = doc.texts_raw[i]
+
+            # Try to find the actual name in the same line or next box on the line
+            if len(text_raw.split()) > 2:
+                # Name is in the same line
+                parts = text_raw.split(':', 1)
+                if len(parts) > 1:
+                    return parts[1].strip()
+                return text_raw
+
+            # Check the box right after it on the same line
+            j = layout.next_in_row(i)
+            if j is not None:
+                if calculate_y_overlap(doc.bbox(i), doc.bbox(j)) > SAME_LINE_OVERLAP:
+                    return doc.texts_raw[j]
+
+        # Fallback: Use text from top-left corner (usually has company name)
+        if len(doc):
+            # Find items in top 20% of image, in reading order
+            in_top = supplier_region_mask(doc.boxes, layout).tolist()
+            top_items = [i for i in layout.order if in_top[i]]
+
+            # Return first substantial text (more than 3 characters)
+            for i in top_items[:SUPPLIER_FALLBACK_BOXES]:
+                if len(doc.texts_raw[i]) > 3:
+                    return doc.texts_raw[i]
+
+        return None
+
+    def _extract_grand_total(self, doc: _Document) -> Optional[str]:
+        """Extract grand total from OCR data"""
+        layout = doc.layout
+        candidates = []
+
+        for i in layout.order:
+            mask = doc.masks[i]
+            if mask & self._exclude_bit:
+                continue
+
+            if mask & self._priority_bit:
+                score = 2
+            elif mask & self._generic_bit:
+                score = 1
+            else:
+                continue
+
+            candidates.append((score, int(doc.boxes[i, 3]), i))
+
+        # Sort by score (high to low) and bottom_y (high to low), stable on ties
+        candidates.sort(key=lambda c: (c[0], c[1]), reverse=True)
+
+        for _, _, label in candidates[:3]:
+            label_bbox = doc.bbox(label)
+
+            # Check 1: Number in same line (inline)
+            inline_nums = _INLINE_NUMBER_RE.findall(doc.texts_raw[label])
+            valid_inline = [num for num in inline_nums if count_digits(num) >= 3]
+            if valid_inline:
+                return clean_money_string(valid_inline[-1])
+
+            # Check 2: Find value on the right, among boxes sharing the label's rows
+            possible_values = []
+            for j in layout.y_index.query(label_bbox[1], label_bbox[3]):
+                if doc.same_item(label, j) or count_digits(doc.texts_raw[j]) < 2:
+                    continue
+
+                val_bbox = doc.bbox(j)
+                # Must be on the right
+                if val_bbox[0] < label_bbox[0]:
+                    continue
+
+                overlap = calculate_y_overlap(label_bbox, val_bbox)
+                if overlap > SAME_LINE_OVERLAP:
+                    possible_values.append((-overlap, layout.row_of[j], layout.col_of[j], j))
+
+            if possible_values:
+                # Highest overlap wins, earliest in reading order on ties
+                best = min(possible_values)[-1]
+                return clean_money_string(doc.texts_raw[best])
+
+        # Fallback: Find number in bottom-right corner
+        if not len(doc):
+            return None
+
+        in_region = total_region_mask(doc.boxes, layout).tolist()
+
+        best_key = None
+        best_text = None
+        for i in layout.order:
+            if in_region[i]:
+                bx = doc.bbox(i)
+                txt = clean_money_string(doc.texts_raw[i])
+                if len(txt) >= 3:
+                    key = (bx[1], bx[0])
+                    if best_key is None or key > best_key:
+                        best_key = key
+                        best_text = txt
+
+        return best_text
+
+    def _extract_currency(self, doc: _Document, total: Optional[str]) -> Optional[str]:
+        """Extract currency from OCR data"""
+        # Check all text for currency symbols or keywords, in reading order
+        for i in doc.layout.order:
+            mask = doc.masks[i]
+            if mask & self._currency_any:
+                for currency, bit in self._currency_bits:
+                    if mask & bit:
+                        return currency
+
+        # Check total string for currency symbols
+        if total:
+            total_lower = total.lower()
+            for currency, keywords in CURRENCY_KEYWORDS.items():
+                if any(kw in total_lower for kw in keywords if len(kw) > 1):
+                    return currency
+
+        # Default to VND (common for Vietnamese invoices)
+        return "VND"
+
+
+class _Frontier:
+    """Boxes ordered by a key, highest first, with the highest key still unread"""
+
+    def __init__(self, keys: np.ndarray, recognized: np.ndarray):
+        self.keys = keys
+        self.order = np.argsort(-keys, kind="stable").tolist()
+        self.recognized = recognized
+        self.pos = 0
+
+    def bound(self) -> float:
+        """Key of the highest unread box (-inf once every box is read)"""
+        order, recognized = self.order, self.recognized
+        while self.pos < len(order) and recognized[order[self.pos]]:
+            self.pos += 1
+        return self.keys[order[self.pos]] if self.pos < len(order) else -np.inf
+
+
+class FieldScan:
+    """
+    Field-first recognition order with early termination
+
+    Boxes are offered for recognition where the rules find the fields: the
+    supplier band (top of the page, in reading order) interleaved with the
+    total region (bottom right, bottom-up), then the rest of the page
+    bottom-up. When a recognized box carries a supplier or total keyword,
+    the boxes its value could come from jump the queue.
+
+    The search is bounded to those regions, so the scan stops well before
+    the whole page is read:
+    - supplier: a keyword box whose name is read, or the top band boxes the
+      fallback ranks (first SUPPLIER_FALLBACK_BOXES in reading order) read
+    - total: the best read label has its value boxes read and no unread box
+      lies lower on the page; without such a label, the lowest amount of
+      the total region is read with everything below it, or the whole
+      region is read
+    - currency: a currency keyword read, or the other two fields settled
+      (the rules then fall back to the total string or VND)
+
+    A keyword outside the read regions (e.g. a currency only named in a
+    table header mid-page) is therefore missed; benchmarks/field_parity.py
+    measures agreement with full recognition and the boxes saved.
+    """
+
+    def __init__(self, extractor: FieldExtractor, results: OCRResults):
+        self.extractor = extractor
+        self.results = results
+        n = len(results)
+
+        # Rules read this view; texts are shared with results
+        self.doc = _Document(results, extractor.matcher)
+        layout = self.layout = self.doc.layout
+        boxes = results.boxes
+
+        self.recognized = np.zeros(n, dtype=bool)
+        self.recognized_count = 0
+
+        in_supplier = supplier_region_mask(boxes, layout).tolist()
+        in_total = total_region_mask(boxes, layout).tolist()
+        self._total_unread = sum(in_total)
+        self._in_total = in_total
+
+        # Reading order within the supplier band, bottom-up elsewhere
+        order = list(layout.order)
+        supplier_first = [i for i in order if in_supplier[i]]
+        bottom_up = order[::-1]
+        total_first = [i for i in bottom_up if in_total[i] and not in_supplier[i]]
+        rest = [i for i in bottom_up if not in_total[i] and not in_supplier[i]]
+        self._supplier_fallback = supplier_first[:SUPPLIER_FALLBACK_BOXES]
+
+        queue = []
+        for k in range(max(len(supplier_first), len(total_first))):
+            queue.extend(supplier_first[k:k + 1])
+            queue.extend(total_first[k:k + 1])
+        queue.extend(rest)
+        self._queue: List[int] = queue[::-1]  # Popped from the end
+        self._urgent: List[int] = []
+
+        # Unread boxes lowest on the page, by bottom edge (labels) and top edge (fallback)
+        self._by_bottom = _Frontier(boxes[:, 3], self.recognized) if n else None
+        self._by_top = _Frontier(boxes[:, 1], self.recognized) if n else None
+
+        self._supplier_keys: List[int] = []
+        self._labels: List[tuple] = []  # (score, bottom, index) of read total labels
+        self._fallback_key: Optional[tuple] = None  # (y1, x1) of the lowest read amount in the total region
+
+    def next_batch(self, size: int) -> List[int]:
+        """Up to `size` unrecognized boxes to recognize next (empty when done)"""
+        batch = []
+        while len(batch) < size and (self._urgent or self._queue):
+            i = self._urgent.pop() if self._urgent else self._queue.pop()
+            if not self.recognized[i] and i not in batch:
+                batch.append(i)
+        return batch
+
+    def add_text(self, i: int, text: str) -> None:
+        """Store the recognized text of box i and update the field evidence"""
+        self.results.texts[i] = text
+        if self.recognized[i]:
+            return
+        self.recognized[i] = True
+        self.recognized_count += 1
+
+        if self._in_total[i]:
+            self._total_unread -= 1
+            if len(clean_money_string(text)) >= 3:
+                key = (int(self.doc.boxes[i, 1]), int(self.doc.boxes[i, 0]))
+                if self._fallback_key is None or key > self._fallback_key:
+                    self._fallback_key = key
+
+        extractor = self.extractor
+        mask = self.doc.masks[i] = extractor.matcher.match(text.lower())
+        if not mask:
+            return
+        if mask & extractor._supplier_bit:
+            self._supplier_keys.append(i)
+            self._urgent.extend(j for j in self._supplier_values(i) if not self.recognized[j])
+        if mask & (extractor._priority_bit | extractor._generic_bit) and not mask & extractor._exclude_bit:
+            score = 2 if mask & extractor._priority_bit else 1
+            self._labels.append((score, int(self.doc.boxes[i, 3]), i))
+            self._urgent.extend(j for j in reversed(self._total_values(i)) if not self.recognized[j])
+
+    def _supplier_values(self, i: int) -> List[int]:
+        """Box the supplier rule reads the name from when keyword box i has no name of its own"""
+        doc = self.doc
+        if len(doc.texts_raw[i].split()) > 2:
+            return []
+        j = self.layout.next_in_row(i)
+        if j is not None and calculate_y_overlap(doc.bbox(i), doc.bbox(j)) > SAME_LINE_OVERLAP:
+            return [j]
+        return []
+
+    def _total_values(self, label: int) -> List[int]:
+        """Boxes the total rule may read a value from for label (right of it, on its line)"""
+        doc = self.doc
+        label_bbox = doc.bbox(label)
+        values = []
+        for j in self.layout.y_index.query(label_bbox[1], label_bbox[3]):
+            if doc.same_item(label, j):
+                continue
+            val_bbox = doc.bbox(j)
+            if val_bbox[0] >= label_bbox[0] and calculate_y_overlap(label_bbox, val_bbox) > SAME_LINE_OVERLAP:
+                values.append(j)
+        return values
+
+    def _supplier_settled(self) -> bool:
+        recognized, texts = self.recognized, self.doc.texts_raw
+        found = False
+        for i in self._supplier_keys:
+            values = self._supplier_values(i)
+            if not recognized[values].all():
+                return False
+            found = found or len(texts[i].split()) > 2 or bool(values)
+        if found:
+            return True
+        # Fallback: the first substantial box among the ranked top band boxes
+        for i in self._supplier_fallback:
+            if not recognized[i]:
+                return False
+            if len(texts[i]) > 3:
+                return True
+        return True
+
+    def _total_settled(self) -> bool:
+        recognized, texts = self.recognized, self.doc.texts_raw
+        for score, bottom, label in sorted(self._labels, reverse=True)[:3]:
+            if any(count_digits(num) >= 3 for num in _INLINE_NUMBER_RE.findall(texts[label])):
+                return self._by_bottom.bound() < bottom
+            values = self._total_values(label)
+            if not recognized[values].all():
+                return False
+            if any(count_digits(texts[j]) >= 2 for j in values):
+                return self._by_bottom.bound() < bottom
+        # Fallback: the lowest amount of the bottom-right region
+        if self._total_unread == 0:
+            return True
+        return self._fallback_key is not None and self._by_top.bound() < self._fallback_key[0]
+
+    def settled(self) -> bool:
+        """Whether the fields can be extracted from the regions read so far"""
+        if self.recognized_count == len(self.recognized):
+            return True
+        # Currency needs nothing more: a keyword read by now is used, otherwise the default
+        return self._supplier_settled() and self._total_settled()
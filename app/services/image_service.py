@@ -1,6 +1,7 @@
 import cv2
 import numpy as np
 from fastapi import UploadFile, HTTPException
+from app.core.memory import ImageTooLarge, check_image_memory
 
 class ImageService:    
 
@@ -12,6 +13,13 @@ class ImageService:
         
         # Read image
         contents = file.file.read()
+        
+        # Reject images over the memory budget from their header, before decoding
+        try:
+            check_image_memory(contents)
+        except ImageTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        
         nparr = np.frombuffer(contents, np.uint8)
         image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
         
@@ -0,0 +1,168 @@
+import numpy as np
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+from app.utils.spatial import ReadingLayout
+
+
+class OCRBox:
+    """
+    Read-only view of one box in OCRResults
+
+    Supports the mapping access existing callers use on result dicts
+    (`result['bbox']`, `result.get('confidence', 0.0)`, `dict(result)`)
+    without storing a dict per box.
+    """
+
+    __slots__ = ("_results", "_index")
+
+    KEYS: Tuple[str, ...] = ("bbox", "text", "confidence")
+
+    def __init__(self, results: "OCRResults", index: int):
+        self._results = results
+        self._index = index
+
+    def __getitem__(self, key: str):
+        if key == "bbox":
+            return self._results.boxes[self._index].tolist()
+        if key == "text":
+            return self._results.texts[self._index]
+        if key == "confidence":
+            return float(self._results.confidences[self._index])
+        raise KeyError(key)
+
+    def get(self, key: str, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self) -> Tuple[str, ...]:
+        return self.KEYS
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.KEYS)
+
+    def __len__(self) -> int:
+        return len(self.KEYS)
+
+    def __contains__(self, key) -> bool:
+        return key in self.KEYS
+
+    def to_dict(self) -> Dict:
+        return {key: self[key] for key in self.KEYS}
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (OCRBox, dict)):
+            return self.to_dict() == dict(other)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return repr(self.to_dict())
+
+
+class OCRResults:
+    """
+    OCR results of one document in columnar form, stored in reading order
+
+    Attributes:
+        boxes: (N, 4) int32 array of [x1, y1, x2, y2]
+        confidences: (N,) float32 array of detection confidences
+        texts: Recognized text per box
+        layout: Line layout of the boxes, if computed
+
+    Iterating yields OCRBox views that behave like the
+    {'bbox', 'text', 'confidence'} dicts process_image used to return.
+    """
+
+    __slots__ = ("boxes", "confidences", "texts", "layout")
+
+    def __init__(
+        self,
+        boxes: np.ndarray,
+        confidences: np.ndarray,
+        texts: List[str],
+        layout: Optional[ReadingLayout] = None
+    ):
+        self.boxes = boxes
+        self.confidences = confidences
+        self.texts = texts
+        self.layout = layout
+
+    @classmethod
+    def empty(cls, n: int = 0) -> "OCRResults":
+        """Allocate results for n boxes, texts left empty"""
+        return cls(
+            np.zeros((n, 4), dtype=np.int32),
+            np.zeros(n, dtype=np.float32),
+            [""] * n
+        )
+
+    @classmethod
+    def from_records(cls, records: Sequence[Dict], layout: Optional[ReadingLayout] = None) -> "OCRResults":
+        """
+        Build results from {'bbox', 'text', 'confidence'} dicts
+
+        Records whose bbox is not [x1, y1, x2, y2] are skipped.
+        """
+        records = [r for r in records if len(r.get('bbox', [])) == 4]
+        results = cls.empty(len(records))
+        for i, record in enumerate(records):
+            results.boxes[i] = record['bbox']
+            results.confidences[i] = record.get('confidence', 0.0)
+            results.texts[i] = str(record.get('text', ''))
+        results.layout = layout
+        return results
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def __iter__(self) -> Iterator[OCRBox]:
+        for i in range(len(self.texts)):
+            yield OCRBox(self, i)
+
+    def __getitem__(self, index: Union[int, slice]):
+        if isinstance(index, slice):
+            return OCRResults(self.boxes[index], self.confidences[index], self.texts[index])
+        if index < 0:
+            index += len(self.texts)
+        if not 0 <= index < len(self.texts):
+            raise IndexError("OCRResults index out of range")
+        return OCRBox(self, index)
+
+    def to_records(self) -> List[Dict]:
+        """Materialize as a list of {'bbox', 'text', 'confidence'} dicts"""
+        return [
+            {'bbox': bbox, 'text': text, 'confidence': conf}
+            for bbox, text, conf in zip(self.boxes.tolist(), self.texts, self.confidences.tolist())
+        ]
+
+    def to_bbox_payload(self) -> Dict:
+        """
+        Build the default /bboxes response body (BBoxListResponse layout)
+
+        Returned as plain Python objects so it can be serialized directly
+        without per-box model validation.
+        """
+        return {
+            'results': [
+                {'label': text, 'text': text, 'bbox': bbox}
+                for text, bbox in zip(self.texts, self.boxes.tolist())
+            ]
+        }
+
+    def to_columnar_payload(self, flat: bool = False) -> Dict:
+        """
+        Build the compact columnar /bboxes response body
+
+        Args:
+            flat: Emit boxes as one flat [x1, y1, x2, y2, x1, ...] array
+                instead of one [x1, y1, x2, y2] array per box
+
+        Returns:
+            {'texts': [...], 'boxes': ndarray}; boxes stay a NumPy array
+            for orjson's native serializer
+        """
+        boxes = self.boxes.reshape(-1) if flat else self.boxes
+        return {'texts': self.texts, 'boxes': np.ascontiguousarray(boxes)}
+
+    def __repr__(self) -> str:
+        return f"OCRResults(n={len(self)})"
@@ -1,11 +1,18 @@
-import re
 import cv2
+import time
 import numpy as np
-from typing import List, Dict, Optional, Tuple
+import paddle
+from typing import Iterable, Iterator, List, Dict, Optional, Tuple, Union
 from app.core.logger import logger
-from app.models.detector.inference import run_detection_on_image
-from app.models.recognizer.inference import run_recognition_on_bbox
-from app.utils.image import extract_bboxes_from_output, visualize_ocr_results
+from app.core.metrics import track_stage, observe_document, observe_detection_path, observe_recognition
+from app.core.timing import record_count
+from app.core.deadline import check_deadline
+from app.models.detector.inference import preprocess_for_detection, run_detector
+from app.models.recognizer.batch import recognize_boxes, size_classes
+from app.utils.image import extract_bboxes_from_output, estimate_text_height, visualize_ocr_results
+from app.utils.spatial import build_reading_layout
+from app.services.field_extractor import FieldExtractor
+from app.services.ocr_result import OCRResults
 from app.core.config import settings
 
 class OCRService:
@@ -14,65 +21,247 @@ class OCRService:
     def __init__(self, det_model, rec_model):
         self.det_model = det_model
         self.rec_model = rec_model
+        self.field_extractor = FieldExtractor()
     
-    def process_image(self, image: np.ndarray) -> List[Dict]:
+    def process_image(self, image: np.ndarray) -> OCRResults:
         """
         Process image through detection and recognition pipeline
         
+        The request deadline is checked between stages and recognition
+        batches (see app.core.deadline); with partial results allowed,
+        boxes not reached in time keep an empty text.
+        
         Args:
             image: Input image as numpy array
             
         Returns:
-            List of OCR results with 'bbox', 'text', 'confidence'
+            OCR results with 'bbox', 'text', 'confidence', in reading order
+        """
+        logger.debug("Starting OCR pipeline")
+        results = self.detect_text_boxes(image)
+        return self.recognize_all(image, results)
+    
+    def recognize_all(self, image: np.ndarray, results: OCRResults) -> OCRResults:
         """
-        logger.info("Starting OCR pipeline...")
+        Step 4 of process_image: recognize every box, in batches
         
-        # Step 1: Run detection
-        logger.info("Step 1: Running detection...")
-        output = run_detection_on_image(
-            self.det_model,
-            image,
-            resize_long=settings.DETECTION_RESIZE_LONG,
-            thresh=settings.DETECTION_THRESH,
-            box_thresh=settings.DETECTION_BOX_THRESH
-        )
+        Args:
+            image: Input image as numpy array
+            results: Output of detect_text_boxes, texts filled in place
+            
+        Returns:
+            results
+        """
+        logger.debug("Step 4: Running recognition")
+        boxes = results.boxes
+        record_count("crops", int(((boxes[:, 2] > boxes[:, 0]) & (boxes[:, 3] > boxes[:, 1])).sum()))
+        bboxes = boxes.tolist()
+        batch_size = settings.RECOGNITION_BATCH_SIZE
+        with track_stage("recognition"):
+            # Batched forward passes over pooled input buffers, deadline checked per batch
+            for start in range(0, len(bboxes), batch_size):
+                if not check_deadline("recognition", len(bboxes) - start, can_stop=True):
+                    break
+                texts = recognize_boxes(self.rec_model, image, bboxes[start:start + batch_size], batch_size)
+                results.texts[start:start + len(texts)] = texts
+        
+        logger.debug("OCR pipeline completed, %d text boxes", len(results))
         
-        # Step 2: Extract bounding boxes
-        logger.info("Step 2: Extracting bounding boxes...")
-        bboxes = extract_bboxes_from_output(
-            output,
-            image,
-            conf_threshold=settings.CONF_THRESH,
-            expand_ratio_w=settings.EXPAND_RATIO_W,
-            expand_ratio_h=settings.EXPAND_RATIO_H,
-            min_pad_h=settings.MIN_PAD_H,
-            max_pad_h=settings.MAX_PAD_H
-        )
+        return results
+    
+    def process_image_for_fields(self, image: np.ndarray) -> OCRResults:
+        """
+        Process image recognizing only the boxes invoice fields need
         
-        logger.info(f"Found {len(bboxes)} bounding boxes")
+        Boxes are recognized in field-first order (see FieldScan) and
+        recognition stops once no unread box could change the fields the
+        extraction rules give; boxes never recognized keep an empty text.
         
-        # Step 3: Run recognition on each bbox
-        logger.info("Step 3: Running recognition...")
-        results = []
-        for i, bbox in enumerate(bboxes):
-            x1, y1, x2, y2, conf = bbox
+        Args:
+            image: Input image as numpy array
             
-            # Run recognition
-            text = run_recognition_on_bbox(self.rec_model, image, bbox)
+        Returns:
+            OCR results in reading order, partially recognized
+        """
+        logger.debug("Starting field-first OCR pipeline")
+        results = self.detect_text_boxes(image)
+        return self.recognize_fields(image, results)
+    
+    def recognize_fields(self, image: np.ndarray, results: OCRResults) -> OCRResults:
+        """
+        Step 4 of process_image_for_fields: recognize boxes lazily until the fields are settled
+        
+        Args:
+            image: Input image as numpy array
+            results: Output of detect_text_boxes, texts filled in place
             
-            results.append({
-                'bbox': [x1, y1, x2, y2],
-                'text': text,
-                'confidence': conf
-            })
+        Returns:
+            results
+        """
+        logger.debug("Step 4: Running field-first recognition")
+        scan = self.field_extractor.scan(results)
+        with track_stage("recognition"):
+            while not scan.settled():
+                if not check_deadline("recognition", len(results) - scan.recognized_count, can_stop=True):
+                    break
+                batch = scan.next_batch(settings.FIELD_SCAN_BATCH)
+                if not batch:
+                    break
+                texts = recognize_boxes(
+                    self.rec_model, image, results.boxes[batch].tolist(), settings.RECOGNITION_BATCH_SIZE
+                )
+                for i, text in zip(batch, texts):
+                    scan.add_text(i, text)
+        
+        observe_recognition(scan.recognized_count, len(results))
+        logger.debug("Field-first pipeline completed, recognized %d/%d text boxes", scan.recognized_count, len(results))
+        
+        return results
+    
+    def stream_image(self, image: np.ndarray) -> Iterator[Tuple[str, Dict]]:
+        """
+        Process image incrementally, yielding results as each stage completes
+        
+        Events, in order:
+        - ("boxes", {"boxes": [[x1, y1, x2, y2], ...], "confidences": [...]})
+          once detection and layout are done, boxes in reading order
+        - ("texts", {"start": i, "texts": [...]}) per recognition batch,
+          texts of boxes start .. start + len(texts) - 1
+        - ("fields", {"supplier_name", "total", "currency"}) at the end
+        
+        Work stops between batches if the consumer stops iterating; on a
+        deadline with partial results allowed, remaining batches are skipped
+        and fields are extracted from the texts recognized so far.
+        
+        Args:
+            image: Input image as numpy array
             
-            logger.debug(f"  {i+1}/{len(bboxes)}: '{text}' (conf: {conf:.3f})")
+        Yields:
+            (event name, payload) tuples
+        """
+        logger.debug("Starting streaming OCR pipeline")
+        results = self.detect_text_boxes(image)
+        yield "boxes", {"boxes": results.boxes.tolist(), "confidences": results.confidences.tolist()}
+        
+        # Step 4: Recognize in reading order, one batch per event
+        logger.debug("Step 4: Running streaming recognition")
+        boxes = results.boxes
+        record_count("crops", int(((boxes[:, 2] > boxes[:, 0]) & (boxes[:, 3] > boxes[:, 1])).sum()))
+        bboxes = boxes.tolist()
+        batch_size = settings.RECOGNITION_BATCH_SIZE
+        for start in range(0, len(bboxes), batch_size):
+            if not check_deadline("recognition", len(bboxes) - start, can_stop=True):
+                break
+            with track_stage("recognition"):
+                texts = recognize_boxes(self.rec_model, image, bboxes[start:start + batch_size], batch_size)
+            results.texts[start:start + len(texts)] = texts
+            yield "texts", {"start": start, "texts": texts}
+        
+        yield "fields", self.extract_invoice_fields(results)
+        logger.debug("Streaming pipeline completed, %d text boxes", len(results))
+    
+    def detect_text_boxes(self, image: np.ndarray) -> OCRResults:
+        """
+        Detection, box extraction and reading-order layout (no recognition)
         
-        logger.info(f"OCR pipeline completed. Processed {len(results)} text boxes.")
+        Args:
+            image: Input image as numpy array
+            
+        Returns:
+            OCR results in reading order with empty texts
+        """
+        # Step 1: Run detection
+        check_deadline("detection")
+        logger.debug("Step 1: Running detection")
+        h, w = image.shape[:2]
+        logger.debug("Image size: %dx%d", w, h)
+        output = self.detect(image)
+        return self.extract_text_boxes(image, output)
+    
+    def extract_text_boxes(self, image: np.ndarray, output) -> OCRResults:
+        """
+        Steps 2-3: boxes from the detector output, grouped into lines in reading order
         
-        return results
+        Args:
+            image: Input image as numpy array
+            output: Detector output for image (see detect)
+            
+        Returns:
+            OCR results in reading order with empty texts
+        """
+        # Step 2: Extract bounding boxes
+        check_deadline("postprocess")
+        logger.debug("Step 2: Extracting bounding boxes")
+        with track_stage("postprocess"):
+            bboxes = extract_bboxes_from_output(
+                output,
+                image,
+                conf_threshold=settings.CONF_THRESH,
+                expand_ratio_w=settings.EXPAND_RATIO_W,
+                expand_ratio_h=settings.EXPAND_RATIO_H,
+                min_pad_h=settings.MIN_PAD_H,
+                max_pad_h=settings.MAX_PAD_H
+            )
+        
+        logger.debug("Found %d bounding boxes", len(bboxes))
+        observe_document(len(bboxes))
+        
+        # Step 3: Group boxes into lines and sort them in reading order
+        with track_stage("layout"):
+            boxes = np.array([b[:4] for b in bboxes], dtype=np.int32).reshape(-1, 4)
+            confidences = np.array([b[4] for b in bboxes], dtype=np.float32)
+            layout = build_reading_layout(boxes, settings.LINE_OVERLAP_THRESH)
+            order = np.asarray(layout.order, dtype=np.intp)
+            return OCRResults(boxes[order], confidences[order], [""] * len(order), layout.reordered())
+    
+    def _detection_pass(self, image: np.ndarray, resize_long: int):
+        with track_stage("detection_preprocess"):
+            det_input = preprocess_for_detection(image, resize_long=resize_long)
+        with track_stage("detection_forward"):
+            return run_detector(self.det_model, det_input)
+    
+    def detect(self, image: np.ndarray):
+        """
+        Run the detector, adapting the input resolution when DETECTION_ADAPTIVE is set
+        
+        Adaptive mode runs a coarse pass first and keeps it when the median
+        text height it finds is large enough; otherwise (small or no text)
+        the detector runs again at the fine resolution.
+        
+        Args:
+            image: Input image as numpy array
+            
+        Returns:
+            Detector output of the pass that was kept
+        """
+        if not settings.DETECTION_ADAPTIVE:
+            observe_detection_path("single", settings.DETECTION_RESIZE_LONG)
+            return self._detection_pass(image, settings.DETECTION_RESIZE_LONG)
+        
+        coarse_long = settings.DETECTION_COARSE_LONG
+        output = self._detection_pass(image, coarse_long)
+        
+        # Image already at or below coarse resolution: a fine pass sees the same pixels
+        if max(image.shape[:2]) <= coarse_long:
+            observe_detection_path("coarse", coarse_long)
+            return output
+        
+        with track_stage("detection_estimate"):
+            text_height = estimate_text_height(output, settings.CONF_THRESH)
+        if text_height is not None and text_height >= settings.DETECTION_MIN_TEXT_HEIGHT:
+            logger.debug("Coarse detection kept (median text height %.1fpx)", text_height)
+            observe_detection_path("coarse", coarse_long)
+            return output
+        
+        check_deadline("detection")
+        logger.debug(
+            "Text too small at %dpx (median height %s), re-running at %dpx",
+            coarse_long, text_height, settings.DETECTION_FINE_LONG
+        )
+        observe_detection_path("fine", settings.DETECTION_FINE_LONG)
+        return self._detection_pass(image, settings.DETECTION_FINE_LONG)
     
-    def visualize_results(self, image: np.ndarray, results: List[Dict]) -> np.ndarray:
+    def visualize_results(self, image: np.ndarray, results: OCRResults) -> np.ndarray:
         """
         Visualize OCR results on image
         
@@ -85,7 +274,7 @@ class OCRService:
         """
         return visualize_ocr_results(image, results)
     
-    def extract_invoice_fields(self, results: List[Dict]) -> Dict[str, Optional[str]]:
+    def extract_invoice_fields(self, results: Union[OCRResults, List[Dict]]) -> Dict[str, Optional[str]]:
         """
         Extract invoice fields from OCR results
         
@@ -95,232 +284,52 @@ class OCRService:
         Returns:
             Dictionary with supplier_name, total, currency
         """
-        logger.info("Extracting invoice fields...")
-        
-        # Standardize data format
-        standardized_data = []
-        for item in results:
-            text = str(item.get('text', '')).lower()
-            raw_text = str(item.get('text', ''))
-            conf = item.get('confidence', 0.0)
-            
-            bbox = item.get('bbox', [])
-            if len(bbox) != 4:
-                continue
-            
-            standardized_data.append({
-                'text': text,
-                'text_raw': raw_text,
-                'bbox': bbox,  # [x1, y1, x2, y2]
-                'conf': conf
-            })
-        
-        # Extract fields
-        supplier_name = self._extract_supplier_name(standardized_data)
-        total = self._extract_grand_total(standardized_data)
-        currency = self._extract_currency(standardized_data, total)
-        
-        return {
-            'supplier_name': supplier_name,
-            'total': total,
-            'currency': currency
-        }
-    
-    def _extract_supplier_name(self, data: List[Dict]) -> Optional[str]:
-        """Extract supplier name from OCR data"""
-        # Look for supplier-related keywords
-        supplier_keywords = ['supplier', 'vendor', 'from', 'company', 'seller', 'nhà cung cấp', 'công ty']
+        logger.debug("Extracting invoice fields")
         
-        for i, item in enumerate(data):
-            text = item['text']
-            
-            # Check if this line contains supplier keywords
-            if any(kw in text for kw in supplier_keywords):
-                # Try to find the actual name in the same line or next line
-                if len(item['text_raw'].split()) > 2:
-                    # Name is in the same line
-                    parts = item['text_raw'].split(':', 1)
-                    if len(parts) > 1:
-                        return parts[1].strip()
-                    return item['text_raw']
-                
-                # Check next line
-                if i + 1 < len(data):
-                    next_item = data[i + 1]
-                    # Check if next item is close vertically
-                    if self._calculate_y_overlap(item['bbox'], next_item['bbox']) > 0.3:
-                        return next_item['text_raw']
-        
-        # Fallback: Use text from top-left corner (usually has company name)
-        if data:
-            # Find items in top 20% of image
-            max_y = max([d['bbox'][3] for d in data])
-            top_items = [d for d in data if d['bbox'][1] < max_y * 0.2]
-            
-            if top_items:
-                # Sort by y position (top to bottom)
-                top_items.sort(key=lambda x: x['bbox'][1])
-                # Return first substantial text (more than 3 characters)
-                for item in top_items[:3]:
-                    if len(item['text_raw']) > 3:
-                        return item['text_raw']
-        
-        return None
-    
-    def _extract_grand_total(self, data: List[Dict]) -> Optional[str]:
-        """Extract grand total from OCR data"""
-        # Priority keywords
-        priority_keywords = ['grand total', 'amount due', 'total due', 'amount to pay', 
-                            'thanh toan', 'tong tien', 'cong tien', 'phai thu']
-        generic_keywords = ['total', 'tổng', 'cộng']
-        exclude_keywords = ['sub', 'net', 'tax', 'vat', 'trước thuế', 'discount', 'khuyến mãi', 'qty', 'sl']
-        
-        candidates = []
-        
-        for item in data:
-            text = item['text']
-            bbox = item['bbox']
-            
-            if any(ex in text for ex in exclude_keywords):
-                continue
-            
-            score = 0
-            if any(pk in text for pk in priority_keywords):
-                score = 2
-            elif any(gk in text for gk in generic_keywords):
-                score = 1
-            
-            if score > 0:
-                candidates.append({'item': item, 'score': score, 'bottom_y': bbox[3]})
-        
-        # Check candidates
-        if candidates:
-            # Sort by score (high to low) and bottom_y (low to high)
-            candidates.sort(key=lambda x: (x['score'], x['bottom_y']), reverse=True)
-            top_labels = candidates[:3]
-            
-            for cand in top_labels:
-                label_item = cand['item']
-                label_bbox = label_item['bbox']
-                
-                # Check 1: Number in same line (inline)
-                inline_nums = re.findall(r'[\d.,]+', label_item['text_raw'])
-                valid_inline = [n for n in inline_nums if len(re.sub(r'[^\d]', '', n)) >= 3]
-                if valid_inline:
-                    return self._clean_money_string(valid_inline[-1])
-                
-                # Check 2: Find value on the right
-                possible_values = []
-                for item in data:
-                    if item == label_item:
-                        continue
-                    
-                    val_text = item['text_raw']
-                    val_bbox = item['bbox']
-                    
-                    # Must contain number
-                    if not re.search(r'\d', val_text):
-                        continue
-                    if len(re.sub(r'[^\d]', '', val_text)) < 2:
-                        continue
-                    
-                    # Must be on the right
-                    if val_bbox[0] < label_bbox[0]:
-                        continue
-                    
-                    # Check vertical overlap
-                    overlap = self._calculate_y_overlap(label_bbox, val_bbox)
-                    
-                    if overlap > 0.3:
-                        possible_values.append({
-                            'text': val_text,
-                            'overlap': overlap
-                        })
-                
-                if possible_values:
-                    possible_values.sort(key=lambda x: x['overlap'], reverse=True)
-                    return self._clean_money_string(possible_values[0]['text'])
-        
-        # Fallback: Find number in bottom-right corner
-        if not data:
-            return None
-        
-        max_w = max([i['bbox'][2] for i in data])
-        max_h = max([i['bbox'][3] for i in data])
-        
-        region_x = max_w * 0.4
-        region_y = max_h * 0.55
-        
-        bottom_right_nums = []
-        for item in data:
-            bx = item['bbox']
-            if bx[0] > region_x and bx[1] > region_y:
-                txt = self._clean_money_string(item['text_raw'])
-                if len(txt) >= 3:
-                    bottom_right_nums.append({
-                        'text': txt,
-                        'y': bx[1],
-                        'x': bx[0]
-                    })
-        
-        if bottom_right_nums:
-            bottom_right_nums.sort(key=lambda k: (k['y'], k['x']), reverse=True)
-            return bottom_right_nums[0]['text']
-        
-        return None
-    
-    def _extract_currency(self, data: List[Dict], total: Optional[str]) -> Optional[str]:
-        """Extract currency from OCR data"""
-        currency_keywords = {
-            'VND': ['vnd', 'vnđ', 'đ', 'dong', 'việt nam'],
-            'USD': ['usd', '$', 'dollar'],
-            'EUR': ['eur', '€', 'euro'],
-            'THB': ['thb', '฿', 'baht']
-        }
-        
-        # Check all text for currency symbols or keywords
-        for item in data:
-            text = item['text'].lower()
-            for currency, keywords in currency_keywords.items():
-                if any(kw in text for kw in keywords):
-                    return currency
-        
-        # Check total string for currency symbols
-        if total:
-            for currency, keywords in currency_keywords.items():
-                if any(kw in total.lower() for kw in keywords if len(kw) > 1):
-                    return currency
-        
-        # Default to VND (common for Vietnamese invoices)
-        return "VND"
+        with track_stage("field_extraction"):
+            return self.field_extractor.extract(results)
     
-    def _calculate_y_overlap(self, box1: List[int], box2: List[int]) -> float:
-        """Calculate vertical overlap ratio between two boxes"""
-        y1_a, y2_a = box1[1], box1[3]
-        y1_b, y2_b = box2[1], box2[3]
-        
-        intersect_start = max(y1_a, y1_b)
-        intersect_end = min(y2_a, y2_b)
-        
-        if intersect_end <= intersect_start:
-            return 0.0
-        
-        overlap_height = intersect_end - intersect_start
-        min_height = min(y2_a - y1_a, y2_b - y1_b)
+    def warmup(self, shapes: Iterable[Tuple[int, int]], iterations: int = 1) -> float:
+        """
+        Run both models on blank inputs so the first real requests do not
+        pay for kernel selection and memory allocation
         
-        if min_height == 0:
-            return 0.0
+        Models are called directly, so warmup does not show up in metrics.
         
-        return overlap_height / min_height
-    
-    def _clean_money_string(self, text: str) -> str:
-        """Clean money string by removing non-numeric characters"""
-        if not text:
-            return ""
-        cleaned = re.sub(r'[^\d.,]', '', text)
-        cleaned = cleaned.rstrip('.,')
-        return cleaned
-
+        Args:
+            shapes: (height, width) of representative input pages
+            iterations: Forward passes per shape
+            
+        Returns:
+            Warmup duration in seconds
+        """
+        start = time.perf_counter()
+        
+        # Detector input shape depends on the page shape (long side resize, pad to 32)
+        if settings.DETECTION_ADAPTIVE:
+            resolutions = [settings.DETECTION_COARSE_LONG, settings.DETECTION_FINE_LONG]
+        else:
+            resolutions = [settings.DETECTION_RESIZE_LONG]
+        det_inputs = {}
+        for h, w in shapes:
+            for resize_long in resolutions:
+                det_input = preprocess_for_detection(np.zeros((h, w, 3), dtype=np.uint8), resize_long=resize_long)
+                det_inputs[det_input.shape] = det_input
+        for det_input in det_inputs.values():
+            for _ in range(iterations):
+                run_detector(self.det_model, det_input)
+            logger.info("Warmed up detector for input %s", list(det_input.shape))
+        
+        # Recognizer input is a fixed-size crop; batches come in a few size classes
+        with paddle.no_grad():
+            for size in size_classes(settings.RECOGNITION_BATCH_SIZE):
+                crops = paddle.zeros(
+                    [size, 3, settings.RECOGNITION_TARGET_H, settings.RECOGNITION_TARGET_W], dtype='float32'
+                )
+                for _ in range(iterations):
+                    self.rec_model(crops)
+        
+        return time.perf_counter() - start
     
 
 
@@ -0,0 +1,282 @@
+"""
+Offline batch OCR over local files, without HTTP
+
+`python -m app batch` runs OCRService directly over directories, glob
+patterns, image files and zip archives with a pool of worker processes,
+and appends one JSON line per document to the output file as results
+arrive:
+    {"id": "scans/inv_001.png", "fields": {...}, "boxes": 87, "seconds": 0.41}
+    {"id": "2024.zip:march/inv_002.jpg", "error": "ValueError: Invalid image file", ...}
+With --mode full the line also carries "texts", "boxes_xyxy" and
+"confidences" of every box.
+
+Ids already in the output are skipped, so an interrupted run resumes where
+it stopped by running the same command again (a line cut off mid-write is
+dropped). If a worker process dies (out of memory, a crash in native
+code), the documents it had in flight are recorded as errors and a new
+pool carries on with the rest; --retry-errors runs them again. Throughput
+and ETA are reported on stderr while running.
+
+As in the pre-fork server, models are loaded once in the parent and the
+workers are forked from it, sharing the weights copy-on-write; the cores
+are split between workers (app.core.threads). Paddle is imported inside
+the functions because the thread environment must be set first.
+"""
+import glob
+import signal
+import sys
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Set
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.core.memory import check_image_memory
+
+# Per worker process
+_service = None
+_archives: Dict[str, zipfile.ZipFile] = {}
+
+
+@dataclass(frozen=True)
+class BatchItem:
+    """One input document"""
+    id: str  # file path, or "<archive>:<member>"
+    path: str
+    member: Optional[str] = None  # member name inside the zip archive at path
+
+
+def _is_image(name: str) -> bool:
+    return Path(name).suffix.lower() in settings.ALLOWED_EXTENSIONS
+
+
+def _expand(path: Path) -> Iterable[BatchItem]:
+    if path.is_dir():
+        for child in sorted(path.rglob("*")):
+            if child.is_file() and (_is_image(child.name) or zipfile.is_zipfile(child)):
+                yield from _expand(child)
+    elif zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            for member in sorted(archive.namelist()):
+                if not member.endswith("/") and _is_image(member):
+                    yield BatchItem(f"{path}:{member}", str(path), member)
+    elif _is_image(path.name):
+        yield BatchItem(str(path), str(path))
+
+
+def collect_items(inputs: Sequence[str]) -> List[BatchItem]:
+    """Documents of every input (directory, zip, image file or glob pattern), without duplicates"""
+    items: Dict[str, BatchItem] = {}
+    for spec in inputs:
+        paths = [Path(spec)] if Path(spec).exists() else [Path(p) for p in sorted(glob.glob(spec, recursive=True))]
+        if not paths:
+            logger.warning("No files match %r", spec)
+        for path in paths:
+            for item in _expand(path):
+                items.setdefault(item.id, item)
+    return list(items.values())
+
+
+def completed_ids(output: Path, retry_errors: bool = False) -> Set[str]:
+    """
+    Ids already written to the output file
+
+    A trailing line without newline (interrupted write) is truncated away
+    so appending continues on a clean line; lines that are not a record
+    with an id are ignored.
+    """
+    import orjson
+
+    done: Set[str] = set()
+    if not output.exists():
+        return done
+    end = 0
+    with open(output, "rb+") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            end += len(line)
+            try:
+                record = orjson.loads(line)
+            except orjson.JSONDecodeError:
+                continue
+            if not isinstance(record, dict) or "id" not in record:
+                continue
+            if retry_errors and "error" in record:
+                continue
+            done.add(record["id"])
+        f.truncate(end)
+    return done
+
+
+def _read(item: BatchItem) -> bytes:
+    if item.member is None:
+        with open(item.path, "rb") as f:
+            return f.read()
+    archive = _archives.get(item.path)
+    if archive is None:
+        archive = _archives[item.path] = zipfile.ZipFile(item.path)
+    return archive.read(item.member)
+
+
+def _init_worker() -> None:
+    """Worker process setup: thread limits, and the service on the models inherited from the parent"""
+    global _service
+    from app.core.threads import configure_worker_threads
+    from app.models.preload import get_preloaded_models, preload_models
+    from app.services.ocr_service import OCRService
+
+    # Ctrl-C is handled by the parent, which stops the pool
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    configure_worker_threads()
+    models = get_preloaded_models() or preload_models()
+    _service = OCRService(models.det_model, models.rec_model)
+
+
+def process_item(item: BatchItem, mode: str) -> Dict:
+    """OCR one document in a worker; failures become an "error" record"""
+    import cv2
+    import numpy as np
+
+    start = time.perf_counter()
+    try:
+        data = _read(item)
+        check_image_memory(data)
+        image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            raise ValueError("Invalid image file")
+        if mode == "fields" and settings.FIELD_ONLY_RECOGNITION:
+            results = _service.process_image_for_fields(image)
+        else:
+            results = _service.process_image(image)
+        record = {"id": item.id, "fields": _service.extract_invoice_fields(results), "boxes": len(results)}
+        if mode == "full":
+            record.update(texts=results.texts, boxes_xyxy=results.boxes, confidences=results.confidences)
+    except Exception as e:
+        record = {"id": item.id, "error": f"{type(e).__name__}: {e}"}
+    record["seconds"] = round(time.perf_counter() - start, 3)
+    return record
+
+
+def _format_eta(seconds: float) -> str:
+    seconds = int(seconds)
+    return f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+def run_batch(
+    inputs: Sequence[str],
+    output: Path,
+    workers: Optional[int] = None,
+    mode: str = "fields",
+    retry_errors: bool = False,
+    progress_interval: float = 5.0
+) -> Dict:
+    """
+    OCR every document of inputs into output (JSONL), resuming a previous run
+
+    Returns:
+        Counts of this run: {"total", "skipped", "processed", "errors", "seconds"}
+    """
+    import multiprocessing
+    import orjson
+
+    from app.core.threads import set_thread_env
+
+    workers = max(1, workers or settings.WORKERS)
+    # Step 1: Split cores between workers before paddle reads its thread env
+    set_thread_env(workers)
+
+    # Step 2: Work out what is left to do
+    items = collect_items(inputs)
+    done = completed_ids(output, retry_errors)
+    pending = [item for item in items if item.id not in done]
+    summary = {"total": len(items), "skipped": len(items) - len(pending), "processed": 0, "errors": 0, "seconds": 0.0}
+    print(f"{len(items)} documents, {summary['skipped']} already in {output}, {len(pending)} to process",
+          file=sys.stderr)
+    if not pending:
+        return summary
+
+    # Step 3: Load models once; forked workers share them
+    start_method = "fork" if "fork" in multiprocessing.get_all_start_methods() else None
+    if start_method == "fork":
+        from app.models.preload import preload_models
+        preload_models()
+
+    # Step 4: Keep a bounded number of documents in flight and append results as they finish
+    start = time.perf_counter()
+    next_report = start + progress_interval
+    queue = iter(pending)
+    in_flight: Dict[Future, BatchItem] = {}
+    output.parent.mkdir(parents=True, exist_ok=True)
+    mp_context = multiprocessing.get_context(start_method)
+    executor = ProcessPoolExecutor(max_workers=workers, mp_context=mp_context, initializer=_init_worker)
+    pool_completed = 0
+    try:
+        with open(output, "ab") as out:
+            while True:
+                while len(in_flight) < workers * 4:
+                    item = next(queue, None)
+                    if item is None:
+                        break
+                    in_flight[executor.submit(process_item, item, mode)] = item
+                if not in_flight:
+                    break
+
+                finished, _ = wait(in_flight, timeout=progress_interval, return_when=FIRST_COMPLETED)
+                broken = any(isinstance(future.exception(), BrokenProcessPool) for future in finished)
+                if broken:
+                    # Every document still in the dead pool is lost with it
+                    finished = wait(in_flight)[0]
+                for future in finished:
+                    item = in_flight.pop(future)
+                    error = future.exception()
+                    if isinstance(error, BrokenProcessPool):
+                        record = {"id": item.id, "error": f"BrokenProcessPool: {error}", "seconds": 0.0}
+                    else:
+                        record = future.result()
+                        pool_completed += 1
+                    out.write(orjson.dumps(record, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_APPEND_NEWLINE))
+                    summary["processed"] += 1
+                    summary["errors"] += "error" in record
+                out.flush()
+
+                if broken:
+                    executor.shutdown(wait=True)
+                    if not pool_completed:
+                        print("Worker processes died before finishing any document; stopping "
+                              "(run the same command with --retry-errors to resume)", file=sys.stderr)
+                        break
+                    print(f"A worker process died; its documents were recorded as errors, "
+                          f"restarting {workers} workers", file=sys.stderr)
+                    executor = ProcessPoolExecutor(max_workers=workers, mp_context=mp_context, initializer=_init_worker)
+                    pool_completed = 0
+
+                now = time.perf_counter()
+                if now >= next_report:
+                    rate = summary["processed"] / (now - start)
+                    remaining = len(pending) - summary["processed"]
+                    eta = _format_eta(remaining / rate) if rate > 0 else "-"
+                    print(
+                        f"{summary['skipped'] + summary['processed']}/{len(items)} "
+                        f"({(summary['skipped'] + summary['processed']) / len(items):.1%}), "
+                        f"{rate:.2f} docs/s, ETA {eta}, errors {summary['errors']}",
+                        file=sys.stderr
+                    )
+                    next_report = now + progress_interval
+    except KeyboardInterrupt:
+        print("Interrupted; run the same command again to resume", file=sys.stderr)
+        raise
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+    summary["seconds"] = round(time.perf_counter() - start, 3)
+    print(
+        f"Processed {summary['processed']} documents in {summary['seconds']:.1f}s "
+        f"({summary['processed'] / max(summary['seconds'], 1e-9):.2f} docs/s), {summary['errors']} errors",
+        file=sys.stderr
+    )
+    return summary
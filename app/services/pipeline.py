@@ -0,0 +1,207 @@
+"""
+Stage-pipelined execution across requests
+
+With PIPELINE_ENABLED, process_image and process_image_for_fields are
+split into three stages, each with its own worker thread(s):
+    detection    -> detector preprocess and forward pass
+    postprocess  -> boxes from the detector output, reading-order layout
+    recognition  -> recognizer batches (all boxes, or field-first)
+connected by bounded queues (PIPELINE_QUEUE_SIZE). While document N is
+in recognition, document N+1 can be in detection and N+2 in
+postprocessing; a stage whose next queue is full waits, so a slow stage
+pushes back on the ones before it instead of piling up work.
+
+Every job runs its stages in a copy of the submitting request's context,
+so deadlines, timings, request ids and metrics suppression behave as in
+the sequential pipeline. Per-stage busy time and queue wait are exported
+(ocr_pipeline_*); the stage with utilization closest to 1 is the bottleneck.
+
+The two model stages each use half of the worker's thread budget so that
+running them side by side does not oversubscribe the cores.
+"""
+import contextvars
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from app.core.deadline import check_deadline
+from app.core.logger import logger
+from app.core.metrics import observe_pipeline_stage, set_pipeline_queue_depth
+
+STAGES = ("detection", "postprocess", "recognition")
+
+# Final stage per OCRService pipeline method
+RECOGNITION_METHODS = {
+    "process_image": "recognize_all",
+    "process_image_for_fields": "recognize_fields",
+}
+
+
+class PipelineJob:
+    """One document moving through the stages"""
+
+    __slots__ = ("service", "method", "image", "context", "future", "output", "results", "enqueued")
+
+    def __init__(self, service, method: str, image: np.ndarray):
+        self.service = service
+        self.method = method
+        self.image = image
+        self.context = contextvars.copy_context()
+        self.future: Future = Future()
+        self.output = None  # detector output
+        self.results = None  # OCRResults
+        self.enqueued = 0.0
+
+
+def _detection(job: PipelineJob) -> None:
+    check_deadline("detection")
+    job.output = job.service.detect(job.image)
+
+
+def _postprocess(job: PipelineJob) -> None:
+    job.results = job.service.extract_text_boxes(job.image, job.output)
+    job.output = None
+
+
+def _recognition(job: PipelineJob) -> None:
+    getattr(job.service, RECOGNITION_METHODS[job.method])(job.image, job.results)
+
+
+STAGE_FUNCS: Dict[str, Callable[[PipelineJob], None]] = {
+    "detection": _detection,
+    "postprocess": _postprocess,
+    "recognition": _recognition,
+}
+
+
+class Stage:
+    """
+    Worker thread(s) running one stage from a bounded inbox
+
+    Args:
+        name: Stage name (metrics label)
+        func: Stage function, run in the job's context
+        workers: Threads for this stage
+        queue_size: Inbox capacity
+        paddle_threads: Paddle threads of each worker (model stages), or None
+    """
+
+    def __init__(self, name: str, func: Callable[[PipelineJob], None], workers: int, queue_size: int,
+                 paddle_threads: Optional[int] = None):
+        self.name = name
+        self.func = func
+        self.inbox: "queue.Queue[PipelineJob]" = queue.Queue(maxsize=max(1, queue_size))
+        self.next: Optional["Stage"] = None
+        self.paddle_threads = paddle_threads
+        self.busy_seconds = 0.0
+        self.processed = 0
+        self._lock = threading.Lock()
+        self.threads = [
+            threading.Thread(target=self._run, name=f"pipeline-{name}-{i}", daemon=True)
+            for i in range(max(1, workers))
+        ]
+
+    def start(self) -> None:
+        for thread in self.threads:
+            thread.start()
+
+    def put(self, job: PipelineJob) -> None:
+        """Queue a job, blocking while the inbox is full"""
+        job.enqueued = time.perf_counter()
+        self.inbox.put(job)
+        set_pipeline_queue_depth(self.name, self.inbox.qsize())
+
+    def _run(self) -> None:
+        if self.paddle_threads:
+            from paddle.base import core
+            core.set_num_threads(self.paddle_threads)
+
+        while True:
+            job = self.inbox.get()
+            set_pipeline_queue_depth(self.name, self.inbox.qsize())
+            start = time.perf_counter()
+            try:
+                job.context.run(self.func, job)
+            except BaseException as e:
+                job.future.set_exception(e)
+                continue
+            finally:
+                busy = time.perf_counter() - start
+                with self._lock:
+                    self.busy_seconds += busy
+                    self.processed += 1
+                observe_pipeline_stage(self.name, start - job.enqueued, busy)
+
+            if self.next is not None:
+                self.next.put(job)
+            else:
+                job.future.set_result(job.results)
+
+
+class StagePipeline:
+    """
+    The three stages of this worker
+
+    Args:
+        queue_size: Inbox capacity of every stage
+        stage_workers: Threads per stage name (default 1)
+        threads_per_worker: Thread budget shared by the two model stages
+    """
+
+    def __init__(self, queue_size: int, stage_workers: Dict[str, int], threads_per_worker: int):
+        model_threads = max(1, threads_per_worker // 2)
+        self.stages: List[Stage] = [
+            Stage(
+                name, STAGE_FUNCS[name], stage_workers.get(name, 1), queue_size,
+                paddle_threads=model_threads if name != "postprocess" else None
+            )
+            for name in STAGES
+        ]
+        for stage, next_stage in zip(self.stages, self.stages[1:]):
+            stage.next = next_stage
+        self.started = time.perf_counter()
+        for stage in self.stages:
+            stage.start()
+        logger.info(
+            "Stage pipeline started: %s, queue size %d, %d paddle threads per model stage",
+            ", ".join(f"{s.name} x{len(s.threads)}" for s in self.stages), queue_size, model_threads
+        )
+
+    @staticmethod
+    def supports(method: str) -> bool:
+        return method in RECOGNITION_METHODS
+
+    def submit(self, service, method: str, image: np.ndarray) -> Future:
+        """
+        Start a document through the stages (blocks while the first inbox is full)
+
+        Args:
+            service: OCRService to run on
+            method: "process_image" or "process_image_for_fields"
+            image: Decoded image
+
+        Returns:
+            Future resolving to the OCRResults, or to the exception a stage raised
+        """
+        job = PipelineJob(service, method, image)
+        # Running futures cannot be cancelled, so a caller giving up never races the stage threads
+        job.future.set_running_or_notify_cancel()
+        self.stages[0].put(job)
+        return job.future
+
+    def describe(self) -> Dict:
+        """Per-stage utilization (busy time / time since start), documents and queue depth"""
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        return {
+            stage.name: {
+                "workers": len(stage.threads),
+                "utilization": round(stage.busy_seconds / (elapsed * len(stage.threads)), 4),
+                "documents": stage.processed,
+                "queued": stage.inbox.qsize(),
+            }
+            for stage in self.stages
+        }
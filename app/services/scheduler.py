@@ -0,0 +1,108 @@
+"""
+Fair inference scheduler
+
+A worker runs at most INFERENCE_CONCURRENCY documents at once. When
+slots are busy, requests wait in one FIFO queue per API client and freed
+slots go to the clients round-robin, skipping clients already at their
+own max_concurrency. A client submitting a large batch therefore only
+delays other clients by its share of the slots, instead of by its whole
+backlog.
+"""
+import asyncio
+from collections import OrderedDict, deque
+from typing import Deque, Dict
+
+from app.core.api_keys import APIClient
+from app.core.deadline import RequestDeadline
+
+# Seconds between deadline/disconnect checks while a request is queued
+QUEUE_CHECK_INTERVAL = 0.1
+
+
+class FairScheduler:
+    """
+    Round-robin slot allocation across API clients
+
+    Args:
+        capacity: Documents processed at once
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = max(1, capacity)
+        self.running = 0
+        self.active: Dict[str, int] = {}
+        # Client name -> waiting futures; order is the round-robin order
+        self.queues: "OrderedDict[str, Deque[asyncio.Future]]" = OrderedDict()
+        self.limits: Dict[str, int] = {}
+
+    def queued(self, name: str) -> int:
+        return len(self.queues.get(name, ()))
+
+    async def acquire(self, client: APIClient, deadline: RequestDeadline) -> None:
+        """
+        Wait for a slot for client, giving up on deadline or disconnect
+
+        Raises:
+            DeadlineExceeded, RequestCancelled: From deadline.check("queue")
+        """
+        deadline.check("queue")
+        future = asyncio.get_running_loop().create_future()
+        self.limits[client.name] = client.max_concurrency
+        self.queues.setdefault(client.name, deque()).append(future)
+        self._dispatch()
+
+        try:
+            while not future.done():
+                timeout = QUEUE_CHECK_INTERVAL
+                remaining = deadline.remaining()
+                if remaining is not None:
+                    timeout = max(min(timeout, remaining), 0)
+                try:
+                    await asyncio.wait_for(asyncio.shield(future), timeout)
+                except asyncio.TimeoutError:
+                    deadline.check("queue")
+        except BaseException:
+            if future.done() and not future.cancelled():
+                # Granted while giving up: pass the slot on
+                self.release(client)
+            else:
+                future.cancel()
+                self._remove(client.name, future)
+            raise
+
+    def release(self, client: APIClient) -> None:
+        """Return a slot taken by acquire"""
+        self.running -= 1
+        self.active[client.name] -= 1
+        self._dispatch()
+
+    def _remove(self, name: str, future: asyncio.Future) -> None:
+        queue = self.queues.get(name)
+        if queue is not None:
+            try:
+                queue.remove(future)
+            except ValueError:
+                pass
+            if not queue:
+                del self.queues[name]
+
+    def _dispatch(self) -> None:
+        """Hand free slots to queued clients, round-robin"""
+        while self.running < self.capacity:
+            for name in list(self.queues):
+                limit = self.limits.get(name, 0)
+                if limit <= 0 or self.active.get(name, 0) < limit:
+                    break
+            else:
+                return  # Every queued client is at its own limit
+
+            queue = self.queues.pop(name)
+            future = queue.popleft()
+            if queue:
+                # Back of the round-robin order
+                self.queues[name] = queue
+            if future.done():
+                continue
+            future.set_result(None)
+            self.running += 1
+            self.active[name] = self.active.get(name, 0) + 1
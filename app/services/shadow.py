@@ -0,0 +1,151 @@
+"""
+Shadow comparison of a candidate model set
+
+A sample of requests (sample_rate) is replayed on the candidate after the
+active model answered, on one background thread; if a replay is still
+running the sample is dropped, so the candidate never queues work. The
+client only ever gets the active model's result.
+
+Candidate latency is measured while live traffic runs on the same cores,
+so compare it with the active latency of the same requests rather than
+with an idle benchmark.
+"""
+import difflib
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Sequence
+
+from app.core.logger import logger
+from app.core.metrics import observe_shadow, suppress_metrics
+
+
+def compare_results(active, candidate, active_fields: Dict, candidate_fields: Dict) -> Dict:
+    """
+    Output differences between two OCRResults of the same image
+
+    Returns:
+        {"mismatches": [...], "text_similarity": float} where mismatches
+        lists "boxes" (box count), "fields" and "texts" when they differ
+    """
+    mismatches: List[str] = []
+    if len(active) != len(candidate):
+        mismatches.append("boxes")
+    if active_fields != candidate_fields:
+        mismatches.append("fields")
+
+    # Reading-order text of the whole document; boxes skipped by field-first mode are empty
+    active_text = " ".join(t for t in active.texts if t)
+    candidate_text = " ".join(t for t in candidate.texts if t)
+    similarity = difflib.SequenceMatcher(None, active_text, candidate_text, autojunk=False).ratio()
+    if similarity < 1.0:
+        mismatches.append("texts")
+    return {"mismatches": mismatches, "text_similarity": similarity}
+
+
+class ShadowRunner:
+    """
+    Replays sampled requests on a candidate model set
+
+    Args:
+        candidate: ModelSet under evaluation
+        sample_rate: Fraction of requests replayed (0..1)
+    """
+
+    def __init__(self, candidate, sample_rate: float):
+        self.candidate = candidate
+        self.sample_rate = min(max(sample_rate, 0.0), 1.0)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shadow")
+        self._busy = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.stats = {
+            "compared": 0, "dropped": 0, "errors": 0,
+            "active_seconds": 0.0, "candidate_seconds": 0.0, "text_similarity": 0.0,
+            "mismatches": {"boxes": 0, "fields": 0, "texts": 0},
+        }
+
+    def maybe_run(self, service, method: str, args: Sequence, active_result, active_seconds: float) -> bool:
+        """
+        Replay one request on the candidate, if sampled and the shadow thread is free
+
+        Args:
+            service: OCRService that produced active_result
+            method: OCRService method the request ran (e.g. "process_image")
+            args: Its arguments
+            active_result: OCRResults returned to the client
+            active_seconds: Time the active model took
+
+        Returns:
+            True if a replay was started
+        """
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return False
+        if not self._busy.acquire(blocking=False):
+            self._record("dropped")
+            observe_shadow("dropped")
+            return False
+        try:
+            self._executor.submit(self._run, service, method, args, active_result, active_seconds)
+        except RuntimeError:
+            # Closed by a concurrent swap
+            self._busy.release()
+            return False
+        return True
+
+    def _run(self, service, method: str, args: Sequence, active_result, active_seconds: float) -> None:
+        try:
+            with suppress_metrics():
+                start = time.perf_counter()
+                candidate_result = getattr(self.candidate.service, method)(*args)
+                candidate_seconds = time.perf_counter() - start
+                active_fields = service.field_extractor.extract(active_result)
+                candidate_fields = self.candidate.service.field_extractor.extract(candidate_result)
+            diff = compare_results(active_result, candidate_result, active_fields, candidate_fields)
+            observe_shadow("compared", active_seconds, candidate_seconds, diff["mismatches"], diff["text_similarity"])
+            with self._stats_lock:
+                self.stats["compared"] += 1
+                self.stats["active_seconds"] += active_seconds
+                self.stats["candidate_seconds"] += candidate_seconds
+                self.stats["text_similarity"] += diff["text_similarity"]
+                for kind in diff["mismatches"]:
+                    self.stats["mismatches"][kind] += 1
+            if diff["mismatches"]:
+                logger.info(
+                    "Shadow mismatch (%s): fields %s vs %s, text similarity %.3f",
+                    ", ".join(diff['mismatches']), active_fields, candidate_fields, diff['text_similarity']
+                )
+        except Exception as e:
+            logger.error("Shadow run failed: %s", e, exc_info=True)
+            self._record("errors")
+            observe_shadow("error")
+        finally:
+            self._busy.release()
+
+    def _record(self, key: str) -> None:
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def describe(self) -> Dict:
+        """Candidate versions and comparison summary so far"""
+        with self._stats_lock:
+            stats = dict(self.stats, mismatches=dict(self.stats["mismatches"]))
+        n = stats["compared"]
+        summary = {
+            "compared": n,
+            "dropped": stats["dropped"],
+            "errors": stats["errors"],
+            "mismatches": stats["mismatches"],
+        }
+        if n:
+            summary.update({
+                "mean_active_seconds": round(stats["active_seconds"] / n, 4),
+                "mean_candidate_seconds": round(stats["candidate_seconds"] / n, 4),
+                "mean_text_similarity": round(stats["text_similarity"] / n, 4),
+            })
+        return {"candidate": self.candidate.describe(), "sample_rate": self.sample_rate, "stats": summary}
+
+    def close(self) -> None:
+        """Stop accepting replays (a running one finishes in the background)"""
+        self.sample_rate = 0.0
+        self._executor.shutdown(wait=False)
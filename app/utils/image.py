@@ -1,7 +1,7 @@
 import cv2
 import numpy as np
 import paddle
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 from app.core.logger import logger
 
 
@@ -97,11 +97,11 @@ def extract_bboxes_from_output(
     if isinstance(output, (tuple, list)):
         output = output[0]
     
-    logger.info(f"Output shape: {output.shape}")
+    logger.debug("Output shape: %s", output.shape)
     
     # CASE 1: Segmentation format (DBNet / PPOCR)
     if len(output.shape) in [3, 4] and output.shape[1] <= 3:
-        logger.info("Format: Segmentation (DBNet-style)")
+        logger.debug("Format: Segmentation (DBNet-style)")
         
         heatmap = output.squeeze()  # (H, W)
         
@@ -113,7 +113,7 @@ def extract_bboxes_from_output(
         heatmap_resized = cv2.resize(heatmap, (w, h))
         
         contours, _ = cv2.findContours(binary_resized, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        logger.info(f"Found {len(contours)} contours")
+        logger.debug("Found %d contours", len(contours))
         
         for contour in contours:
             area = cv2.contourArea(contour)
@@ -147,7 +147,7 @@ def extract_bboxes_from_output(
     
     # CASE 2: YOLO-like format (nx5 or nx6)
     elif len(output.shape) == 3 and output.shape[2] >= 5:
-        logger.info("Format: YOLO-like")
+        logger.debug("Format: YOLO-like")
         
         detections = output[0]
         for det in detections:
@@ -176,17 +176,49 @@ def extract_bboxes_from_output(
             bboxes.append([x1, y1, x2, y2, conf])
     
     else:
-        logger.warning(f"Unknown output format: {output.shape}")
+        logger.warning("Unknown output format: %s", output.shape)
     
-    logger.info(f"Total BBOX before filtering: {len(bboxes)}")
+    logger.debug("Total BBOX before filtering: %d", len(bboxes))
     
     # Filter by confidence
     bboxes = [b for b in bboxes if b[4] >= conf_threshold]
-    logger.info(f"Remaining after conf filter {conf_threshold}: {len(bboxes)}")
+    logger.debug("Remaining after conf filter %s: %d", conf_threshold, len(bboxes))
     
     return bboxes
 
 
+def estimate_text_height(output, conf_threshold: float = 0.2, min_area: int = 8) -> Optional[float]:
+    """
+    Median height of text regions in a segmentation (DBNet-style) output
+    
+    Measured in detector input pixels, i.e. at the resolution the detector saw.
+    
+    Args:
+        output: Model output [1, 1, H, W]
+        conf_threshold: Probability threshold for text pixels
+        min_area: Regions smaller than this (pixels) are treated as noise
+        
+    Returns:
+        Median region height, or None if no text region was found
+    """
+    if isinstance(output, paddle.Tensor):
+        output = output.numpy()
+    if isinstance(output, (tuple, list)):
+        output = output[0]
+    if len(output.shape) not in [3, 4] or output.shape[1] > 3:
+        return None
+    
+    binary = (output.squeeze() > conf_threshold).astype(np.uint8)
+    n, _, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+    
+    # Label 0 is the background
+    stats = stats[1:]
+    heights = stats[stats[:, cv2.CC_STAT_AREA] >= min_area, cv2.CC_STAT_HEIGHT]
+    if heights.size == 0:
+        return None
+    return float(np.median(heights))
+
+
 def visualize_bboxes(image: np.ndarray, bboxes: List[List]) -> np.ndarray:
     """
     Draw bounding boxes on image
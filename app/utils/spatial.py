@@ -0,0 +1,174 @@
+import numpy as np
+from typing import List, Optional, Sequence, Union
+
+
+# Boxes as an (N, 4+) array or a sequence of [x1, y1, x2, y2, ...]
+Boxes = Union[np.ndarray, Sequence[Sequence[int]]]
+
+
+def as_box_array(bboxes: Boxes) -> np.ndarray:
+    """View boxes as an (N, 4) array of [x1, y1, x2, y2]"""
+    arr = np.asarray(bboxes)
+    if arr.size == 0:
+        return np.zeros((0, 4), dtype=np.int32)
+    return arr[:, :4]
+
+
+def calculate_y_overlap(box1: Sequence[int], box2: Sequence[int]) -> float:
+    """Calculate vertical overlap ratio between two boxes"""
+    y1_a, y2_a = box1[1], box1[3]
+    y1_b, y2_b = box2[1], box2[3]
+
+    intersect_start = max(y1_a, y1_b)
+    intersect_end = min(y2_a, y2_b)
+
+    if intersect_end <= intersect_start:
+        return 0.0
+
+    overlap_height = intersect_end - intersect_start
+    min_height = min(y2_a - y1_a, y2_b - y1_b)
+
+    if min_height == 0:
+        return 0.0
+
+    return overlap_height / min_height
+
+
+class YIntervalIndex:
+    """
+    Spatial index over the vertical intervals [y1, y2] of boxes
+
+    Boxes are sorted by their top edge. Since no box is taller than the
+    tallest one, every box whose interval intersects [top, bottom] has its
+    top edge in (top - max_height, bottom), which is a contiguous slice of
+    the sorted order found with two binary searches.
+    """
+
+    def __init__(self, bboxes: Boxes):
+        """
+        Args:
+            bboxes: Boxes as [x1, y1, x2, y2]
+        """
+        arr = as_box_array(bboxes)
+        self.order: np.ndarray = np.argsort(arr[:, 1], kind='stable')
+        self.tops: np.ndarray = arr[self.order, 1]
+        heights = arr[:, 3] - arr[:, 1]
+        self.max_height = max(int(heights.max()), 0) if len(heights) else 0
+
+    def query(self, top: int, bottom: int) -> List[int]:
+        """
+        Find boxes that may intersect the vertical band [top, bottom]
+
+        Args:
+            top: Band top edge
+            bottom: Band bottom edge
+
+        Returns:
+            Indices (into the original box list) sorted by top edge. The
+            result is a superset of intersecting boxes; callers still apply
+            their exact overlap test.
+        """
+        start = np.searchsorted(self.tops, top - self.max_height, side='right')
+        end = np.searchsorted(self.tops, bottom, side='left')
+        return self.order[start:end].tolist()
+
+
+class ReadingLayout:
+    """
+    Line-grouped reading order of a document
+
+    Attributes:
+        rows: Box indices per text line, lines top to bottom, boxes left to right
+        row_of: Line number of each box
+        col_of: Position of each box within its line
+        order: All box indices in reading order
+        max_x: Right-most box edge
+        max_y: Bottom-most box edge
+    """
+
+    def __init__(self, bboxes: Boxes, rows: List[List[int]]):
+        self.boxes = as_box_array(bboxes)
+        self.rows = rows
+        self.row_of: List[int] = [0] * len(self.boxes)
+        self.col_of: List[int] = [0] * len(self.boxes)
+        self.order: List[int] = []
+
+        for r, row in enumerate(rows):
+            for c, i in enumerate(row):
+                self.row_of[i] = r
+                self.col_of[i] = c
+            self.order.extend(row)
+
+        self.max_x = int(self.boxes[:, 2].max()) if len(self.boxes) else 0
+        self.max_y = int(self.boxes[:, 3].max()) if len(self.boxes) else 0
+        self._y_index: Optional[YIntervalIndex] = None
+
+    def __len__(self) -> int:
+        return len(self.boxes)
+
+    @property
+    def y_index(self) -> YIntervalIndex:
+        """Vertical interval index over the same boxes, built on first use"""
+        if self._y_index is None:
+            self._y_index = YIntervalIndex(self.boxes)
+        return self._y_index
+
+    def next_in_row(self, i: int) -> Optional[int]:
+        """Box immediately right of box i on the same line, if any"""
+        row = self.rows[self.row_of[i]]
+        c = self.col_of[i] + 1
+        return row[c] if c < len(row) else None
+
+    def reordered(self) -> "ReadingLayout":
+        """Same layout re-indexed for boxes stored in reading order"""
+        position = {i: k for k, i in enumerate(self.order)}
+        rows = [[position[i] for i in row] for row in self.rows]
+        return ReadingLayout(self.boxes[self.order], rows)
+
+
+def build_reading_layout(bboxes: Boxes, min_overlap: float = 0.5) -> ReadingLayout:
+    """
+    Group boxes into text lines with a sweep over their y-intervals
+
+    Boxes are visited by top edge. Lines whose bottom edge is above the
+    current box can no longer grow and leave the active set; the box joins
+    the active line it overlaps most vertically (relative to the shorter of
+    the two), or starts a new line.
+
+    Args:
+        bboxes: Boxes as [x1, y1, x2, y2]
+        min_overlap: Minimum vertical overlap ratio to join a line
+
+    Returns:
+        ReadingLayout over the given boxes
+    """
+    boxes = as_box_array(bboxes).tolist()
+    events = sorted(range(len(boxes)), key=lambda i: (boxes[i][1], boxes[i][0]))
+
+    rows: List[List[int]] = []
+    # Active lines as [top, bottom, row number]
+    active: List[List[int]] = []
+
+    for i in events:
+        _, top, _, bottom = boxes[i]
+        active = [line for line in active if line[1] > top]
+
+        best = None
+        best_overlap = 0.0
+        for line in active:
+            overlap = calculate_y_overlap((0, line[0], 0, line[1]), (0, top, 0, bottom))
+            if overlap >= min_overlap and overlap > best_overlap:
+                best, best_overlap = line, overlap
+
+        if best is None:
+            active.append([top, bottom, len(rows)])
+            rows.append([i])
+        else:
+            best[0] = min(best[0], top)
+            best[1] = max(best[1], bottom)
+            rows[best[2]].append(i)
+
+    for row in rows:
+        row.sort(key=lambda i: boxes[i][0])
+
+    return ReadingLayout(bboxes, rows)
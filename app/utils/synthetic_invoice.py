@@ -0,0 +1,112 @@
+"""Synthetic invoice images with known ground truth (calibration and benchmarks)"""
+import random
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import cv2
+import numpy as np
+
+
+SUPPLIERS = ["ACME TRADING CO", "SAO MAI FOOD JSC", "BLUE RIVER SUPPLY", "GREEN LEAF CAFE", "HOANG LONG LTD"]
+ITEMS = ["Coffee beans", "Green tea", "Paper cups", "Delivery fee", "Milk 1L", "Sugar", "Service charge",
+         "Printer ink", "Water 500ml", "Cleaning kit", "Rice 5kg", "Notebook"]
+CURRENCIES = ["VND", "USD", "EUR"]
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+
+
+@dataclass
+class SyntheticInvoice:
+    """Rendered invoice and what an ideal OCR would return for it"""
+    image: np.ndarray
+    words: List[Dict] = field(default_factory=list)  # [{'bbox': [x1, y1, x2, y2], 'text': str}]
+    fields: Dict[str, Optional[str]] = field(default_factory=dict)  # supplier_name, total, currency
+
+
+def _money(value: int, currency: str) -> str:
+    if currency == "VND":
+        return f"{value:,}"
+    return f"{value / 100:,.2f}"
+
+
+def generate_invoice(
+    n_items: int = 20,
+    density: float = 1.0,
+    seed: int = 0,
+    width: int = 1240
+) -> SyntheticInvoice:
+    """
+    Render an invoice-like document
+
+    Args:
+        n_items: Number of line items (controls document size)
+        density: Text density; scales font size down and columns per line up
+        seed: Random seed (same arguments -> same image)
+        width: Page width in pixels
+
+    Returns:
+        SyntheticInvoice with the image, every rendered word box and the
+        expected invoice fields
+    """
+    rng = random.Random(seed)
+    scale = 0.9 / max(density, 0.1)
+    thickness = 2 if scale >= 0.6 else 1
+    (_, char_h), baseline = cv2.getTextSize("Ag", FONT, scale, thickness)
+    line_h = int((char_h + baseline) * 1.9)
+    margin = int(40 * scale) + 20
+    columns = max(2, min(6, int(round(3 * density))))
+
+    supplier = rng.choice(SUPPLIERS)
+    currency = rng.choice(CURRENCIES)
+
+    # Lines of (x fraction, text) cells
+    lines = [
+        [(0.0, supplier)],
+        [(0.0, f"Invoice No: {rng.randint(1000, 99999)}"), (0.6, f"Date: {rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/2026")],
+        [(0.0, f"Address: {rng.randint(1, 300)} Le Loi street")],
+        [],
+    ]
+    header = ["Description", "Qty", "Price", "Amount", "Tax", "Note"][:columns]
+    lines.append([(i / columns, h) for i, h in enumerate(header)])
+
+    subtotal = 0
+    for _ in range(n_items):
+        qty = rng.randint(1, 9)
+        price = rng.randint(5, 500) * (1000 if currency == "VND" else 100)
+        amount = qty * price
+        subtotal += amount
+        cells = [rng.choice(ITEMS), str(qty), _money(price, currency), _money(amount, currency)]
+        cells += [f"{rng.randint(0, 10)}%", "ok"][: max(columns - 4, 0)]
+        lines.append([(i / columns, c) for i, c in enumerate(cells[:columns])])
+
+    total = subtotal + subtotal // 10
+    lines += [
+        [],
+        [(0.5, "Subtotal"), (0.75, _money(subtotal, currency))],
+        [(0.5, "VAT 10%"), (0.75, _money(subtotal // 10, currency))],
+        [(0.5, "Grand Total"), (0.75, _money(total, currency)), (0.92, currency)],
+    ]
+
+    height = margin * 2 + line_h * len(lines)
+    image = np.full((height, width, 3), 255, dtype=np.uint8)
+    usable = width - 2 * margin
+    words = []
+
+    for row, cells in enumerate(lines):
+        baseline_y = margin + row * line_h + char_h
+        for frac, text in cells:
+            x = margin + int(frac * usable)
+            (text_w, text_h), text_base = cv2.getTextSize(text, FONT, scale, thickness)
+            if x + text_w > width - 4:
+                continue
+            cv2.putText(image, text, (x, baseline_y), FONT, scale, (20, 20, 20), thickness, cv2.LINE_AA)
+            words.append({
+                'bbox': [x, baseline_y - text_h, x + text_w, baseline_y + text_base],
+                'text': text,
+            })
+
+    expected_total = _money(total, currency)
+    return SyntheticInvoice(
+        image=image,
+        words=words,
+        fields={'supplier_name': supplier, 'total': expected_total, 'currency': currency},
+    )
@@ -0,0 +1,68 @@
+import re
+from typing import Dict, Iterable, List, Tuple
+
+
+class KeywordMatcher:
+    """
+    Multi-pattern keyword matcher
+
+    All keywords of all groups are compiled into a single regex automaton,
+    so one left-to-right scan of a text reports every group that has at
+    least one keyword occurring as a substring (same result as running
+    `any(kw in text for kw in group)` for each group).
+    """
+
+    def __init__(self, groups: Dict[str, Iterable[str]]):
+        """
+        Args:
+            groups: Mapping of group name -> keywords of that group
+        """
+        self.group_names: List[str] = list(groups)
+        self.group_bits: Dict[str, int] = {
+            name: 1 << i for i, name in enumerate(self.group_names)
+        }
+
+        masks: Dict[str, int] = {}
+        for name, keywords in groups.items():
+            for kw in keywords:
+                if kw:
+                    masks[kw] = masks.get(kw, 0) | self.group_bits[name]
+
+        # At a given start position the alternation reports only the longest
+        # keyword (alternatives are tried longest first). Every other keyword
+        # starting there is a prefix of it, so fold their groups in up front.
+        self._masks: Dict[str, int] = {}
+        for kw in masks:
+            mask = 0
+            for other, other_mask in masks.items():
+                if kw.startswith(other):
+                    mask |= other_mask
+            self._masks[kw] = mask
+
+        ordered = sorted(masks, key=len, reverse=True)
+        alternation = "|".join(re.escape(kw) for kw in ordered)
+        self._pattern = re.compile(f"(?=({alternation}))") if ordered else None
+
+    def match(self, text: str) -> int:
+        """
+        Scan text once and return the bitmask of matched groups
+
+        Args:
+            text: Text to scan (already normalized, e.g. lowercased)
+
+        Returns:
+            Bitmask, test membership with `mask & matcher.group_bits[name]`
+        """
+        if self._pattern is None or not text:
+            return 0
+
+        mask = 0
+        masks = self._masks
+        for m in self._pattern.finditer(text):
+            mask |= masks[m.group(1)]
+        return mask
+
+    def match_groups(self, text: str) -> Tuple[str, ...]:
+        """Return names of matched groups, in declaration order"""
+        mask = self.match(text)
+        return tuple(name for name in self.group_names if mask & self.group_bits[name])
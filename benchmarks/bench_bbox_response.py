@@ -0,0 +1,90 @@
+"""
+Benchmark /invoice/bboxes response building and encoding
+
+Compares FastAPI's default path (one BBoxResult model per box, validation,
+jsonable_encoder, json.dumps) with the orjson path in the default,
+columnar and flat formats. Reports encode time and payload size.
+
+Usage:
+    python -m benchmarks.bench_bbox_response
+    python -m benchmarks.bench_bbox_response --boxes 100 500 2000 --json
+"""
+import argparse
+import json
+import time
+from typing import Callable, Dict
+
+import numpy as np
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import ORJSONResponse
+
+from app.schemas.ocr import BBoxListResponse, BBoxResult
+from app.services.ocr_result import OCRResults
+from benchmarks.synthetic import make_ocr_results
+
+
+def pydantic_path(results: OCRResults) -> bytes:
+    """What the endpoint used to do, including FastAPI's response encoding"""
+    bbox_results = []
+    for text, bbox in zip(results.texts, results.boxes.tolist()):
+        bbox_results.append(BBoxResult(label=text, text=text, bbox=bbox))
+    model = BBoxListResponse(results=bbox_results)
+    content = jsonable_encoder(BBoxListResponse.model_validate(model.model_dump()))
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None,
+                      separators=(",", ":")).encode("utf-8")
+
+
+def orjson_path(build: Callable[[OCRResults], Dict]) -> Callable[[OCRResults], bytes]:
+    return lambda results: ORJSONResponse(build(results)).body
+
+
+def time_encode(encode: Callable[[OCRResults], bytes], results: OCRResults, repeat: int) -> float:
+    """Best-of-N wall time in milliseconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        encode(results)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--boxes", type=int, nargs="+", default=[100, 500, 2000])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = parser.parse_args()
+
+    paths = {
+        "pydantic": pydantic_path,
+        "orjson": orjson_path(OCRResults.to_bbox_payload),
+        "columnar": orjson_path(OCRResults.to_columnar_payload),
+        "flat": orjson_path(lambda r: r.to_columnar_payload(flat=True)),
+    }
+
+    rows = []
+    for n in args.boxes:
+        results = OCRResults.from_records(make_ocr_results(n, seed=n))
+        for name, encode in paths.items():
+            rows.append({
+                "boxes": n,
+                "path": name,
+                "encode_ms": time_encode(encode, results, args.repeat),
+                "payload_bytes": len(encode(results)),
+            })
+
+    # Default format must stay byte-compatible in content with the old schema
+    sample = OCRResults.from_records(make_ocr_results(50, seed=1))
+    assert json.loads(paths["pydantic"](sample)) == json.loads(paths["orjson"](sample))
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return
+
+    print(f"{'boxes':>6} {'path':>10} {'encode ms':>10} {'payload KB':>11}")
+    for row in rows:
+        print(f"{row['boxes']:>6} {row['path']:>10} {row['encode_ms']:>10.3f} {row['payload_bytes'] / 1024:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
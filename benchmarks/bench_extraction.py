@@ -0,0 +1,109 @@
+"""
+Benchmark invoice field extraction on synthetic OCR results
+
+Compares the indexed FieldExtractor with the original list-scan logic.
+Documents are fed in reading order, as process_image returns them. Total
+and currency must match exactly; supplier_name is only reported here, since
+its rules now follow the line layout (next box on the same line, top-left
+region in reading order) instead of raw list order. tests/test_field_extraction.py
+asserts the same parity, with the expected supplier differences listed.
+
+Both implementations scale linearly with the number of boxes: the original
+rescans the boxes for each of at most three total labels, not for every
+box. The size sweep reports time per box to show it; the gain is a
+constant factor (about 2-4x) from matching every keyword list in one pass
+per box and looking values up in the y-interval index.
+
+Usage:
+    python -m benchmarks.bench_extraction
+    python -m benchmarks.bench_extraction --sizes 300 3000 --repeat 5
+"""
+import argparse
+import json
+import sys
+import time
+from typing import Callable, Dict, List, Tuple
+
+from app.core.config import settings
+from app.services.field_extractor import FieldExtractor
+from app.services.ocr_result import OCRResults
+from app.utils.spatial import build_reading_layout
+from benchmarks.reference_extraction import ReferenceExtractor
+from benchmarks.synthetic import make_ocr_results
+
+
+def in_reading_order(results: List[Dict]) -> OCRResults:
+    """Reorder results and attach their layout, like process_image does"""
+    layout = build_reading_layout([r['bbox'] for r in results], settings.LINE_OVERLAP_THRESH)
+    return OCRResults.from_records([results[i] for i in layout.order], layout.reordered())
+
+
+def check_parity(seeds: int, sizes: List[int]) -> Tuple[int, int]:
+    """Return (documents with total/currency mismatches, documents with a different supplier)"""
+    indexed = FieldExtractor()
+    reference = ReferenceExtractor()
+    mismatches = 0
+    supplier_diffs = 0
+
+    for size in sizes:
+        for seed in range(seeds):
+            results = in_reading_order(make_ocr_results(size, seed=seed))
+            expected = reference.extract(results.to_records())
+            actual = indexed.extract(results)
+            if (expected['total'], expected['currency']) != (actual['total'], actual['currency']):
+                mismatches += 1
+                print(f"  MISMATCH size={size} seed={seed}: {expected} != {actual}")
+            elif expected['supplier_name'] != actual['supplier_name']:
+                supplier_diffs += 1
+
+    return mismatches, supplier_diffs
+
+
+def time_extract(extract: Callable[[List[Dict]], Dict], results: List[Dict], repeat: int) -> float:
+    """Best-of-N wall time in milliseconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        extract(results)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 100, 300, 1000, 3000, 10000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--parity-seeds", type=int, default=200)
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = parser.parse_args()
+
+    print(f"Checking parity on {args.parity_seeds} documents per size...")
+    mismatches, supplier_diffs = check_parity(args.parity_seeds, [5, 20, 80, 300])
+    print(f"  {mismatches} mismatches, {supplier_diffs} supplier names changed by line-layout rules")
+
+    indexed = FieldExtractor()
+    reference = ReferenceExtractor()
+    rows = []
+    for size in args.sizes:
+        results = in_reading_order(make_ocr_results(size, seed=size))
+        ref_ms = time_extract(reference.extract, results.to_records(), args.repeat)
+        idx_ms = time_extract(indexed.extract, results, args.repeat)
+        rows.append({"boxes": size, "reference_ms": ref_ms, "indexed_ms": idx_ms,
+                     "reference_us_per_box": ref_ms * 1000 / size, "indexed_us_per_box": idx_ms * 1000 / size,
+                     "speedup": ref_ms / idx_ms if idx_ms else None})
+
+    if args.json:
+        print(json.dumps({"mismatches": mismatches, "supplier_diffs": supplier_diffs, "results": rows}, indent=2))
+    else:
+        print(f"\n{'boxes':>8} {'reference ms':>14} {'indexed ms':>12} {'ref us/box':>11} {'idx us/box':>11} {'speedup':>8}")
+        for row in rows:
+            print(
+                f"{row['boxes']:>8} {row['reference_ms']:>14.2f} {row['indexed_ms']:>12.2f} "
+                f"{row['reference_us_per_box']:>11.2f} {row['indexed_us_per_box']:>11.2f} {row['speedup']:>7.1f}x"
+            )
+
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
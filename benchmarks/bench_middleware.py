@@ -0,0 +1,103 @@
+"""
+Benchmark API key middleware overhead on the /mock endpoint
+
+Drives in-process ASGI apps (no sockets) that differ only in the auth
+middleware: none, the previous BaseHTTPMiddleware implementation, and the
+current pure-ASGI APIKeyMiddleware. Reports requests per second.
+
+Usage:
+    python -m benchmarks.bench_middleware
+    python -m benchmarks.bench_middleware --requests 5000 --concurrency 32
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+from fastapi import FastAPI
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+
+from app.api.v1.endpoints import ocr
+from app.core.middleware import APIKeyMiddleware
+
+API_KEY = "bench-key"
+
+
+class LegacyAPIKeyMiddleware(BaseHTTPMiddleware):
+    """Previous BaseHTTPMiddleware-based implementation, for comparison"""
+
+    EXCLUDED_PATHS = ["/", "/health", "/docs", "/openapi.json", "/redoc"]
+
+    async def dispatch(self, request: Request, call_next):
+        if request.url.path in self.EXCLUDED_PATHS:
+            return await call_next(request)
+        api_key = request.headers.get("X-API-Key") or request.headers.get("x-api-key")
+        if not api_key or api_key != API_KEY:
+            return JSONResponse(status_code=401, content={"detail": "Unauthorized access"})
+        return await call_next(request)
+
+
+def build_app(middleware) -> FastAPI:
+    app = FastAPI()
+    if middleware is LegacyAPIKeyMiddleware:
+        app.add_middleware(LegacyAPIKeyMiddleware)
+    elif middleware is APIKeyMiddleware:
+        app.add_middleware(APIKeyMiddleware, api_keys=[API_KEY])
+    app.include_router(ocr.router, prefix="/api/v1/ocr")
+    return app
+
+
+async def run(app: FastAPI, n_requests: int, concurrency: int) -> float:
+    """Return requests per second"""
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        headers = {"X-API-Key": API_KEY}
+        queue = iter(range(n_requests))
+
+        async def worker():
+            for _ in queue:
+                response = await client.get("/api/v1/ocr/mock", headers=headers)
+                assert response.status_code == 200
+
+        # Warm up routing and middleware stack
+        await client.get("/api/v1/ocr/mock", headers=headers)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return n_requests / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = parser.parse_args()
+
+    # Keep /mock's info log out of the measurement
+    from app.core.logger import logger
+    logger.disabled = True
+
+    variants = {
+        "no_auth": None,
+        "base_http_middleware": LegacyAPIKeyMiddleware,
+        "pure_asgi": APIKeyMiddleware,
+    }
+    results = {}
+    for name, middleware in variants.items():
+        rps = asyncio.run(run(build_app(middleware), args.requests, args.concurrency))
+        results[name] = rps
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    for name, rps in results.items():
+        print(f"{name:<22} {rps:>10.0f} req/s")
+
+
+if __name__ == "__main__":
+    main()
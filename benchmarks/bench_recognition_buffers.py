@@ -0,0 +1,131 @@
+"""
+Benchmark recognizer input preparation: per-crop copies vs pooled batch buffers
+
+Compares, on the word boxes of a synthetic invoice:
+- legacy: preprocess_for_recognition + paddle.to_tensor + one forward per crop
+- pooled: recognize_boxes (resize into scratch, convert in place into a
+  size-classed batch buffer, DLPack handoff, batched forward)
+
+Temporary allocations per crop are the tracemalloc peak while preparing
+one crop; tracemalloc sees numpy buffers but not Paddle's own allocator,
+so the paddle.to_tensor copy of the legacy path is not included. What
+remains on the pooled path is numpy's fixed-size casting buffer. Uses
+the stub recognizer, so forward time is not representative of the real
+model.
+
+Usage:
+    python -m benchmarks.bench_recognition_buffers
+    python -m benchmarks.bench_recognition_buffers --items 80 --batch 32 --json
+"""
+import argparse
+import json
+import time
+import tracemalloc
+
+import paddle
+
+from app.core.logger import logger
+from app.models.recognizer.batch import get_pool, recognize_boxes, to_paddle_tensor
+from app.models.recognizer.inference import preprocess_for_recognition, run_recognition_on_bbox
+from app.utils.synthetic_invoice import generate_invoice
+from benchmarks.stub_models import StubRecognizer
+
+
+def peak_bytes_per_crop(prepare_one, boxes) -> float:
+    """Mean peak of traced memory allocated while preparing one crop"""
+    total = 0
+    tracemalloc.start()
+    for slot, bbox in enumerate(boxes):
+        base, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        prepare_one(slot, bbox)
+        _, peak = tracemalloc.get_traced_memory()
+        total += peak - base
+    tracemalloc.stop()
+    return total / len(boxes)
+
+
+def time_call(func, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=40, help="Line items in the synthetic invoice")
+    parser.add_argument("--batch", type=int, default=16, help="Largest recognizer batch")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    logger.disabled = True
+    invoice = generate_invoice(n_items=args.items, seed=0)
+    image = invoice.image
+    boxes = [word["bbox"] for word in invoice.words]
+    n = len(boxes)
+    rec_model = StubRecognizer()
+
+    pool = get_pool(args.batch)
+    batch = pool.buffers[pool.classes[-1]]
+
+    # Input preparation of one crop, up to the tensor handed to the model
+    def legacy_prepare_one(slot, bbox):
+        paddle.to_tensor(preprocess_for_recognition(image, bbox), dtype='float32')
+
+    def pooled_prepare_one(slot, bbox):
+        pool.fill(batch, slot % len(batch), image, bbox)
+
+    def legacy_prepare():
+        for slot, bbox in enumerate(boxes):
+            legacy_prepare_one(slot, bbox)
+
+    def pooled_prepare():
+        for k in range(0, n, len(batch)):
+            for slot, bbox in enumerate(boxes[k:k + len(batch)]):
+                pool.fill(batch, slot, image, bbox)
+            to_paddle_tensor(batch)
+
+    # Whole recognition step
+    def legacy_recognize():
+        return [run_recognition_on_bbox(rec_model, image, bbox) for bbox in boxes]
+
+    def pooled_recognize():
+        return recognize_boxes(rec_model, image, boxes, args.batch)
+
+    # Warm up (creates the thread's pool, probes DLPack) and check parity
+    if legacy_recognize() != pooled_recognize():
+        raise SystemExit("Pooled recognition produced different texts")
+
+    results = {
+        "crops": n,
+        "batch": args.batch,
+        "legacy_prepare": {
+            "ms": time_call(legacy_prepare, args.repeat),
+            "peak_bytes_per_crop": peak_bytes_per_crop(legacy_prepare_one, boxes),
+        },
+        "pooled_prepare": {
+            "ms": time_call(pooled_prepare, args.repeat),
+            "peak_bytes_per_crop": peak_bytes_per_crop(pooled_prepare_one, boxes),
+        },
+        "legacy_recognize": {"ms": time_call(legacy_recognize, args.repeat)},
+        "pooled_recognize": {"ms": time_call(pooled_recognize, args.repeat)},
+    }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{n} crops, max batch {args.batch}")
+    print(f"{'path':<18} {'time ms':>10} {'temp bytes/crop':>16}")
+    for name in ("legacy_prepare", "pooled_prepare", "legacy_recognize", "pooled_recognize"):
+        r = results[name]
+        peak = f"{r['peak_bytes_per_crop']:>16.0f}" if "peak_bytes_per_crop" in r else f"{'-':>16}"
+        print(f"{name:<18} {r['ms']:>10.2f} {peak}")
+
+
+if __name__ == "__main__":
+    main()
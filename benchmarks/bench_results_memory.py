@@ -0,0 +1,99 @@
+"""
+Measure memory and allocations of OCR result containers
+
+Compares the list-of-dicts results (plus the standardized copy the old
+extraction made) with the columnar OCRResults on one synthetic document.
+Text strings are created up front and shared by both, so only container
+overhead is measured.
+
+Usage:
+    python -m benchmarks.bench_results_memory
+    python -m benchmarks.bench_results_memory --boxes 2000 --json
+"""
+import argparse
+import gc
+import json
+import sys
+import tracemalloc
+from typing import Callable, Dict
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.field_extractor import FieldExtractor
+from app.services.ocr_result import OCRResults
+from app.utils.spatial import build_reading_layout
+from benchmarks.reference_extraction import ReferenceExtractor
+from benchmarks.synthetic import make_ocr_results
+
+
+def measure(build: Callable[[], object]) -> Dict[str, int]:
+    """Retained bytes, peak bytes and live allocated blocks of build()"""
+    gc.collect()
+    blocks_before = sys.getallocatedblocks()
+    tracemalloc.start()
+    obj = build()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    blocks = sys.getallocatedblocks() - blocks_before
+    del obj
+    return {"retained_bytes": retained, "peak_bytes": peak, "allocated_blocks": blocks}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--boxes", type=int, default=500)
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = parser.parse_args()
+
+    source = make_ocr_results(args.boxes, seed=args.boxes)
+    texts = [r['text'] for r in source]
+    coords = [tuple(r['bbox']) for r in source]
+    confs = [r['confidence'] for r in source]
+
+    def build_records():
+        return [
+            {'bbox': [x1, y1, x2, y2], 'text': text, 'confidence': conf}
+            for (x1, y1, x2, y2), text, conf in zip(coords, texts, confs)
+        ]
+
+    def build_columnar():
+        return OCRResults(
+            np.array(coords, dtype=np.int32),
+            np.array(confs, dtype=np.float32),
+            list(texts)
+        )
+
+    records = build_records()
+    columnar = build_columnar()
+    # process_image hands the extractor a layout computed during the pipeline
+    columnar.layout = build_reading_layout(columnar.boxes, settings.LINE_OVERLAP_THRESH)
+    reference = ReferenceExtractor()
+    indexed = FieldExtractor()
+
+    report = {
+        "boxes": args.boxes,
+        "container": {
+            "records": measure(build_records),
+            "columnar": measure(build_columnar),
+        },
+        "extraction": {
+            "records": measure(lambda: reference.extract(records)),
+            "columnar": measure(lambda: indexed.extract(columnar)),
+        },
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"Document with {args.boxes} boxes\n")
+    print(f"{'':<24} {'retained KB':>12} {'peak KB':>10} {'blocks':>8}")
+    for section in ("container", "extraction"):
+        for kind, m in report[section].items():
+            print(f"{section + ' / ' + kind:<24} {m['retained_bytes'] / 1024:>12.1f} "
+                  f"{m['peak_bytes'] / 1024:>10.1f} {m['allocated_blocks']:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Field-first recognition against full recognition
+
+process_image_for_fields recognizes boxes in FieldScan order and stops
+once the fields are settled within the supplier band and the bottom-right
+total region. This replays the scan with the ground-truth text standing
+in for the recognizer and reports, per kind of document, how often each
+field agrees with the rules on the fully recognized document and the
+share of boxes recognized (the saving), on:
+- rendered invoice templates (app.utils.synthetic_invoice) and variants
+  of them: currency only in a table header, no grand total label, total
+  label without an amount, supplier keyword with the name on its own line
+- random layouts (benchmarks.synthetic): keywords, amounts and currency
+  marks anywhere on the page, a stress case for the bounded search
+
+Mismatches are expected where a field's only evidence lies outside the
+searched regions (e.g. currency_in_header, keywords scattered over random
+layouts); --verbose prints them. A mismatch on the unmodified templates
+makes the exit status 1.
+
+Usage:
+    python -m benchmarks.field_parity
+    python -m benchmarks.field_parity --seeds 500 --batch 4 --verbose
+"""
+import argparse
+import random
+import statistics
+import sys
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+from app.core.config import settings
+from app.services.field_extractor import FieldExtractor
+from app.services.ocr_result import OCRResults
+from app.utils.synthetic_invoice import generate_invoice
+from benchmarks.bench_extraction import in_reading_order
+from benchmarks.synthetic import make_ocr_results
+
+VARIANTS = ("template", "currency_in_header", "no_grand_total", "label_without_amount", "supplier_keyword")
+
+
+def vary_invoice(words: List[Dict], variant: str, rng: random.Random) -> List[Dict]:
+    """Edit the words of a rendered invoice into one of VARIANTS"""
+    words = [dict(w, confidence=1.0) for w in words]
+    currency = next((w['text'] for w in reversed(words) if w['text'] in ("VND", "USD", "EUR")), "USD")
+
+    if variant == "currency_in_header":
+        words = [w for w in words if w['text'] != currency]
+        for w in words:
+            if w['text'] == "Amount":
+                w['text'] = f"Amount ({currency})"
+    elif variant == "no_grand_total":
+        words = [w for w in words if w['text'] != "Grand Total"]
+    elif variant == "label_without_amount":
+        label = next(w for w in words if w['text'] == "Grand Total")
+        words = [w for w in words if w is label or not (
+            w['bbox'][1] == label['bbox'][1] and w['bbox'][0] > label['bbox'][0] and w['text'] != currency
+        )]
+    elif variant == "supplier_keyword":
+        x1, y1, x2, y2 = words[0]['bbox']
+        words.insert(0, {'bbox': [x1, max(y1 - 2 * (y2 - y1), 0), x1 + 120, y1 - (y2 - y1)],
+                         'text': rng.choice(["Supplier", "Vendor", "Seller"]), 'confidence': 1.0})
+    return words
+
+
+def documents(seeds: int) -> List[Tuple[str, str, List[Dict]]]:
+    """(kind, seed, ground-truth results) of every test document"""
+    docs = []
+    for size in (5, 20, 80, 300):
+        for seed in range(seeds):
+            docs.append((f"random size={size}", f"seed={seed}", make_ocr_results(size, seed=seed)))
+    for seed in range(max(1, seeds // 5)):
+        rng = random.Random(seed)
+        invoice = generate_invoice(n_items=rng.choice([3, 10, 25]), density=rng.choice([0.8, 1.0, 1.5]), seed=seed)
+        for variant in VARIANTS:
+            docs.append((f"invoice {variant}", f"seed={seed}", vary_invoice(invoice.words, variant, rng)))
+    return docs
+
+
+def field_first(extractor: FieldExtractor, truth: OCRResults, batch_size: int) -> Tuple[Dict, int]:
+    """Fields after a FieldScan replay, and the number of boxes it recognized"""
+    partial = OCRResults(truth.boxes, truth.confidences, [""] * len(truth), truth.layout)
+    scan = extractor.scan(partial)
+    while not scan.settled():
+        batch = scan.next_batch(batch_size)
+        if not batch:
+            break
+        for i in batch:
+            scan.add_text(i, truth.texts[i])
+    return extractor.extract(partial), scan.recognized_count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seeds", type=int, default=300, help="Random layouts per size (invoices: seeds / 5)")
+    parser.add_argument("--batch", type=int, default=settings.FIELD_SCAN_BATCH, help="Boxes per recognition batch")
+    parser.add_argument("--verbose", action="store_true", help="Print every mismatch")
+    args = parser.parse_args()
+
+    extractor = FieldExtractor()
+    # kind -> per-document (agreeing fields, recognized share)
+    stats: Dict[str, List[Tuple[Dict[str, bool], float]]] = defaultdict(list)
+    for kind, seed, records in documents(args.seeds):
+        truth = in_reading_order(records)
+        expected = extractor.extract(truth)
+        actual, recognized = field_first(extractor, truth, args.batch)
+        agree = {field: actual[field] == value for field, value in expected.items()}
+        if args.verbose and not all(agree.values()):
+            print(f"  MISMATCH {kind} {seed}: full {expected} != field-first {actual}")
+        stats[kind].append((agree, recognized / max(len(truth), 1)))
+
+    print(f"{'documents':<32} {'n':>5} {'supplier':>9} {'total':>7} {'currency':>9} {'recognized':>11}")
+    for kind, rows in stats.items():
+        rate = {field: sum(agree[field] for agree, _ in rows) / len(rows) for field in rows[0][0]}
+        print(
+            f"{kind:<32} {len(rows):>5} {rate['supplier_name']:>9.1%} {rate['total']:>7.1%} "
+            f"{rate['currency']:>9.1%} {statistics.mean(share for _, share in rows):>11.1%}"
+        )
+    template_mismatches = sum(not all(agree.values()) for agree, _ in stats["invoice template"])
+    sys.exit(1 if template_mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""
+Concurrent load test against a running OCR server
+
+Replays a folder of images (or synthetic invoices when no folder is given)
+against one endpoint at several concurrency levels, using one pooled
+keep-alive httpx client per level. Reports throughput and p50/p95/p99
+latency per level, plus the mean Server-Timing breakdown sent back by the
+server.
+
+Usage:
+    uvicorn app.main:app --port 8000 &
+    python -m benchmarks.load_test --endpoint /api/v1/ocr/mock
+    python -m benchmarks.load_test --endpoint /api/v1/ocr/invoice --images ./samples \\
+        --concurrency 1 4 16 --requests 200 --output load.json
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import sys
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import httpx
+import numpy as np
+
+from app.core.config import settings
+
+IMAGE_SUFFIXES = {".png": "image/png", ".jpg": "image/jpeg", ".jpeg": "image/jpeg", ".bmp": "image/bmp"}
+
+# Upload = (filename, bytes, content type)
+Upload = Tuple[str, bytes, str]
+
+
+@dataclass
+class LevelResult:
+    """Raw samples collected at one concurrency level"""
+    concurrency: int
+    latencies: List[float] = field(default_factory=list)
+    statuses: Counter = field(default_factory=Counter)
+    stages: Dict[str, List[float]] = field(default_factory=lambda: defaultdict(list))
+    errors: Counter = field(default_factory=Counter)
+    wall_time: float = 0.0
+
+    def summary(self) -> Dict:
+        lat = np.array(self.latencies) * 1000 if self.latencies else np.zeros(1)
+        completed = len(self.latencies)
+        ok = sum(n for status, n in self.statuses.items() if 200 <= status < 300)
+        return {
+            "concurrency": self.concurrency,
+            "requests": completed,
+            "ok": ok,
+            "statuses": {str(k): v for k, v in sorted(self.statuses.items())},
+            "errors": dict(self.errors),
+            "throughput_rps": completed / self.wall_time if self.wall_time else 0.0,
+            "latency_ms": {
+                "mean": float(lat.mean()),
+                "p50": float(np.percentile(lat, 50)),
+                "p95": float(np.percentile(lat, 95)),
+                "p99": float(np.percentile(lat, 99)),
+                "max": float(lat.max()),
+            },
+            "server_timing_ms": {stage: float(np.mean(v)) for stage, v in self.stages.items()},
+        }
+
+
+def load_uploads(folder: Optional[Path], synthetic: int) -> List[Upload]:
+    """Read every image in folder into memory, or render synthetic invoices"""
+    if folder is not None:
+        uploads = [
+            (path.name, path.read_bytes(), IMAGE_SUFFIXES[path.suffix.lower()])
+            for path in sorted(folder.iterdir())
+            if path.suffix.lower() in IMAGE_SUFFIXES
+        ]
+        if not uploads:
+            raise SystemExit(f"No images found in {folder}")
+        return uploads
+
+    from app.utils.synthetic_invoice import generate_invoice
+    uploads = []
+    for seed in range(synthetic):
+        invoice = generate_invoice(n_items=10 + 15 * seed, seed=seed)
+        ok, buf = cv2.imencode(".png", invoice.image)
+        uploads.append((f"synthetic_{seed}.png", buf.tobytes(), "image/png"))
+    return uploads
+
+
+def parse_server_timing(header: str) -> Dict[str, float]:
+    """Stage durations (ms) from a Server-Timing header; counters are skipped"""
+    stages = {}
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        if params.startswith("dur="):
+            stages[name] = float(params[4:])
+    return stages
+
+
+async def run_level(
+    base_url: str,
+    endpoint: str,
+    uploads: List[Upload],
+    concurrency: int,
+    n_requests: int,
+    warmup: int,
+    headers: Dict[str, str],
+    timeout: float
+) -> LevelResult:
+    """Send n_requests with `concurrency` requests in flight at all times"""
+    result = LevelResult(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    # Uploads are cycled so every worker sees a mix of documents
+    upload_cycle = itertools.cycle(uploads)
+    counter = itertools.count()
+
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, limits=limits, timeout=timeout) as client:
+        async def send(record: bool):
+            start = time.perf_counter()
+            try:
+                if uploads:
+                    response = await client.post(endpoint, files={"file": next(upload_cycle)})
+                else:
+                    response = await client.get(endpoint)
+                await response.aread()
+            except httpx.HTTPError as e:
+                if record:
+                    result.errors[type(e).__name__] += 1
+                return
+            if not record:
+                return
+            result.latencies.append(time.perf_counter() - start)
+            result.statuses[response.status_code] += 1
+            timing = response.headers.get("server-timing")
+            if timing:
+                for stage, ms in parse_server_timing(timing).items():
+                    result.stages[stage].append(ms)
+
+        async def worker(total: int, record: bool):
+            while next(counter) < total:
+                await send(record)
+
+        # Warm up connections and server caches, not recorded
+        if warmup:
+            await asyncio.gather(*(worker(warmup, False) for _ in range(concurrency)))
+            counter = itertools.count()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(n_requests, True) for _ in range(concurrency)))
+        result.wall_time = time.perf_counter() - start
+
+    return result
+
+
+def print_summary(summaries: List[Dict]) -> None:
+    print(f"{'conc':>5} {'reqs':>6} {'ok':>6} {'rps':>8} {'mean':>9} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}")
+    for s in summaries:
+        lat = s["latency_ms"]
+        print(
+            f"{s['concurrency']:>5} {s['requests']:>6} {s['ok']:>6} {s['throughput_rps']:>8.1f} "
+            f"{lat['mean']:>9.1f} {lat['p50']:>9.1f} {lat['p95']:>9.1f} {lat['p99']:>9.1f} {lat['max']:>9.1f}"
+        )
+    for s in summaries:
+        if s["errors"] or set(s["statuses"]) - {"200"}:
+            print(f"  concurrency {s['concurrency']}: statuses {s['statuses']} errors {s['errors']}")
+    last = summaries[-1]["server_timing_ms"] if summaries else {}
+    if last:
+        print("\nServer-Timing (mean ms, highest concurrency):")
+        for stage, ms in last.items():
+            print(f"  {stage:<22} {ms:>9.2f}")
+
+
+async def main_async(args) -> List[Dict]:
+    needs_file = not args.endpoint.rstrip("/").endswith("/mock")
+    uploads = load_uploads(args.images, args.synthetic) if needs_file else []
+    headers = {"X-API-Key": args.api_key} if args.api_key else {}
+
+    summaries = []
+    for concurrency in args.concurrency:
+        result = await run_level(
+            args.url, args.endpoint, uploads, concurrency,
+            args.requests, args.warmup, headers, args.timeout
+        )
+        summaries.append(result.summary())
+    return summaries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000", help="Server base URL")
+    parser.add_argument("--endpoint", default="/api/v1/ocr/invoice")
+    parser.add_argument("--images", type=Path, help="Folder of images to replay (default: synthetic invoices)")
+    parser.add_argument("--synthetic", type=int, default=4, help="Synthetic invoices to render without --images")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--requests", type=int, default=100, help="Requests per concurrency level")
+    parser.add_argument("--warmup", type=int, default=5, help="Unrecorded requests before each level")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--api-key", default=settings.API_KEY)
+    parser.add_argument("--output", type=Path, help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    summaries = asyncio.run(main_async(args))
+    print_summary(summaries)
+
+    if args.output:
+        report = {
+            "meta": {
+                "timestamp": datetime.utcnow().isoformat(),
+                "url": args.url,
+                "endpoint": args.endpoint,
+                "images": str(args.images) if args.images else f"synthetic x{args.synthetic}",
+            },
+            "levels": summaries,
+        }
+        args.output.write_text(json.dumps(report, indent=2))
+        print(f"\nReport written to {args.output}")
+
+    return 0 if all(s["ok"] == s["requests"] for s in summaries) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
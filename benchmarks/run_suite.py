@@ -0,0 +1,208 @@
+"""
+Offline OCR pipeline benchmark suite
+
+Renders synthetic invoices of configurable size and text density and
+times each pipeline stage in isolation, plus the whole process_image and
+field extraction, against the real models or the deterministic stubs in
+benchmarks/stub_models.py. Results are written as JSON so runs on
+different commits can be compared.
+
+Usage:
+    python -m benchmarks.run_suite                              # stub models
+    python -m benchmarks.run_suite --models real                # weights from settings
+    python -m benchmarks.run_suite --items 10 50 --density 1 2 --output bench.json
+    python -m benchmarks.run_suite --compare bench_main.json    # show change vs a previous run
+"""
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+import paddle
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.models.detector.inference import preprocess_for_detection, run_detector
+from app.models.recognizer.inference import (
+    preprocess_for_recognition, create_character_dict, ctc_decode
+)
+from app.services.ocr_result import OCRResults
+from app.services.ocr_service import OCRService
+from app.utils.image import extract_bboxes_from_output
+from app.utils.synthetic_invoice import generate_invoice
+from benchmarks.stub_models import StubDetector, StubRecognizer
+
+
+def load_models(kind: str) -> Tuple[object, object]:
+    """Return (detector, recognizer) for 'stub' or 'real'"""
+    if kind == "stub":
+        return StubDetector(), StubRecognizer()
+
+    from app.models.detector import DetectionModel
+    from app.models.recognizer import RecognitionModel
+    det_model = DetectionModel(str(settings.DETECTOR_MODEL_PATH)).load_detection_model()
+    rec_model = RecognitionModel(str(settings.RECOGNIZER_MODEL_PATH)).load_recognition_model()
+    return det_model, rec_model
+
+
+def time_call(func: Callable[[], object], repeat: int) -> Dict[str, float]:
+    """Run func repeat times; return median/min/max wall time in ms"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {
+        "median_ms": statistics.median(samples),
+        "min_ms": min(samples),
+        "max_ms": max(samples),
+    }
+
+
+def bench_document(det_model, rec_model, n_items: int, density: float, seed: int, repeat: int) -> Dict:
+    """Benchmark every stage on one synthetic invoice"""
+    invoice = generate_invoice(n_items=n_items, density=density, seed=seed)
+    image = invoice.image
+    service = OCRService(det_model, rec_model)
+    char_dict = create_character_dict()
+
+    det_input = preprocess_for_detection(image, resize_long=settings.DETECTION_RESIZE_LONG)
+    det_output = run_detector(det_model, det_input)
+    bboxes = extract_bboxes_from_output(
+        det_output, image,
+        conf_threshold=settings.CONF_THRESH,
+        expand_ratio_w=settings.EXPAND_RATIO_W,
+        expand_ratio_h=settings.EXPAND_RATIO_H,
+        min_pad_h=settings.MIN_PAD_H,
+        max_pad_h=settings.MAX_PAD_H
+    )
+    crops = [c for c in (preprocess_for_recognition(image, b) for b in bboxes) if c is not None]
+
+    def recognize_all():
+        outputs = []
+        with paddle.no_grad():
+            for crop in crops:
+                outputs.append(rec_model(paddle.to_tensor(crop, dtype='float32')))
+        return outputs
+
+    rec_outputs = recognize_all()
+    ground_truth = OCRResults.from_records(invoice.words)
+
+    stages = {
+        "detection_preprocess": lambda: preprocess_for_detection(image, resize_long=settings.DETECTION_RESIZE_LONG),
+        "detection_forward": lambda: run_detector(det_model, det_input),
+        "postprocess": lambda: extract_bboxes_from_output(
+            det_output, image,
+            conf_threshold=settings.CONF_THRESH,
+            expand_ratio_w=settings.EXPAND_RATIO_W,
+            expand_ratio_h=settings.EXPAND_RATIO_H,
+            min_pad_h=settings.MIN_PAD_H,
+            max_pad_h=settings.MAX_PAD_H
+        ),
+        "crop_prep": lambda: [preprocess_for_recognition(image, b) for b in bboxes],
+        "recognition_forward": recognize_all,
+        "ctc_decode": lambda: [ctc_decode(out, char_dict) for out in rec_outputs],
+        "field_extraction": lambda: service.extract_invoice_fields(ground_truth),
+        "process_image": lambda: service.process_image(image),
+        "process_image_for_fields": lambda: service.process_image_for_fields(image),
+    }
+
+    return {
+        "items": n_items,
+        "density": density,
+        "seed": seed,
+        "image_shape": list(image.shape[:2]),
+        "words": len(invoice.words),
+        "boxes": len(bboxes),
+        "fields_match": service.extract_invoice_fields(ground_truth) == invoice.fields,
+        "stages": {name: time_call(func, repeat) for name, func in stages.items()},
+    }
+
+
+def run_metadata(models: str) -> Dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=Path(__file__).resolve().parent
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": datetime.utcnow().isoformat(),
+        "models": models,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "paddle": paddle.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+    }
+
+
+def compare(current: Dict, previous: Dict) -> List[str]:
+    """Per-stage median change between two result files (matched by items/density/seed)"""
+    def key(doc):
+        return (doc["items"], doc["density"], doc["seed"])
+
+    previous_docs = {key(doc): doc for doc in previous["documents"]}
+    lines = [f"Compared with {previous['meta'].get('commit')} ({previous['meta'].get('models')} models)"]
+    for doc in current["documents"]:
+        old = previous_docs.get(key(doc))
+        if old is None:
+            continue
+        lines.append(f"\nitems={doc['items']} density={doc['density']} seed={doc['seed']}")
+        for stage, stats in doc["stages"].items():
+            old_stats = old["stages"].get(stage)
+            if not old_stats:
+                continue
+            change = (stats["median_ms"] - old_stats["median_ms"]) / old_stats["median_ms"] * 100
+            lines.append(f"  {stage:<22} {old_stats['median_ms']:>10.2f} -> {stats['median_ms']:>10.2f} ms ({change:+.1f}%)")
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--models", choices=["stub", "real"], default="stub")
+    parser.add_argument("--items", type=int, nargs="+", default=[10, 40, 120], help="Line items per invoice")
+    parser.add_argument("--density", type=float, nargs="+", default=[1.0, 2.0], help="Text density factors")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", type=Path, help="Write JSON results to this file")
+    parser.add_argument("--compare", type=Path, help="Previous JSON results to compare against")
+    args = parser.parse_args()
+
+    # Pipeline info logs would dominate the output and the timings
+    logger.disabled = True
+
+    det_model, rec_model = load_models(args.models)
+    report = {"meta": run_metadata(args.models), "documents": []}
+
+    print(f"{'items':>6} {'density':>8} {'boxes':>6}  " + "  ".join(f"{s[:12]:>12}" for s in (
+        "det_prep", "det_fwd", "postproc", "crop_prep", "rec_fwd", "ctc", "fields", "process", "fields_only")))
+    for n_items in args.items:
+        for density in args.density:
+            doc = bench_document(det_model, rec_model, n_items, density, args.seed, args.repeat)
+            report["documents"].append(doc)
+            medians = [stats["median_ms"] for stats in doc["stages"].values()]
+            print(f"{n_items:>6} {density:>8.1f} {doc['boxes']:>6}  " + "  ".join(f"{m:>12.2f}" for m in medians))
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+        print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        previous = json.loads(args.compare.read_text())
+        print("\n" + "\n".join(compare(report, previous)))
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
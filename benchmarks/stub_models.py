@@ -0,0 +1,67 @@
+"""
+Deterministic NumPy stand-ins for the Paddle detector and recognizer
+
+They accept the same inputs and return outputs of the same shape and type
+as the real models, so every pipeline stage around them (preprocessing,
+box extraction, cropping, CTC decoding, field extraction) runs for real
+without model weights. Outputs depend only on the input pixels.
+"""
+import cv2
+import numpy as np
+import paddle
+
+from app.models.recognizer.inference import create_character_dict
+
+
+class StubDetector:
+    """
+    DBNet-shaped detector: returns a [N, 1, H, W] text probability map
+
+    Text probability is the local density of dark ink, smeared horizontally
+    so characters of one word merge into one region.
+    """
+
+    # Normalized value of the black border preprocess_for_detection pads with
+    PAD_VALUE = float(np.mean(-np.array([0.485, 0.456, 0.406]) / np.array([0.229, 0.224, 0.225])))
+
+    def __init__(self, kernel_w: int = 9, kernel_h: int = 3):
+        self.kernel = np.ones((kernel_h, kernel_w), dtype=np.uint8)
+
+    def __call__(self, img_tensor: paddle.Tensor) -> paddle.Tensor:
+        batch = img_tensor.numpy()
+        maps = np.empty((batch.shape[0], 1, batch.shape[2], batch.shape[3]), dtype=np.float32)
+        for i, chw in enumerate(batch):
+            # Normalized input: ink is far below the per-channel mean; padding is not ink
+            gray = chw.mean(axis=0)
+            ink = ((gray < -0.5) & ~np.isclose(gray, self.PAD_VALUE, atol=1e-3)).astype(np.uint8)
+            ink = cv2.dilate(ink, self.kernel)
+            maps[i, 0] = cv2.blur(ink.astype(np.float32), (3, 3))
+        return paddle.to_tensor(maps)
+
+
+class StubRecognizer:
+    """
+    CTC-shaped recognizer: returns [N, T, C] logits
+
+    Each time step looks at one vertical slice of the crop and picks a
+    character from the slice's ink profile; blank slices emit CTC blank.
+    """
+
+    def __init__(self, time_steps: int = 40):
+        self.time_steps = time_steps
+        self.num_classes = len(create_character_dict())
+
+    def __call__(self, img_tensor: paddle.Tensor) -> paddle.Tensor:
+        batch = img_tensor.numpy()
+        n, _, _, w = batch.shape
+        step = max(w // self.time_steps, 1)
+
+        # Ink per column (inputs are RGB in [0, 1], text is dark)
+        ink = 1.0 - batch.mean(axis=1)  # [N, H, W]
+        columns = ink[:, :, : step * self.time_steps].reshape(n, ink.shape[1], self.time_steps, step)
+        profile = columns.sum(axis=(1, 3))  # [N, T]
+
+        classes = np.where(profile > 1.0, (profile * 7).astype(np.int64) % (self.num_classes - 1) + 1, 0)
+        logits = np.zeros((n, self.time_steps, self.num_classes), dtype=np.float32)
+        np.put_along_axis(logits, classes[:, :, None], 1.0, axis=2)
+        return paddle.to_tensor(logits)
@@ -0,0 +1,278 @@
+"""
+Accuracy vs latency sweep of the pipeline settings
+
+Runs a labeled dataset through OCRService for every combination of a grid
+of settings (DETECTION_RESIZE_LONG, CONF_THRESH, EXPAND_RATIO_W/H,
+MIN/MAX_PAD_H, ...) and reports, per configuration, the character error
+rate of the document text, the invoice field accuracy and the per-stage
+latency. The Pareto frontier (no other configuration is both faster and
+more accurate) is printed, and with --target the fastest configuration
+meeting the accuracy target is picked.
+
+Dataset: a directory with images and a labels.jsonl file, one line per image
+    {"image": "inv_001.png",
+     "fields": {"supplier_name": "...", "total": "...", "currency": "..."},
+     "text": "all words of the document in reading order"}
+"fields" and "text" are each optional; a document only counts towards the
+metrics it is labeled for. Without --dataset, synthetic invoices with their
+ground truth are used (only meaningful with --models real).
+
+Usage:
+    python -m benchmarks.sweep --dataset ./labeled --models real \\
+        --grid DETECTION_RESIZE_LONG=640,960,1280 --grid CONF_THRESH=0.2,0.3 --target 0.95
+    python -m benchmarks.sweep --synthetic 5 --grid EXPAND_RATIO_H=0.1,0.2,0.3 --output sweep.json
+"""
+import argparse
+import itertools
+import json
+import statistics
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import cv2
+import numpy as np
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.core.timing import begin_request_timings
+from app.services.ocr_service import OCRService
+from app.utils.synthetic_invoice import generate_invoice
+from benchmarks.run_suite import load_models, run_metadata
+
+DEFAULT_GRID = {
+    "DETECTION_RESIZE_LONG": [640, 960, 1280],
+    "CONF_THRESH": [0.2, 0.3],
+}
+
+
+@dataclass
+class Document:
+    """One labeled image"""
+    name: str
+    image: np.ndarray
+    fields: Optional[Dict] = None  # expected invoice fields
+    text: Optional[str] = None  # expected reading-order text
+
+
+def load_dataset(directory: Path) -> List[Document]:
+    """Read images and labels from directory/labels.jsonl"""
+    documents = []
+    with open(directory / "labels.jsonl", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            label = json.loads(line)
+            image = cv2.imread(str(directory / label["image"]), cv2.IMREAD_COLOR)
+            if image is None:
+                raise ValueError(f"labels.jsonl line {line_no}: cannot read image {label['image']!r}")
+            documents.append(Document(label["image"], image, label.get("fields"), label.get("text")))
+    return documents
+
+
+def synthetic_dataset(count: int, n_items: int, seed: int) -> List[Document]:
+    documents = []
+    for i in range(count):
+        invoice = generate_invoice(n_items=n_items, seed=seed + i)
+        text = " ".join(word["text"] for word in invoice.words)
+        documents.append(Document(f"synthetic-{seed + i}", invoice.image, invoice.fields, text))
+    return documents
+
+
+def parse_grid(specs: Sequence[str]) -> Dict[str, List]:
+    """NAME=v1,v2,... -> {NAME: [values]}, values cast to the setting's type"""
+    grid = {}
+    for spec in specs:
+        name, sep, values = spec.partition("=")
+        if not sep or not hasattr(settings, name):
+            raise ValueError(f"Expected SETTING=v1,v2,...; unknown setting in {spec!r}")
+        kind = type(getattr(settings, name))
+        if kind not in (int, float):
+            raise ValueError(f"{name} is not numeric")
+        grid[name] = [kind(v) for v in values.split(",") if v]
+    return grid
+
+
+def configurations(grid: Dict[str, List]) -> Iterator[Dict]:
+    names = list(grid)
+    for values in itertools.product(*(grid[name] for name in names)):
+        yield dict(zip(names, values))
+
+
+def levenshtein(a: str, b: str) -> int:
+    """Edit distance (bit-parallel, Hyyrö 2003; fast enough for whole documents)"""
+    if not a:
+        return len(b)
+    if not b:
+        return len(a)
+    mask = (1 << len(a)) - 1
+    high = 1 << (len(a) - 1)
+    peq: Dict[str, int] = {}
+    for i, char in enumerate(a):
+        peq[char] = peq.get(char, 0) | (1 << i)
+
+    pv, mv, score = mask, 0, len(a)
+    for char in b:
+        eq = peq.get(char, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = (mv | ~(xh | pv)) & mask
+        mh = pv & xh
+        if ph & high:
+            score += 1
+        elif mh & high:
+            score -= 1
+        ph = ((ph << 1) | 1) & mask
+        mh = (mh << 1) & mask
+        pv = (mh | ~(xv | ph)) & mask
+        mv = ph & xv
+    return score
+
+
+def normalize_text(text: Optional[str]) -> str:
+    return " ".join(str(text or "").split())
+
+
+def normalize_field(value: Optional[str]) -> Optional[str]:
+    return None if value is None else normalize_text(value).casefold()
+
+
+def evaluate(service: OCRService, documents: Sequence[Document], repeat: int) -> Dict:
+    """CER, field accuracy and latency of the current settings over the dataset"""
+    edits = ref_chars = 0
+    fields_correct = fields_total = 0
+    totals_ms: List[float] = []
+    stage_ms: Dict[str, List[float]] = {}
+
+    for doc in documents:
+        runs = []
+        for _ in range(repeat):
+            timings = begin_request_timings()
+            start = time.perf_counter()
+            results = service.process_image(doc.image)
+            fields = service.extract_invoice_fields(results)
+            runs.append(((time.perf_counter() - start) * 1000, dict(timings.stages)))
+
+        # Stage times of the median run, so stages add up to the total
+        runs.sort(key=lambda run: run[0])
+        total, stages = runs[len(runs) // 2]
+        totals_ms.append(total)
+        for stage, seconds in stages.items():
+            stage_ms.setdefault(stage, []).append(seconds * 1000)
+
+        if doc.text is not None:
+            reference = normalize_text(doc.text)
+            edits += levenshtein(reference, normalize_text(" ".join(t for t in results.texts if t)))
+            ref_chars += len(reference)
+        if doc.fields is not None:
+            for key, expected in doc.fields.items():
+                fields_total += 1
+                fields_correct += normalize_field(fields.get(key)) == normalize_field(expected)
+
+    return {
+        "cer": edits / ref_chars if ref_chars else None,
+        "field_accuracy": fields_correct / fields_total if fields_total else None,
+        "mean_ms": statistics.fmean(totals_ms),
+        "p50_ms": statistics.median(totals_ms),
+        "max_ms": max(totals_ms),
+        # Stages that did not run for a document count as 0
+        "stages_ms": {stage: sum(values) / len(documents) for stage, values in stage_ms.items()},
+    }
+
+
+def accuracy(result: Dict, metric: str) -> float:
+    """Higher is better: field accuracy, or 1 - CER for metric 'text'"""
+    if metric == "fields":
+        return result["field_accuracy"] if result["field_accuracy"] is not None else 0.0
+    return 1.0 - result["cer"] if result["cer"] is not None else 0.0
+
+
+def pareto_frontier(results: List[Dict], metric: str) -> List[Dict]:
+    """Configurations no other one beats on both latency and accuracy, fastest first"""
+    frontier = []
+    best = float("-inf")
+    for result in sorted(results, key=lambda r: (r["mean_ms"], -accuracy(r, metric))):
+        if accuracy(result, metric) > best:
+            frontier.append(result)
+            best = accuracy(result, metric)
+    return frontier
+
+
+def _format_config(config: Dict) -> str:
+    return " ".join(f"{name}={value}" for name, value in config.items())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dataset", type=Path, help="Directory with images and labels.jsonl")
+    parser.add_argument("--synthetic", type=int, default=3, help="Synthetic invoices when no --dataset is given")
+    parser.add_argument("--items", type=int, default=20, help="Line items per synthetic invoice")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--models", choices=["stub", "real"], default="stub")
+    parser.add_argument("--grid", action="append", default=[], metavar="SETTING=v1,v2",
+                        help="Values to sweep for one setting (repeatable)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per image (the median run is kept)")
+    parser.add_argument("--metric", choices=["fields", "text"], default="fields",
+                        help="Accuracy for the frontier: field accuracy or 1 - CER")
+    parser.add_argument("--target", type=float, help="Pick the fastest configuration with accuracy >= target")
+    parser.add_argument("--output", type=Path, help="Write JSON results to this file")
+    args = parser.parse_args()
+
+    # Pipeline info logs would dominate the output and the timings
+    logger.disabled = True
+
+    grid = parse_grid(args.grid) if args.grid else DEFAULT_GRID
+    documents = load_dataset(args.dataset) if args.dataset else synthetic_dataset(args.synthetic, args.items, args.seed)
+    det_model, rec_model = load_models(args.models)
+    service = OCRService(det_model, rec_model)
+
+    original = {name: getattr(settings, name) for name in grid}
+    results = []
+    print(f"{len(documents)} documents, {len(list(configurations(grid)))} configurations\n")
+    print(f"{'cer':>7} {'fields':>7} {'mean_ms':>9} {'p50_ms':>9}  config")
+    try:
+        for config in configurations(grid):
+            for name, value in config.items():
+                setattr(settings, name, value)
+            # Untimed pass: the first run at a new input shape pays for kernel selection
+            service.process_image(documents[0].image)
+            result = dict(evaluate(service, documents, args.repeat), config=config)
+            results.append(result)
+            cer = f"{result['cer']:.4f}" if result["cer"] is not None else "-"
+            fields = f"{result['field_accuracy']:.3f}" if result["field_accuracy"] is not None else "-"
+            print(f"{cer:>7} {fields:>7} {result['mean_ms']:>9.1f} {result['p50_ms']:>9.1f}  {_format_config(config)}")
+    finally:
+        for name, value in original.items():
+            setattr(settings, name, value)
+
+    frontier = pareto_frontier(results, args.metric)
+    print(f"\nPareto frontier ({args.metric} accuracy vs mean latency):")
+    for result in frontier:
+        stages = ", ".join(f"{stage} {ms:.1f}" for stage, ms in sorted(result["stages_ms"].items(), key=lambda s: -s[1])[:4])
+        print(f"  {accuracy(result, args.metric):.4f} {result['mean_ms']:>9.1f} ms  {_format_config(result['config'])}  [{stages}]")
+
+    chosen = None
+    if args.target is not None:
+        chosen = next((r for r in frontier if accuracy(r, args.metric) >= args.target), None)
+        if chosen is None:
+            print(f"\nNo configuration reaches {args.metric} accuracy {args.target}")
+        else:
+            print(f"\nFastest with {args.metric} accuracy >= {args.target}: {_format_config(chosen['config'])} "
+                  f"({chosen['mean_ms']:.1f} ms)")
+
+    if args.output:
+        report = {
+            "meta": dict(run_metadata(args.models), dataset=str(args.dataset) if args.dataset else "synthetic",
+                         documents=len(documents), metric=args.metric),
+            "grid": grid,
+            "results": results,
+            "frontier": [r["config"] for r in frontier],
+            "chosen": chosen["config"] if chosen else None,
+        }
+        args.output.write_text(json.dumps(report, indent=2))
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()